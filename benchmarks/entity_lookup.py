@@ -0,0 +1,142 @@
+"""
+Entity lookup benchmark for the code path that ships: GraphBackend.retrive_all_likable_names, at 1x,
+10x and 100x the current Company/Auditor count, against the unindexed scan the same backend would
+otherwise run.
+
+- neo4j: the entity_names full-text query versus the `n.name =~ "(?i).*name.*"` scan it replaced.
+  The database is cleared for every scale.
+- sqlite (default): the in-process trigram index versus a `name LIKE '%name%'` scan, in a throwaway file.
+
+Each lookup is timed end to end, round trip included; "exact" queries are the first two words of a
+name, "typo" queries the same with two letters swapped in the longest word.
+
+Usage:
+    python -m benchmarks.entity_lookup
+    python -m benchmarks.entity_lookup --backend neo4j --neo4j-uri bolt://localhost:7687 --neo4j-password ...
+"""
+import argparse
+import random
+import re
+import tempfile
+import time
+import numpy as np
+from benchmarks.fakes import FakeEmbedder
+from utils.backend import make_backend
+from utils.ingest import load_dataframe
+from utils.schema import opinion_key, report_key
+
+WORDS = ["global", "united", "american", "pacific", "capital", "energy", "resources", "systems", "holdings",
+         "partners", "industries", "financial", "medical", "digital", "national", "first", "northern", "group"]
+COMPANY_SUFFIXES = ["Inc.", "Corp.", "Ltd.", "& Co.", "Holdings"]
+AUDITOR_SUFFIXES = ["LLP", "LLC"]
+DIMENSION = 8
+
+def synthetic_names(count:int, suffixes:list, rng:random.Random) -> list:
+    return [f"{' '.join(rng.sample(WORDS, 2)).title()} {rng.randint(1, 9999)} {rng.choice(suffixes)}" for _ in range(count)]
+
+def typo(name:str, rng:random.Random) -> str:
+    """Swap two neighbouring letters in the longest word, e.g. Deloitte -> Delotite."""
+    words = name.split()
+    longest = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[longest]
+    if len(word) > 3:
+        i = rng.randrange(1, len(word) - 2)
+        words[longest] = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return " ".join(words[:2])
+
+def name_rows(companies:list, auditors:list) -> list:
+    """One minimal report per company, linking it to an auditor, so every name exists as a Company or Auditor node."""
+    embeddings = [0.0] * DIMENSION
+    return [{
+        'company_name': company,
+        'auditor_name': auditors[position % len(auditors)],
+        'report_key': report_key(company),
+        'report_name': "Report",
+        'report_text': company,
+        'report_embeddings': embeddings,
+        'passages': [],
+        'opinion_key': opinion_key("Unqualified opinion"),
+        'opinion': "Unqualified opinion",
+        'opinion_embeddings': embeddings,
+    } for position, company in enumerate(companies)]
+
+def load_names(graph, companies:list, auditors:list, batch_size:int = 500):
+    graph.clear_database()
+    rows = name_rows(companies, auditors)
+    for start in range(0, len(rows), batch_size):
+        graph.create_rows_batch(rows[start:start + batch_size], [])
+    if hasattr(graph, "driver"):
+        with graph.driver.session() as session:
+            session.run("CALL db.awaitIndexes(300)").consume()
+
+def scan(graph, query:str, label:str, limit:int = 5) -> list:
+    """The unindexed substring scan on the backend: a case-insensitive regex on Neo4j, LIKE on SQLite."""
+    if hasattr(graph, "driver"):
+        with graph.driver.session() as session:
+            result = session.run(f"MATCH (n:{label}) WHERE n.name =~ $pattern RETURN n.name AS name LIMIT $limit",
+                                 pattern=f"(?i).*{re.escape(query)}.*", limit=limit)
+            return [record["name"] for record in result]
+    with graph._lock:
+        rows = graph.connection.execute("SELECT name FROM nodes WHERE label = ? AND name LIKE ? LIMIT ?",
+                                        (label, f"%{query}%", limit)).fetchall()
+    return [name for name, in rows]
+
+def measure(fn, queries):
+    latencies, results = [], []
+    for query, label in queries:
+        start = time.perf_counter()
+        results.append(fn(query, label))
+        latencies.append(1000 * (time.perf_counter() - start))
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95)), results
+
+def hit_rate(targets:list, results:list) -> float:
+    return sum(target in found for (target, _), found in zip(targets, results)) / len(targets)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data/Final_Result_Top50.xlsx")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "neo4j"])
+    parser.add_argument("--neo4j-uri", help="Neo4j for --backend neo4j. Its data is DELETED.")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password")
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory()
+    if args.backend == "neo4j":
+        graph = make_backend("neo4j", uri=args.neo4j_uri, username=args.neo4j_user, password=args.neo4j_password,
+                             snapshot_dir=None, embedder=FakeEmbedder(DIMENSION))
+    else:
+        graph = make_backend("sqlite", path=f"{workdir.name}/graph.sqlite3", embedder=FakeEmbedder(DIMENSION))
+
+    df = load_dataframe(args.data)
+    base_companies, base_auditors = sorted(set(df['Company Name'])), sorted(set(df['Auditor']))
+
+    print(f"{args.backend}: retrive_all_likable_names (limit 5) versus an unindexed scan\n")
+    print(f"{'entities':>9} {'method':<9} {'first ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'exact hit':>10} {'typo hit':>9}")
+    for scale in args.scales:
+        rng = random.Random(scale)
+        companies = base_companies + synthetic_names(len(base_companies) * (scale - 1), COMPANY_SUFFIXES, rng)
+        auditors = base_auditors + synthetic_names(len(base_auditors) * (scale - 1), AUDITOR_SUFFIXES, rng)
+        load_names(graph, companies, auditors)
+
+        targets = [(rng.choice(companies), "Company") if rng.random() < 0.5 else (rng.choice(auditors), "Auditor")
+                   for _ in range(args.queries)]
+        exact_queries = [(" ".join(name.split()[:2]), label) for name, label in targets]
+        typo_queries = [(typo(name, rng), label) for name, label in targets]
+
+        methods = {
+            "scan": lambda query, label: scan(graph, query, label),
+            "shipped": lambda query, label: [match['name'] for match in graph.retrive_all_likable_names(query, label, limit=5)],
+        }
+        for method, fn in methods.items():
+            # The first lookup includes any lazy index build (the SQLite trigram index is built on first use).
+            _, first_ms, _ = measure(fn, exact_queries[:1])
+            _, _, exact = measure(fn, exact_queries)
+            p50, p95, typos = measure(fn, typo_queries)
+            print(f"{len(companies) + len(auditors):>9} {method:<9} {first_ms:>9.1f} {p50:>8.3f} {p95:>8.3f} "
+                  f"{hit_rate(targets, exact):>10.2f} {hit_rate(targets, typos):>9.2f}")
+
+    graph.clear_database()
+    graph.close()
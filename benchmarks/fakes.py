@@ -0,0 +1,61 @@
+"""
+Offline stand-ins for the OpenAI-backed classes and a synthetic corpus, so the benchmarks run without network access.
+They subclass the real classes, so the code paths being timed are the production ones.
+"""
+import random
+import threading
+import pandas as pd
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from utils.embedding_cache import EmbeddingCache
+from utils.utils import OpenAIChatResponse, OpenAIEmbedder
+
+class FakeEmbedder(OpenAIEmbedder):
+    """OpenAIEmbedder over a hash-seeded embedding model: identical texts always get identical vectors."""
+    def __init__(self, dimensions:int = 1536, use_cache:bool = True):
+        self.model = f"fake-{dimensions}"
+        self.embedder = DeterministicFakeEmbedding(size=dimensions)
+        # In-memory only, so runs never touch the real embedding cache file.
+        self.cache = EmbeddingCache(path=None) if use_cache else None
+
+class StubLLM(OpenAIChatResponse):
+    """OpenAIChatResponse whose model returns a canned answer; prompt budgeting, memory and chains still run."""
+    def __init__(self, answer:str = "The auditor expressed an unqualified opinion on the financial statements."):
+        self.answer = answer
+        self.models = {}
+        self._models_lock = threading.Lock()
+
+    def get_model(self, model:str = "gpt-3.5-turbo", max_token:int = 4000):
+        return FakeListChatModel(responses=[self.answer])
+
+    def complete(self, prompt:str, model:str = "gpt-3.5-turbo", max_token:int = 4000):
+        return prompt[:4 * max_token]
+
+WORDS = ["financial", "statements", "present", "fairly", "material", "respects", "position", "company", "results",
+         "operations", "cash", "flows", "accordance", "accounting", "principles", "generally", "accepted", "audit",
+         "evidence", "control", "reporting", "assessment", "risks", "misstatement", "procedures", "opinion",
+         "standards", "board", "management", "responsibility", "reasonable", "assurance", "estimates", "basis"]
+AUDIT_NAMES = ["Consolidated Financial Statements", "Internal Control over Financial Reporting", "Critical Audit Matters",
+               "Revenue Recognition", "Goodwill Impairment", "Income Taxes", "Going Concern", "Inventory Valuation"]
+OPINIONS = ["Unqualified opinion", "Qualified opinion", "Adverse opinion", "Disclaimer of opinion"]
+SUFFIXES = ["Inc.", "Corp.", "Holdings", "Group", "Ltd.", "& Co."]
+
+def synthetic_dataframe(n_reports:int, seed:int = 0, report_words:int = 300) -> pd.DataFrame:
+    """
+    A sheet shaped like load_dataframe()'s output: one report per company, about one auditor per
+    twenty companies, and one to three audits per report drawn from a small shared vocabulary.
+    """
+    rng = random.Random(seed)
+    auditors = [f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} LLP" for _ in range(max(3, n_reports // 20))]
+    rows = []
+    for i in range(n_reports):
+        company = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i} {rng.choice(SUFFIXES)}"
+        auditor = rng.choice(auditors)
+        paragraphs = [" ".join(rng.choices(WORDS, k=50)).capitalize() + "." for _ in range(max(1, report_words // 50))]
+        report = "\n".join(["Report of Independent Registered Public Accounting Firm", f"To the Board of {company}"]
+                           + paragraphs + [f"/s/ {auditor}"])
+        opinion = rng.choice(OPINIONS)
+        audits = [{'Audit_Name': name, 'Audit_Opinion': rng.choice(OPINIONS)} for name in rng.sample(AUDIT_NAMES, rng.randint(1, 3))]
+        rows.append({'Company Name': company, 'Auditor': auditor.lower(), 'Report_Name': "Report of Independent Registered Public Accounting Firm",
+                     'Report': report, 'Opinion': opinion, 'Audits': audits})
+    return pd.DataFrame(rows)
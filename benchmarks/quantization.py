@@ -0,0 +1,88 @@
+"""
+Memory, load time and recall of packed embedding storage (utils/vector_codec.py) and of the
+compressed FAISS index types (sq8, pq) with and without float32 re-ranking.
+
+Storage: bytes per vector on disk, estimated bytes per vector over Bolt (a list of floats costs 9
+bytes per element in PackStream, a byte array 1 byte), time to decode every stored vector into the
+float32 matrix the index is built from, and recall of exact search over the decoded vectors.
+
+Index: resident index size, build time, query latency and recall, all against exact float32 search.
+
+Usage:
+    python -m benchmarks.quantization                       # synthetic ada-002 sized corpus
+    python -m benchmarks.quantization --snapshot index_snapshot --k 5
+"""
+import argparse
+import time
+import numpy as np
+import faiss
+from utils.vector_codec import CODECS, decode, encode, encoded_size
+from utils.vector_index import VectorIndex
+from benchmarks.index_recall import recall_report, sample_queries, synthetic_corpus, load_snapshot_vectors
+
+CONFIGS = [
+    {"index_type": "flat", "metric": "cosine"},
+    {"index_type": "sq8", "metric": "cosine", "rerank": 1},
+    {"index_type": "sq8", "metric": "cosine", "rerank": 4},
+    {"index_type": "pq", "metric": "cosine", "pq_m": 64, "rerank": 1},
+    {"index_type": "pq", "metric": "cosine", "pq_m": 64, "rerank": 4},
+    {"index_type": "pq", "metric": "cosine", "pq_m": 64, "rerank": 16},
+]
+
+def bolt_size(dimension:int, codec:str) -> int:
+    """Approximate PackStream size: float32 is sent as a list of 64-bit floats, the rest as byte arrays."""
+    if codec == "float32":
+        return 3 + 9 * dimension
+    return 5 + encoded_size(dimension, codec)
+
+def storage_report(vectors:np.ndarray, queries:np.ndarray, k:int) -> list:
+    exact = VectorIndex([str(i) for i in range(len(vectors))], vectors, index_type="flat", metric="cosine")
+    truth = [set(exact.search(query, k)[1].tolist()) for query in queries]
+
+    rows = []
+    for codec in CODECS:
+        packed = [encode(vector, codec) for vector in vectors]
+        start = time.perf_counter()
+        decoded = np.array([decode(value) for value in packed], dtype=np.float32)
+        decode_seconds = time.perf_counter() - start
+
+        index = VectorIndex([str(i) for i in range(len(decoded))], decoded, index_type="flat", metric="cosine")
+        hits = sum(len(set(index.search(query, k)[1].tolist()) & expected) for query, expected in zip(queries, truth))
+        rows.append({
+            "codec": codec,
+            "bytes": encoded_size(vectors.shape[1], codec),
+            "bolt_bytes": bolt_size(vectors.shape[1], codec),
+            "total_mb": sum(len(value) for value in packed) / 2 ** 20,
+            "decode_s": decode_seconds,
+            "max_error": float(np.abs(decoded - vectors).max()),
+            "recall": hits / (k * len(queries)),
+        })
+    return rows
+
+def index_sizes(vectors:np.ndarray, configs:list) -> list:
+    """Serialized FAISS index size in MB, which is what the index keeps resident."""
+    node_ids = [str(i) for i in range(len(vectors))]
+    return [len(faiss.serialize_index(VectorIndex(node_ids, vectors, **config).index)) / 2 ** 20 for config in configs]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", help="Index snapshot directory to benchmark instead of a synthetic corpus.")
+    parser.add_argument("--size", type=int, default=20000, help="Synthetic corpus size.")
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=2)
+    args = parser.parse_args()
+
+    vectors = load_snapshot_vectors(args.snapshot) if args.snapshot else synthetic_corpus(args.size, args.dimension)
+    queries = sample_queries(vectors, args.queries)
+    print(f"{len(vectors)} vectors of {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+
+    print(f"{'storage':<10} {'bytes':>7} {'bolt bytes':>11} {'total MB':>9} {'decode s':>9} {'max error':>10} {'recall':>7}")
+    for row in storage_report(vectors, queries, args.k):
+        print(f"{row['codec']:<10} {row['bytes']:>7} {row['bolt_bytes']:>11} {row['total_mb']:>9.1f} {row['decode_s']:>9.2f} "
+              f"{row['max_error']:>10.5f} {row['recall']:>7.3f}")
+
+    print(f"\n{'index':<50} {'MB':>8} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for row, size in zip(recall_report(vectors, queries, args.k, CONFIGS), index_sizes(vectors, CONFIGS)):
+        config = ", ".join(f"{key}={value}" for key, value in row["config"].items())
+        print(f"{config:<50} {size:>8.1f} {row['build_s']:>8.2f} {row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['recall']:>7.3f}")
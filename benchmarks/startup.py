@@ -0,0 +1,81 @@
+"""
+Start-up benchmark: import time of the app's modules in a fresh interpreter, and optionally the cold
+start of the retrieval engine (driver, index, classifier) up to an answered first query.
+
+Usage:
+    python -m benchmarks.startup                    # import times only, no services needed
+    python -m benchmarks.startup --cold-start       # also build the engine; needs Neo4j and OpenAI secrets
+"""
+import argparse
+import json
+import subprocess
+import sys
+import numpy as np
+
+MODULES = ["streamlit", "chatbot_util", "utils.engine", "utils.utils", "utils.graph", "utils.query_classifer", "utils.render"]
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+COLD_START_SCRIPT = """
+import json, time
+stages = {{}}
+start = time.perf_counter()
+import chatbot_util
+stages["import_ms"] = 1000 * (time.perf_counter() - start)
+
+mark = time.perf_counter()
+from utils.engine import get_engine
+engine = get_engine()
+stages["engine_ms"] = 1000 * (time.perf_counter() - mark)
+
+mark = time.perf_counter()
+engine.db.ensure_index()
+stages["index_ms"] = 1000 * (time.perf_counter() - mark)
+
+mark = time.perf_counter()
+engine.get_classifier()
+stages["classifier_ms"] = 1000 * (time.perf_counter() - mark)
+
+mark = time.perf_counter()
+engine.run(engine.aretrieve({query!r}, distance=0.5))
+stages["first_retrieval_ms"] = 1000 * (time.perf_counter() - mark)
+
+stages["ready_ms"] = 1000 * (time.perf_counter() - start)
+print(json.dumps(stages))
+"""
+
+def run_python(script:str) -> str:
+    """Run a script in a new interpreter so nothing is already imported or cached in memory."""
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", script], capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+def import_times(modules:list, repeats:int) -> dict:
+    return {module: [1000 * float(run_python(IMPORT_SCRIPT.format(module=module))) for _ in range(repeats)]
+            for module in modules}
+
+def cold_start(query:str, repeats:int) -> list:
+    return [json.loads(run_python(COLD_START_SCRIPT.format(query=query))) for _ in range(repeats)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--cold-start", action="store_true", help="Also time engine construction up to the first retrieval.")
+    parser.add_argument("--query", default="Show me all the companies audited by Deloitte.")
+    args = parser.parse_args()
+
+    print(f"{'module':<24} {'p50 ms':>8} {'max ms':>8}")
+    for module, times in import_times(MODULES, args.repeats).items():
+        print(f"{module:<24} {np.percentile(times, 50):>8.0f} {max(times):>8.0f}")
+
+    if args.cold_start:
+        runs = cold_start(args.query, args.repeats)
+        print(f"\n{'cold start stage':<24} {'p50 ms':>8} {'max ms':>8}")
+        for stage in runs[0]:
+            times = [run[stage] for run in runs]
+            print(f"{stage:<24} {np.percentile(times, 50):>8.0f} {max(times):>8.0f}")
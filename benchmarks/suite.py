@@ -0,0 +1,181 @@
+"""
+Offline benchmark of the ingestion and retrieval hot paths on synthetic corpora.
+
+Embeddings come from a deterministic fake model and answers from a stub LLM, so nothing goes over
+the network. The same stages run against either graph backend: the embedded SQLite one (default,
+a throwaway file per size) or, with --backend neo4j, a real Neo4j whose database is cleared for every size.
+Each corpus size runs in a fresh process, so its peak RSS is its own.
+
+Usage:
+    python -m benchmarks.suite                                  # 50, 1k and 10k reports
+    python -m benchmarks.suite --sizes 50 1000 10000 100000
+    python -m benchmarks.suite --backend neo4j --neo4j-uri bolt://localhost:7687 --neo4j-password ...
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --fail-on-regression
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+STAGES = ["handle_query", "embed_query", "search", "fetch", "generate", "retrace"]
+
+def percentiles(times:list) -> dict:
+    return {"p50_ms": float(np.percentile(times, 50)), "p95_ms": float(np.percentile(times, 95))}
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, 1000 * (time.perf_counter() - start)
+
+def make_graph(options:dict, embedder, workdir:str):
+    from utils.backend import make_backend
+    index_config = {"index_type": options["index_type"], "metric": "l2", "snapshot_dir": None, "embedder": embedder}
+    if options["backend"] == "neo4j":
+        graph = make_backend("neo4j", uri=options["neo4j_uri"], username=options["neo4j_user"],
+                             password=options["neo4j_password"], **index_config)
+    else:
+        graph = make_backend("sqlite", path=os.path.join(workdir, "graph.sqlite3"), **index_config)
+    graph.clear_database()
+    return graph
+
+def run_size(size:int, options:dict) -> dict:
+    """Ingest a synthetic corpus of `size` reports, then time each retrieval stage over sampled queries."""
+    os.environ.setdefault("TQDM_DISABLE", "1")
+    from benchmarks.fakes import FakeEmbedder, StubLLM, synthetic_dataframe
+    from utils.pipeline import IngestionPipeline
+
+    df = synthetic_dataframe(size, seed=options["seed"])
+    workdir = tempfile.TemporaryDirectory()
+    graph = make_graph(options, FakeEmbedder(options["dim"]), workdir.name)
+    llm = StubLLM()
+
+    pipeline = IngestionPipeline(graph, checkpoint_path=None, chunk_size=64, embed_workers=4,
+                                 requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12)
+    ingest = pipeline.run(df)
+    vector_index, index_build_ms = timed(graph.ensure_index)
+
+    # Queries are passage texts, so the fake embeddings have an exact match to find.
+    rng = random.Random(options["seed"])
+    from utils.ingest import build_rows
+    rows = build_rows(df)
+    queries = [rng.choice(rng.choice(rows)['passages']) for _ in range(options["queries"])]
+
+    # Passage texts are already in the embedding cache from ingestion; time query embedding without it.
+    query_embedder = FakeEmbedder(options["dim"], use_cache=False)
+    # Import matplotlib and networkx before timing, as the app's warm-up does.
+    graph.retrace_path_and_visualize(next(iter(vector_index.node_ids)))
+
+    times = {stage: [] for stage in STAGES}
+    distance = float("inf")
+    k = options["k"]
+    for position, query in enumerate(queries):
+        embedding, elapsed = timed(query_embedder.embed_query, query)
+        times["embed_query"].append(elapsed)
+        hits, elapsed = timed(graph.search_nodes, embedding, distance, 3 * k, ["Passage"])
+        times["search"].append(elapsed)
+        records, elapsed = timed(graph.fetch_evidence, hits, k)
+        times["fetch"].append(elapsed)
+        _, elapsed = timed(llm.generate_response, [], query, records)
+        times["generate"].append(elapsed)
+        # End to end, with the query embedding now in the embedding cache as it is after a repeated question.
+        _, elapsed = timed(graph.handle_query, query, distance=distance, k=k)
+        times["handle_query"].append(elapsed)
+        if position < options["render_queries"] and hits:
+            _, elapsed = timed(graph.retrace_path_and_visualize, hits[0])
+            times["retrace"].append(elapsed)
+
+    graph.close()
+    workdir.cleanup()
+
+    return {
+        "reports": size,
+        "vectors": len(vector_index),
+        "ingest_rows_per_s": ingest["rows_per_s"],
+        "ingest_embeddings_per_s": ingest["embeddings_per_s"],
+        "index_build_ms": index_build_ms,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": {stage: percentiles(values) for stage, values in times.items() if values},
+    }
+
+def change(current:float, baseline:float) -> float:
+    return (current - baseline) / baseline if baseline else 0.0
+
+def report(result:dict, baseline:dict, tolerance:float) -> list:
+    """Print one size's results next to the baseline; returns the metrics that regressed beyond tolerance."""
+    regressions = []
+    print(f"\n{result['reports']} reports, {result['vectors']} vectors, peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    def line(name, value, unit, base, higher_is_better=False):
+        text = f"  {name:<24} {value:>10.2f} {unit:<6}"
+        if base is not None:
+            delta = change(value, base)
+            worse = -delta if higher_is_better else delta
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if flag:
+                regressions.append(f"{result['reports']}:{name}")
+            text += f" baseline {base:>10.2f} ({delta:+.0%}){flag}"
+        print(text)
+
+    base = baseline or {}
+    line("ingest rows/s", result["ingest_rows_per_s"], "", base.get("ingest_rows_per_s"), higher_is_better=True)
+    line("ingest embeddings/s", result["ingest_embeddings_per_s"], "", base.get("ingest_embeddings_per_s"), higher_is_better=True)
+    line("index build", result["index_build_ms"], "ms", base.get("index_build_ms"))
+    line("peak RSS", result["peak_rss_mb"], "MB", base.get("peak_rss_mb"))
+    for stage, values in result["stages"].items():
+        base_stage = base.get("stages", {}).get(stage, {})
+        line(f"{stage} p50", values["p50_ms"], "ms", base_stage.get("p50_ms"))
+        line(f"{stage} p95", values["p95_ms"], "ms", base_stage.get("p95_ms"))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 1000, 10000], help="Corpus sizes in reports.")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--render-queries", type=int, default=10, help="Queries that also render their evidence graph.")
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--dim", type=int, default=256, help="Embedding size; 1536 matches ada-002 but needs ~6x the memory.")
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf", "hnsw"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Compare against results saved with --save-baseline.")
+    parser.add_argument("--save-baseline", help="Write this run's results to a JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative slowdown reported as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "neo4j"], help="Graph backend to benchmark.")
+    parser.add_argument("--neo4j-uri", help="Neo4j for --backend neo4j. Its data is DELETED.")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password")
+    args = parser.parse_args()
+
+    options = {name: getattr(args, name) for name in
+               ("queries", "render_queries", "k", "dim", "index_type", "seed", "backend", "neo4j_uri", "neo4j_user", "neo4j_password")}
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results, regressions = {}, []
+    for size in args.sizes:
+        # A fresh process per size keeps peak memory and warm caches from leaking between sizes.
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(run_size, size, options).result()
+        results[str(size)] = result
+        regressions += report(result, baseline.get(str(size)), args.tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"options": options | {"neo4j_password": None}, "results": results}, f, indent=2)
+
+    if regressions:
+        print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
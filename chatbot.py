@@ -3,7 +3,8 @@ import streamlit as st
 from st_copy_to_clipboard import st_copy_to_clipboard
 import warnings
 import os 
-from chatbot_util import get_response
+from chatbot_util import answer_cache_stats, get_response_stream, refresh_index, remember_turn, render_evidence, start_metrics, start_warm_up
+from utils.conversation_memory import RollingSummaryMemory
 
 # Load environment variables
 load_dotenv()
@@ -14,6 +15,10 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 
 st.set_page_config(page_title="AuditInsight-Bot", page_icon=None, layout="wide", initial_sidebar_state="expanded")
 
+# Heavy initialisation (Neo4j, FAISS, LangChain, the classifier) starts in the background on the first run.
+start_warm_up()
+start_metrics()
+
 # Presuggested prompts
 suggested_prompt = ["Can you give me some insight on the report of ALEXANDERS INC?", 
                     "Can you some details on the audit report generated for company name: `Apogee Enterprises, Inc.`?",
@@ -34,7 +39,8 @@ def save_current_chat():
     session_key = st.session_state.current_chat
     st.session_state.chat_sessions[session_key] = {
         "messages": st.session_state.messages.copy(),
-        "evidence": st.session_state.evidence
+        "evidence": st.session_state.evidence,
+        "memory": st.session_state.memory
     }
 
 def load_chat(session_key):
@@ -43,6 +49,7 @@ def load_chat(session_key):
     session_data = st.session_state.chat_sessions[session_key]
     st.session_state.messages = session_data["messages"]
     st.session_state.evidence = session_data["evidence"]
+    st.session_state.memory = session_data.get("memory") or RollingSummaryMemory()
 
 # Sidebar for switching between chat sessions
 with st.sidebar:
@@ -63,9 +70,20 @@ with st.sidebar:
         st.session_state.next_session_id += 1
         st.session_state.messages = []
         st.session_state.evidence = None
+        st.session_state.memory = RollingSummaryMemory()
         st.session_state["reset_evidence"] = True
         st.session_state.current_chat = new_session_key
 
+    if st.sidebar.button("Refresh search index"):
+        refresh_index()
+
+    debug_panel = st.sidebar.toggle("Show debug panel", value=False)
+
+    answer_cache = answer_cache_stats()
+    if answer_cache:
+        st.sidebar.caption(f"Answer cache: {answer_cache['hits']} hits, {answer_cache['misses']} misses "
+                           f"({answer_cache['hit_rate']:.0%}), {answer_cache['items']} answers")
+
 st.header("AuditInsight-Bot")
 
 # Display presuggested prompts
@@ -89,26 +107,68 @@ if "messages" not in st.session_state:
 if "evidence" not in st.session_state:
     st.session_state.evidence = None
 
+# Older turns are folded into a summary in the background, so each turn sends a bounded history.
+if "memory" not in st.session_state:
+    st.session_state.memory = RollingSummaryMemory()
+
+def show_latency(latency:dict):
+    if latency:
+        caption = f"First token {latency.get('first_token_s', 0):.2f} s, total {latency.get('total_s', 0):.2f} s"
+        if latency.get('cached'):
+            caption += " · cached answer"
+        if latency.get('structured'):
+            caption += " · answered from graph relationships"
+        if latency.get('general'):
+            caption += " · general question, no retrieval"
+        if 'tokens' in latency:
+            tokens = latency['tokens']
+            caption += (f" · prompt {tokens['total']} tokens (instructions {tokens['instructions']}, "
+                        f"history {tokens['history']}, evidence {tokens['evidence']})")
+        st.caption(caption)
+
 # Display the current chat messages
 for message in st.session_state.messages:
     st.chat_message('human').write(message['user'])
-    st.chat_message('ai').write(message['ai'])
+    with st.chat_message('ai'):
+        st.write(message['ai'])
+        show_latency(message.get('latency'))
 
 # Chat input and response generation
 if query := st.chat_input():
     st.chat_message('human').write(query)
 
     if "evidence" not in st.session_state or st.session_state.get("reset_evidence", True):
-        response, st.session_state.evidence = get_response(query=query, history=st.session_state.messages, records=None)
+        chunks, st.session_state.evidence, latency = get_response_stream(query=query, history=st.session_state.messages, records=None, memory=st.session_state.memory, prerender=True)
         st.session_state["reset_evidence"] = False
     else:
-        response, _ = get_response(query=query, history=st.session_state.messages, records=st.session_state.evidence)
-
-    if st.session_state.evidence:
-        st.markdown("**Evidence**")
-        for record in st.session_state.evidence:
-            with st.expander("Evidence", expanded=False):
-                st.image(record['Graph'])
-
-    st.chat_message('ai').write(response)
-    st.session_state.messages.append({'user': query, 'ai': response})
\ No newline at end of file
+        chunks, _, latency = get_response_stream(query=query, history=st.session_state.messages, records=st.session_state.evidence, memory=st.session_state.memory)
+
+    # Tokens are shown as they arrive; write_stream returns the full text once the stream ends.
+    with st.chat_message('ai'):
+        response = st.write_stream(chunks)
+        show_latency(latency)
+    st.session_state.messages.append({'user': query, 'ai': response, 'latency': latency})
+    remember_turn(st.session_state.messages, st.session_state.memory)
+
+# Where the time of the latest turn went, per stage, with its cache and token counters.
+if debug_panel and st.session_state.messages:
+    breakdown = (st.session_state.messages[-1].get('latency') or {}).get('breakdown')
+    with st.sidebar:
+        st.markdown("**Latest turn**")
+        if breakdown:
+            st.table([{"stage": name, "ms": round(ms, 1)} for name, ms in breakdown["spans"]])
+            if breakdown["counters"]:
+                st.table([{"counter": name, "value": value} for name, value in sorted(breakdown["counters"].items())])
+        else:
+            st.caption("No timings recorded for this turn.")
+
+# Evidence stays visible across reruns; each graph is only drawn once its panel asks for it.
+if st.session_state.evidence:
+    st.markdown("**Evidence**")
+    for record in st.session_state.evidence:
+        with st.expander("Evidence", expanded=False):
+            if st.toggle("Show evidence graph", key=f"evidence_graph_{record['ElementId']}"):
+                image, timings = render_evidence(record)
+                st.image(image)
+                source = "cached" if timings["cached"] else "rendered"
+                st.caption(f"Layout {timings['layout_ms']:.0f} ms, rendering {timings['render_ms']:.0f} ms ({source})")
\ No newline at end of file
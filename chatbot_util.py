@@ -1,25 +1,234 @@
-from utils.graph import Neo4jHandler
-from utils.utils import OpenAIChatResponse
-from pandas import DataFrame
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+from utils import metrics
+from utils.engine import UNCLASSIFIED
+from utils.engine import current_engine, get_engine
+from utils.conversation_memory import RollingSummaryMemory
 
-def get_response(query:str, history: list, records:DataFrame = None):
-    db = Neo4jHandler()
-    aiReponse = OpenAIChatResponse()
+# pandas and the rendering stack are only needed once a query runs; keep them off the import path.
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
-    if records is None:
-        records = db.handle_query(query, distance=0.5)
+# Answers that signal a failed generation; these are never cached.
+FAILED_RESPONSES = ("No Response", "Error Occured while generating response.")
 
+def evidence_ids(records) -> list:
+    return [record['ElementId'] for record in records]
+
+async def aroute(engine, query:str, records):
+    """
+    The query's route, classified once before anything else for a new question so that small talk and
+    general questions go to the general prompt without embedding the query or searching the graph.
+    Follow-up turns reuse their records and are not classified.
+    """
+    if records is not None:
+        return UNCLASSIFIED
+    route = await engine.aclassify(query)
+    from utils.query_classifer import is_general_route
+    if is_general_route(route):
+        metrics.increment("general_answers")
+    return route
+
+def is_general(route) -> bool:
+    from utils.query_classifer import is_general_route
+    return route is not UNCLASSIFIED and is_general_route(route)
+
+def conversation(history:list, memory:RollingSummaryMemory = None):
+    """(summary, turns) sent to the model: with a memory, only the turns its summary does not cover yet."""
+    if memory is None:
+        return None, history
+    return memory.context(history)
+
+async def aget_response(query:str, history: list, records:"DataFrame" = None, prerender:bool = False, memory:RollingSummaryMemory = None):
+    """
+    Async pipeline behind get_response. The query is classified first, retrieval runs on the pooled
+    driver, and with `prerender` the evidence graphs are drawn in the background while the LLM answers.
+    A close enough question already answered from the same evidence and history is served from the
+    answer cache without calling the LLM. List, count and lookup questions about named companies and
+    auditors are answered from the graph's relationships directly (see RetrievalEngine.astructured), and
+    general questions go straight to the general prompt.
+    """
+    engine = get_engine()
+    aiReponse = engine.ai
+
+    route = await aroute(engine, query, records)
+    general = is_general(route)
+    structured = await engine.astructured(query, route) if records is None and not general else None
+    if general:
+        records = []
+    elif structured is not None:
+        response, records = structured
+        # Unless it is to be phrased by the LLM, and there is something on record to phrase, the structured answer is final.
+        if not engine.phrase_structured or not records:
+            return response, records
+    elif records is None:
+        records = await engine.aretrieve(query, distance=0.5, route=route)
+        if prerender:
+            engine.prerender(records)
+
+    # Structured and general answers are generated afresh; they never needed the query embedding the answer cache is keyed on.
+    # Neither do turns without evidence (e.g. follow-ups to small talk), which go to the general prompt.
+    cacheable = structured is None and not general and len(records) > 0
+    if cacheable:
+        # An embedding-cache hit when the records were retrieved on this turn.
+        query_embedding = await engine.db.embedder.aembed_query(query)
+        response = engine.answers.get(query, query_embedding, evidence_ids(records), history)
+        if response is not None:
+            return response, records
+
+    summary, turns = conversation(history, memory)
     if len(records) > 0:
         try:
-            response = aiReponse.generate_response(query=query, history=history, records=records)
+            response = await aiReponse.agenerate_response(query=query, history=turns, records=records, summary=summary)
         except:
             response = "Error Occured while generating response."
     
     else:
-        response = aiReponse.generate_response(query=query, history=history, records=records, general_question=True)
+        response = await aiReponse.agenerate_response(query=query, history=turns, records=records, general_question=True, summary=summary)
 
+    if response not in FAILED_RESPONSES and cacheable:
+        engine.answers.put(query, query_embedding, evidence_ids(records), history, response)
     return response, records
 
+def get_response(query:str, history: list, records:"DataFrame" = None, memory:RollingSummaryMemory = None):
+    engine = get_engine()
+    turn = metrics.Trace()
+    with turn.activate():
+        response, records = engine.run(aget_response(query, history, records, memory=memory))
+    metrics.log_event("turn", **turn.breakdown())
+    return response, records
+
+def get_response_stream(query:str, history: list, records:"DataFrame" = None, memory:RollingSummaryMemory = None, prerender:bool = False):
+    """
+    Streaming variant of get_response: returns (chunks, records, latency) where chunks yields the answer
+    as it is generated. latency gets the prompt's token breakdown under 'tokens', and 'first_token_s' and
+    'total_s', measured from this call, once consumed. 'cached' tells whether the answer came from the
+    answer cache, 'structured' whether it came straight from the graph's relationships, 'general' whether
+    it skipped retrieval as a general question, and 'breakdown' holds the turn's spans and counters
+    (see utils/metrics.py). With `prerender`, newly retrieved evidence graphs are drawn in the background
+    while the answer streams.
+    """
+    start = time.perf_counter()
+    engine = get_engine()
+    aiReponse = engine.ai
+    turn = metrics.Trace()
+
+    with turn.activate():
+        route = engine.run(aroute(engine, query, records))
+        general = is_general(route)
+        structured = engine.run(engine.astructured(query, route)) if records is None and not general else None
+        if general:
+            records, cached = [], None
+        elif structured is not None:
+            answer, records = structured
+            # Structured answers are complete and cheap to recompute, so they bypass the answer cache.
+            cached = None if engine.phrase_structured and records else answer
+        else:
+            if records is None:
+                records = engine.run(engine.aretrieve(query, distance=0.5, route=route))
+                if prerender:
+                    engine.prerender(records)
+            cached = None
+        # Turns without evidence (e.g. follow-ups to small talk) go to the general prompt and have nothing to key a cached answer on.
+        cacheable = structured is None and not general and len(records) > 0
+        if cacheable:
+            query_embedding = engine.db.embedder.embed_query(query)
+            cached = engine.answers.get(query, query_embedding, evidence_ids(records), history)
+    latency = {'cached': cached is not None and structured is None, 'structured': structured is not None, 'general': general}
+    summary, turns = conversation(history, memory)
+
+    def finish():
+        latency['total_s'] = time.perf_counter() - start
+        latency['breakdown'] = turn.breakdown()
+        metrics.log_event("turn", total_ms=round(1000 * latency['total_s'], 3), **latency['breakdown'])
+
+    def chunks():
+        if cached is not None:
+            latency['first_token_s'] = time.perf_counter() - start
+            finish()
+            yield cached
+            return
+
+        parts = []
+        stream = aiReponse.stream_response(query=query, history=turns, records=records, general_question=len(records) == 0, stats=latency, summary=summary)
+        try:
+            while True:
+                # The trace is only active while the model is being read, not while the caller renders chunks.
+                with turn.activate():
+                    chunk = next(stream, None)
+                if chunk is None:
+                    break
+                if 'first_token_s' not in latency:
+                    latency['first_token_s'] = time.perf_counter() - start
+                parts.append(chunk)
+                yield chunk
+            if cacheable:
+                engine.answers.put(query, query_embedding, evidence_ids(records), history, "".join(parts))
+        except Exception:
+            yield "Error Occured while generating response."
+        finish()
+
+    return chunks(), records, latency
+
+def render_evidence(record:dict):
+    """PNG bytes and layout/render timings for an evidence record's graph; rendered on first view, then cached."""
+    from utils.render import get_renderer
+    return get_renderer().render(record['Edges'])
+
+def remember_turn(history:list, memory:RollingSummaryMemory):
+    """After a turn is added to history, fold older turns into the session summary in the background."""
+    engine = get_engine()
+    memory.update(history, engine.ai, engine.executor)
+
+def answer_cache_stats() -> dict:
+    """Hit rate, size, expiries and evictions of the shared answer cache; empty until the engine exists."""
+    engine = current_engine()
+    return engine.answers.stats() if engine else {}
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+def start_warm_up():
+    """
+    Build the engine, load the search index and the classifier on a background thread, once per process,
+    so the page renders straight away and the heavy imports are done by the time the first query arrives.
+    """
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+
+    def warm_up():
+        try:
+            get_engine().warm_up()
+        except Exception:
+            # The first query builds whatever is still missing and reports the error there.
+            pass
+
+    threading.Thread(target=warm_up, name="engine-warm-up", daemon=True).start()
+
+def start_metrics():
+    """
+    Expose metrics as configured by the environment, once per process:
+    METRICS_PORT serves Prometheus text at http://localhost:<port>/metrics, and
+    METRICS_LOG=1 writes one JSON line per span and per turn to stderr.
+    """
+    if os.environ.get("METRICS_PORT"):
+        metrics.start_metrics_server(int(os.environ["METRICS_PORT"]))
+    if os.environ.get("METRICS_LOG") and not metrics.logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        metrics.logger.addHandler(handler)
+        metrics.logger.setLevel(logging.INFO)
+
+def refresh_index():
+    """Rebuild the shared search index so newly loaded filings become searchable."""
+    get_engine().refresh()
+
 
 if __name__ == "__main__":
     response, records = get_response(query="Can you get a report on Adam's company", history="")
@@ -0,0 +1,36 @@
+"""
+Shared fixtures. Backend tests run against an SQLite graph in a temporary file, and also against
+Neo4j when NEO4J_TEST_URI is set (with NEO4J_TEST_USER and NEO4J_TEST_PASSWORD); that database is
+cleared before and after every test.
+"""
+import os
+import pytest
+from benchmarks.fakes import FakeEmbedder, synthetic_dataframe
+from utils.backend import make_backend
+
+DIMENSION = 16
+
+BACKENDS = ["sqlite", pytest.param("neo4j", marks=pytest.mark.skipif(not os.environ.get("NEO4J_TEST_URI"),
+                                                                      reason="set NEO4J_TEST_URI to run against Neo4j"))]
+
+@pytest.fixture(params=BACKENDS)
+def graph(request, tmp_path):
+    if request.param == "neo4j":
+        graph = make_backend("neo4j", uri=os.environ["NEO4J_TEST_URI"], username=os.environ.get("NEO4J_TEST_USER", "neo4j"),
+                             password=os.environ.get("NEO4J_TEST_PASSWORD"), snapshot_dir=None, embedder=FakeEmbedder(DIMENSION))
+    else:
+        graph = make_backend("sqlite", path=str(tmp_path / "graph.sqlite3"), embedder=FakeEmbedder(DIMENSION))
+    graph.clear_database()
+    yield graph
+    graph.clear_database()
+    graph.close()
+
+@pytest.fixture
+def corpus():
+    return synthetic_dataframe(12, seed=1, report_words=600)
+
+def await_indexes(graph):
+    """Wait for Neo4j to populate its full-text and vector indexes after a write; SQLite needs no wait."""
+    if hasattr(graph, "driver"):
+        with graph.driver.session() as session:
+            session.run("CALL db.awaitIndexes(300)").consume()
@@ -0,0 +1,42 @@
+import numpy as np
+from utils.answer_cache import SemanticAnswerCache
+
+QUERY = np.array([1.0, 0.0, 0.0])
+CLOSE = np.array([1.0, 0.1, 0.0])    # cosine 0.995
+FAR = np.array([1.0, 1.0, 0.0])      # cosine 0.707
+HISTORY = [{'user': "Hi", 'ai': "Hello"}]
+
+def test_hit_on_a_close_query_in_the_same_context():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.put("Who audits Tesla?", QUERY, ["1", "2"], HISTORY, "PwC")
+    # The same text (up to whitespace) is a hit whatever its embedding.
+    assert cache.get("  Who audits   Tesla?", [0.0, 0.0, 0.0], ["1", "2"], HISTORY) == "PwC"
+    assert cache.get("Which firm audits Tesla?", CLOSE * 5, ["1", "2"], HISTORY) == "PwC"
+    assert cache.get("Is Tesla profitable?", FAR, ["1", "2"], HISTORY) is None
+    assert cache.stats() | {"hit_rate": None} == {"hits": 2, "misses": 1, "hit_rate": None, "expired": 0, "evictions": 0, "items": 1}
+
+def test_answers_never_cross_contexts():
+    cache = SemanticAnswerCache()
+    cache.put("Who audits Tesla?", QUERY, ["1", "2"], HISTORY, "PwC")
+    assert cache.get("Who audits Tesla?", QUERY, ["2", "1"], HISTORY) is None
+    assert cache.get("Who audits Tesla?", QUERY, ["1", "2"], []) is None
+    assert cache.get("Who audits Tesla?", QUERY, ["1", "2"], HISTORY + [{'user': "And?", 'ai': "..."}]) is None
+
+def test_entries_expire():
+    cache = SemanticAnswerCache(ttl_seconds=0)
+    cache.put("Who audits Tesla?", QUERY, [], [], "PwC")
+    assert cache.get("Who audits Tesla?", QUERY, [], []) is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["items"] == 0
+
+def test_least_recently_used_is_evicted():
+    cache = SemanticAnswerCache(max_items=2)
+    cache.put("a", [1, 0, 0], [], [], "A")
+    cache.put("b", [0, 1, 0], [], [], "B")
+    assert cache.get("a", [1, 0, 0], [], []) == "A"
+    cache.put("c", [0, 0, 1], [], [], "C")
+    assert cache.get("b", [0, 1, 0], [], []) is None
+    assert cache.get("a", [1, 0, 0], [], []) == "A"
+    assert cache.stats()["evictions"] == 1
+
+    cache.clear()
+    assert cache.stats()["items"] == 0 and cache.get("c", [0, 0, 1], [], []) is None
@@ -0,0 +1,129 @@
+"""GraphBackend behaviour both backends must share, run against every backend in conftest.BACKENDS."""
+from conftest import await_indexes
+from utils.ingest import bulk_ingest
+
+def hits_by_label(graph) -> dict:
+    labels = {}
+    for element_id, (label, _) in graph.retrieve_node_versions().items():
+        labels.setdefault(label, []).append(element_id)
+    return labels
+
+def entity_ids(graph, label:str) -> dict:
+    return {name: element_id for entity_label, element_id, name in graph.retrieve_entity_names() if entity_label == label}
+
+def test_subgraph_rows_walk_back_to_the_report(graph, corpus):
+    bulk_ingest(graph, corpus)
+    hits = hits_by_label(graph)
+    assert {"Report", "Passage", "Opinion", "Audit"} <= hits.keys()
+
+    element_ids = [element_id for label in ("Report", "Passage", "Audit") for element_id in hits[label]]
+    rows = graph.fetch_subgraph_rows(element_ids)
+    assert rows.keys() == set(element_ids)
+
+    auditor_of = dict(zip(corpus['Company Name'], corpus['Auditor']))
+    for element_id, row in rows.items():
+        assert row["company"] in auditor_of
+        assert row["auditors"] == [auditor_of[row["company"]]]
+        assert row["report_key"] is not None
+        assert f"To the Board of {row['company']}" in row["report_text"]
+        assert row["opinion"] is not None and row["audits"]
+        if row["label"] == "Passage":
+            assert isinstance(row["hit_index"], int)
+            assert row["hit_text"] in row["report_text"]
+        if row["label"] == "Audit":
+            assert row["hit_name"] and row["hit_audit_opinion"]
+
+def test_subgraph_rows_skip_unknown_ids(graph, corpus):
+    bulk_ingest(graph, corpus)
+    report = hits_by_label(graph)["Report"][0]
+    missing = "999999" if not hasattr(graph, "driver") else "4:00000000-0000-0000-0000-000000000000:999999"
+    assert graph.fetch_subgraph_rows([report, missing]).keys() == {report}
+
+def test_passages_are_grouped_by_report(graph, corpus):
+    bulk_ingest(graph, corpus)
+    passages = hits_by_label(graph)["Passage"]
+    rows = graph.fetch_subgraph_rows(passages)
+    report_key = rows[passages[0]]["report_key"]
+    same_report = [element_id for element_id in passages if rows[element_id]["report_key"] == report_key]
+    other = next(element_id for element_id in passages if rows[element_id]["report_key"] != report_key)
+    assert len(same_report) > 1
+
+    # Ranked with another report's passage in between and the report's passages out of order.
+    records = graph.fetch_evidence([same_report[-1], other, *same_report[:-1]], k=5)
+    assert [record['ReportKey'] for record in records] == [report_key, rows[other]["report_key"]]
+
+    grouped = records[0]
+    indexes = [index for index, _ in grouped['Passages']]
+    assert indexes == sorted(rows[element_id]["hit_index"] for element_id in same_report)
+    assert grouped['ReportText'] == "\n...\n".join(text for _, text in grouped['Passages'])
+    assert sum(edge[1] == "HAS_PASSAGE" for edge in grouped['Edges']) == len(same_report)
+    # The company, auditor and audit edges are shared by every passage and kept once.
+    single = graph.fetch_subgraphs([same_report[0]])[0]
+    assert [edge for edge in grouped['Edges'] if edge[1] != "HAS_PASSAGE"] == [edge for edge in single['Edges'] if edge[1] != "HAS_PASSAGE"]
+
+def test_audit_relationships(graph, corpus):
+    bulk_ingest(graph, corpus)
+    auditors, companies = entity_ids(graph, "Auditor"), entity_ids(graph, "Company")
+    auditor = "assurance management llp"
+    clients = sorted(corpus['Company Name'][corpus['Auditor'] == auditor])
+
+    relationships = graph.audit_relationships(auditor_ids=[auditors[auditor]])
+    assert [row['company'] for row in relationships] == clients
+    assert all(row['auditor'] == auditor and row['reports'] == 1 for row in relationships)
+    assert {row['company_id'] for row in relationships} == {companies[company] for company in clients}
+
+    # With both sides given, only the pairs between them.
+    pair = graph.audit_relationships(auditor_ids=list(auditors.values()), company_ids=[companies[clients[0]]])
+    assert [(row['auditor'], row['company']) for row in pair] == [(auditor, clients[0])]
+    assert graph.audit_relationships() == []
+
+def test_name_lookup_tolerates_typos(graph, corpus):
+    bulk_ingest(graph, corpus)
+    await_indexes(graph)
+
+    companies = graph.retrive_all_likable_names("Standards Postion 2", "Company", limit=3)
+    assert companies[0]['name'] == "Standards Position 2 Inc."
+    assert companies[0]['Id'] == entity_ids(graph, "Company")["Standards Position 2 Inc."]
+
+    auditors = graph.retrive_all_likable_names("asurance managment", "Auditor", limit=3)
+    assert auditors[0]['name'] == "assurance management llp"
+
+def test_repeated_batches_do_not_duplicate(graph, corpus):
+    bulk_ingest(graph, corpus)
+    await_indexes(graph)
+    nodes, names = graph.count_nodes_with_embeddings(), sorted(graph.retrieve_entity_names())
+    auditor_ids = [element_id for label, element_id, _ in names if label == "Auditor"]
+    relationships = graph.audit_relationships(auditor_ids=auditor_ids)
+    rows = graph.fetch_subgraph_rows(hits_by_label(graph)["Report"])
+
+    bulk_ingest(graph, corpus)
+    bulk_ingest(graph, corpus, write_batch_size=5)
+
+    assert graph.count_nodes_with_embeddings() == nodes
+    assert sorted(graph.retrieve_entity_names()) == names
+    assert graph.audit_relationships(auditor_ids=auditor_ids) == relationships
+    assert graph.fetch_subgraph_rows(list(rows)) == rows
+
+def test_index_sync_pulls_only_changes(graph, corpus, tmp_path):
+    graph.snapshot_dir = str(tmp_path / "index")
+    bulk_ingest(graph, corpus.iloc[:8])
+    first = graph.ensure_index()
+    assert set(first.node_ids) == set(graph.retrieve_node_versions())
+
+    # New companies, and a changed report for one that is already indexed.
+    changed = corpus.iloc[8:].copy()
+    changed.loc[changed.index[0], 'Company Name'] = corpus['Company Name'].iloc[0]
+    changed.loc[changed.index[0], 'Report'] += "\nRestated."
+    bulk_ingest(graph, changed)
+
+    # Reloaded from the snapshot, then brought up to date incrementally.
+    graph.invalidate_index()
+    graph.refresh_index()
+    synced = graph.vector_index
+    assert synced is not first
+    assert sorted(synced.node_ids) == sorted(graph.retrieve_node_versions())
+    assert synced.watermark > first.watermark
+
+    restated = changed['Report'].iloc[0]
+    hits = graph.search_nodes(graph.embedder.embed_text(restated), distance=1e-3, k=1, labels=["Report"])
+    assert graph.fetch_subgraph_rows(hits)[hits[0]]["report_text"] == restated
@@ -0,0 +1,60 @@
+"""The chat turn pipeline, offline: a fake embedder without a cache (so every embedding is an API call), a stub LLM and an SQLite graph."""
+import pytest
+import chatbot_util
+from benchmarks.fakes import FakeEmbedder, StubLLM
+from utils import metrics
+from utils.engine import RetrievalEngine
+from utils.ingest import bulk_ingest
+from utils.query_classifer import general_queries
+from utils.sqlite_graph import SQLiteGraph
+
+class StubClassifier:
+    def __init__(self, route):
+        self.route = route
+
+    def classify(self, query:str):
+        return self.route
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch, corpus):
+    graph = SQLiteGraph(str(tmp_path / "graph.sqlite3"), embedder=FakeEmbedder(16, use_cache=False))
+    bulk_ingest(graph, corpus)
+    engine = RetrievalEngine(db=graph, ai=StubLLM(), phrase_structured=False)
+    engine.classifier = StubClassifier(None)
+    monkeypatch.setattr(chatbot_util, "get_engine", lambda: engine)
+    yield engine
+    engine.close()
+
+def streamed(query:str, history:list, records):
+    chunks, records, latency = chatbot_util.get_response_stream(query, history, records)
+    answer = "".join(chunks)
+    return answer, records, latency['breakdown']['counters']
+
+def answered(engine, query:str, history:list, records):
+    turn = metrics.Trace()
+    with turn.activate():
+        answer, records = engine.run(chatbot_util.aget_response(query, history, records))
+    return answer, records, turn.breakdown()['counters']
+
+@pytest.mark.parametrize("respond", [lambda engine, *turn: streamed(*turn), answered], ids=["stream", "async"])
+def test_general_turns_never_embed_the_query(engine, respond):
+    engine.classifier.route = general_queries.name
+    answer, records, counters = respond(engine, "Hi", [], None)
+    assert answer and records == []
+    assert counters.get("embedding_api_calls", 0) == 0
+
+    # A follow-up reuses the (empty) evidence of the session's first turn and is not classified.
+    engine.classifier.route = None
+    answer, records, counters = respond(engine, "Thanks!", [{'user': "Hi", 'ai': answer}], records)
+    assert answer and records == []
+    assert counters.get("embedding_api_calls", 0) == 0
+    assert engine.answers.stats()["items"] == 0
+
+@pytest.mark.parametrize("respond", [lambda engine, *turn: streamed(*turn), answered], ids=["stream", "async"])
+def test_turns_with_evidence_use_the_answer_cache(engine, respond):
+    history = [{'user': "Hi", 'ai': "Hello"}]
+    records = engine.db.fetch_evidence([next(iter(engine.db.retrieve_node_versions()))])
+    answer, _, counters = respond(engine, "What was the opinion?", history, records)
+    assert counters["embedding_api_calls"] == 1
+    assert engine.answers.get("What was the opinion?", engine.db.embedder.embed_query("What was the opinion?"),
+                              chatbot_util.evidence_ids(records), history) == answer
@@ -0,0 +1,55 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.conversation_memory import RollingSummaryMemory
+
+def turns(count:int, start:int = 0) -> list:
+    return [{'user': f"question {i}", 'ai': f"answer {i}"} for i in range(start, start + count)]
+
+class RecordingLLM:
+    def __init__(self, release:threading.Event = None):
+        self.calls = []
+        self.release = release
+
+    def complete(self, prompt:str, model:str = "gpt-3.5-turbo", max_token:int = 4000):
+        if self.release:
+            self.release.wait(5)
+        self.calls.append((prompt, max_token))
+        return f"summary {len(self.calls)}"
+
+def test_short_conversations_are_sent_verbatim():
+    memory, ai = RollingSummaryMemory(keep_turns=4), RecordingLLM()
+    history = turns(4)
+    memory.update(history, ai)
+    assert ai.calls == []
+    assert memory.context(history) == ("", history)
+
+def test_older_turns_are_folded_into_the_summary():
+    memory, ai = RollingSummaryMemory(keep_turns=2, summary_tokens=300), RecordingLLM()
+    history = turns(5)
+    memory.update(history, ai)
+    assert memory.context(history) == ("summary 1", history[3:])
+
+    prompt, max_token = ai.calls[0]
+    assert max_token == 300
+    assert "(none)" in prompt and "question 2" in prompt and "question 3" not in prompt
+    assert f"at most {memory.summary_words} words" in prompt and memory.summary_words < 300
+
+    # The next update only sends the new turns, with the summary so far.
+    history += turns(2, start=5)
+    memory.update(history, ai)
+    assert memory.context(history) == ("summary 2", history[5:])
+    assert "summary 1" in ai.calls[1][0] and "question 2" not in ai.calls[1][0]
+
+def test_turns_stay_verbatim_until_the_background_update_lands():
+    release = threading.Event()
+    memory, ai = RollingSummaryMemory(keep_turns=1), RecordingLLM(release)
+    history = turns(3)
+    with ThreadPoolExecutor(1) as executor:
+        future = memory.update(history, ai, executor)
+        assert memory.context(history) == ("", history)
+        # At most one update in flight per session.
+        assert memory.update(history + turns(1, start=3), ai, executor) is None
+        release.set()
+        future.result()
+    assert memory.context(history) == ("summary 1", history[2:])
+    assert len(ai.calls) == 1
@@ -0,0 +1,71 @@
+import pytest
+from utils.entity_resolver import EntityResolver, TrigramIndex, lucene_fuzzy_query
+from utils.structured import unanswerable_words
+
+NAMES = {
+    "Company": ["Earthstone Energy, Inc.", "Comstock Resources Inc", "Adams Resources & Energy, Inc.", "Tesla, Inc.",
+                "American Airlines Group Inc.", "American Express Co", "Apple Inc."],
+    "Auditor": ["Deloitte & Touche LLP", "Deloitte LLP", "KPMG LLP", "Ernst & Young LLP"],
+}
+
+class NamesHandler:
+    def retrieve_entity_names(self):
+        return [(label, f"{label}-{i}", name) for label, names in NAMES.items() for i, name in enumerate(names)]
+
+@pytest.fixture(scope="module")
+def resolver():
+    resolver = EntityResolver()
+    resolver.sync(NamesHandler())
+    return resolver
+
+def mentioned(resolver, text:str) -> dict:
+    return {label: sorted(match['name'] for match in matches) for label, matches in resolver.find_mentions(text).items()}
+
+def test_trigram_index_search_add_remove():
+    index = TrigramIndex()
+    for element_id, name in enumerate(NAMES["Auditor"]):
+        index.add(str(element_id), name)
+    assert len(index) == 4
+
+    assert index.search("Delotte", limit=2)[0]['name'] in ("Deloitte LLP", "Deloitte & Touche LLP")
+    assert index.search("kpmg")[0] == {'name': "KPMG LLP", 'Id': "2", 'score': 1.0}
+    assert index.search("zzzz") == []
+
+    index.add("2", "KPMG Audit Plc")
+    assert index.search("kpmg")[0]['name'] == "KPMG Audit Plc"
+    index.remove("2")
+    assert len(index) == 3 and index.search("kpmg") == []
+
+def test_unknown_label(resolver):
+    with pytest.raises(ValueError):
+        resolver.resolve("Tesla", "Person")
+
+def test_lucene_query_escapes_and_fuzzes_terms():
+    assert lucene_fuzzy_query("Ernst & Young") == "(ernst~ OR ernst*) AND (young~ OR young*)"
+    assert lucene_fuzzy_query("AT&T") == "at AND t"
+
+@pytest.mark.parametrize("text, companies, auditors", [
+    ("Which companies does Deloitte audit?", [], ["Deloitte & Touche LLP", "Deloitte LLP"]),
+    ("Is Tesla audited by Delotte?", ["Tesla, Inc."], ["Deloitte & Touche LLP", "Deloitte LLP"]),
+    ("Who audits American Airlines?", ["American Airlines Group Inc."], []),
+    ("How many auditors does Apple have?", ["Apple Inc."], []),
+    # Generic words alone name nobody.
+    ("Which auditor audits the energy company?", [], []),
+    ("Who audits companies in the resources sector?", [], []),
+])
+def test_find_mentions(resolver, text, companies, auditors):
+    assert mentioned(resolver, text) == {"Company": companies, "Auditor": auditors}
+
+def test_mention_score_needs_a_distinctive_word(resolver):
+    assert resolver.mention_score("energy", "Earthstone Energy, Inc.") == (0.0, ())
+    score, tokens = resolver.mention_score("earthstone", "Earthstone Energy, Inc.")
+    assert 0.5 < score < 1 and tokens == ("earthstone",)
+    assert resolver.mention_score("tesla", "Tesla, Inc.") == (1.0, ("tesla",))
+
+@pytest.mark.parametrize("text, words", [
+    ("Which companies does Deloitte audit?", []),
+    ("Which companies did Deloitte audit in 2020?", ["in", "2020"]),
+    ("List all audit reports for Tesla", ["reports"]),
+])
+def test_unanswerable_words(resolver, text, words):
+    assert unanswerable_words(text, resolver.find_mentions(text)) == words
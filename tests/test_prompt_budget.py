@@ -0,0 +1,49 @@
+from utils.prompt_budget import PromptBudget, count_tokens, select_passages
+
+MODEL = "gpt-3.5-turbo-0613"   # 4,096 token window, so long inputs have to be trimmed
+FILLER = " ".join(["The financial statements present fairly, in all material respects, the financial position."] * 8)
+
+def template(query:str, records:list, general_question:bool) -> str:
+    evidence = "\n\n".join(f"Company: {record['CompanyName']}\nReport: {record['ReportText']}" for record in records)
+    return f"Answer from the records only.\nQuestion: {query}\n{evidence}"
+
+def report(paragraphs:int, key_paragraph:int) -> str:
+    return "\n".join("Goodwill impairment was tested." if i == key_paragraph else FILLER for i in range(paragraphs))
+
+def test_select_passages_keeps_related_paragraphs_in_order():
+    assert select_passages("Short report.", "goodwill", 100, MODEL) == "Short report."
+
+    selected = select_passages(report(40, key_paragraph=20), "goodwill impairment", 200, MODEL)
+    assert count_tokens(selected, MODEL) <= 200
+    lines = selected.split("\n")
+    assert "Goodwill impairment was tested." in lines
+    # Ties go to earlier paragraphs; everything left out is marked.
+    assert lines[0] == FILLER and lines.index("...") < lines.index("Goodwill impairment was tested.") and lines[-1] == "..."
+
+def test_select_passages_truncates_a_paragraph_that_cannot_fit():
+    selected = select_passages(FILLER, "financial", 20, MODEL)
+    assert selected.endswith(" ...") and count_tokens(selected, MODEL) <= 22
+
+def test_trim_history_keeps_the_latest_turns():
+    budget = PromptBudget(MODEL)
+    history = [{'user': f"question {i} " + FILLER, 'ai': "answer"} for i in range(20)]
+    kept, used = budget.trim_history(history, 500)
+    assert kept == history[-len(kept):] and 0 < len(kept) < 20
+    assert used <= 500
+
+def test_build_fits_the_window():
+    budget = PromptBudget(MODEL, max_output_tokens=4000)
+    assert budget.output_tokens == 1024
+    records = [{'CompanyName': name, 'ReportText': report(60, key_paragraph=30)} for name in ("Tesla, Inc.", "Apple Inc.")]
+    history = [{'user': "question " + FILLER, 'ai': "answer " + FILLER} for _ in range(20)]
+
+    prompt, kept, breakdown = budget.build("goodwill impairment", records, history, template, summary="Earlier: Tesla.")
+    assert breakdown["total"] == breakdown["instructions"] + breakdown["history"] + breakdown["evidence"]
+    assert breakdown["total"] <= breakdown["window"] - breakdown["output"]
+    assert len(kept) < len(history)
+    assert prompt.count("Goodwill impairment was tested.") == 2
+
+def test_general_questions_are_not_trimmed():
+    records = [{'CompanyName': "Tesla, Inc.", 'ReportText': report(60, key_paragraph=30)}]
+    prompt, _, _ = PromptBudget(MODEL).build("Hello", records, [], template, general_question=True)
+    assert prompt.count(FILLER) == 59
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from utils.vector_codec import CODECS, decode, encode, encoded_size
+
+VECTOR = np.random.default_rng(0).normal(size=64).astype(np.float32)
+
+@pytest.mark.parametrize("codec, tolerance", [("float32", 0), ("float16", 1e-2), ("int8", 2e-2)])
+def test_round_trip(codec, tolerance):
+    packed = encode(VECTOR, codec)
+    assert len(packed) == encoded_size(len(VECTOR), codec)
+    decoded = decode(packed)
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, VECTOR, atol=tolerance * np.abs(VECTOR).max())
+
+def test_sizes_shrink_with_precision():
+    sizes = [encoded_size(1536, codec) for codec in CODECS]
+    assert sizes == sorted(sizes, reverse=True)
+    assert encoded_size(1536, "int8") - encoded_size(0, "int8") == 1536
+
+def test_int8_handles_zero_vector():
+    np.testing.assert_array_equal(decode(encode(np.zeros(8), "int8")), np.zeros(8))
+
+def test_decode_accepts_float_lists_and_memoryviews():
+    np.testing.assert_array_equal(decode(VECTOR.tolist()), VECTOR)
+    np.testing.assert_array_equal(decode(memoryview(encode(VECTOR))), VECTOR)
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        encode(VECTOR, "bfloat16")
@@ -0,0 +1,178 @@
+import json
+import os
+import numpy as np
+import pytest
+from utils.vector_index import CURRENT, INDEX_TYPES, PartitionedIndex, VectorIndex, current_snapshot
+
+DIMENSION = 16
+# Small enough to keep the tests fast, large enough for PQ to train (PQ_MIN_TRAINING).
+CONFIG = {"nlist": 8, "nprobe": 8, "pq_m": 4, "rerank": 300}
+
+def rows(count:int, seed:int = 0):
+    vectors = np.random.default_rng(seed).normal(size=(count, DIMENSION)).astype(np.float32)
+    return [f"n{seed}-{i}" for i in range(count)], vectors
+
+def nearest(index:VectorIndex, vector) -> str:
+    _, positions = index.search(vector, 1)
+    return index.node_ids[positions[0]]
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_search_finds_the_row_itself(index_type):
+    node_ids, vectors = rows(300)
+    index = VectorIndex(node_ids, vectors, index_type=index_type, **CONFIG)
+    assert len(index) == 300
+    for row in (0, 150, 299):
+        distances, positions = index.search(vectors[row], 3)
+        assert node_ids[positions[0]] == node_ids[row]
+        assert distances[0] == pytest.approx(0, abs=1e-3)
+        assert list(distances) == sorted(distances)
+
+def test_cosine_distances_are_squared_l2_of_unit_vectors():
+    node_ids, vectors = rows(50)
+    index = VectorIndex(node_ids, vectors, metric="cosine")
+    query = vectors[0] * 3
+    distances, positions = index.search(query, 5)
+    unit = vectors[positions] / np.linalg.norm(vectors[positions], axis=1, keepdims=True)
+    expected = 2 - 2 * unit @ (query / np.linalg.norm(query))
+    np.testing.assert_allclose(distances, expected, atol=1e-5)
+
+def test_empty_index_searches_nothing():
+    distances, positions = VectorIndex().search(np.zeros(DIMENSION), 3)
+    assert len(distances) == len(positions) == 0
+
+def test_unknown_settings():
+    with pytest.raises(ValueError):
+        VectorIndex(index_type="annoy")
+    with pytest.raises(ValueError):
+        VectorIndex(metric="dot")
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_apply_changes(index_type):
+    node_ids, vectors = rows(300)
+    index = VectorIndex(node_ids, vectors, watermark=1, index_type=index_type, **CONFIG)
+    _, fresh = rows(2, seed=1)
+
+    changed = index.apply_changes([(node_ids[0], fresh[0]), ("new", fresh[1])], {node_ids[1]}, watermark=2)
+    assert changed.watermark == 2
+    assert len(changed) == 300
+    assert set(changed.live()[0]) == set(node_ids[2:]) | {node_ids[0], "new"}
+    assert nearest(changed, fresh[0]) == node_ids[0]
+    assert nearest(changed, fresh[1]) == "new"
+    assert nearest(changed, vectors[1]) != node_ids[1]
+    # Applied in place, without retraining, and only HNSW keeps the removed rows in its graph.
+    assert changed.dead == 2 and changed.trained_rows == 300
+    assert changed.tombstones == (2 if index_type == "hnsw" else 0)
+
+    # The original keeps serving the old vectors.
+    assert len(index) == 300 and nearest(index, vectors[1]) == node_ids[1]
+
+def test_removed_rows_past_the_limit_compact_the_partition():
+    node_ids, vectors = rows(100)
+    index = VectorIndex(node_ids, vectors, index_type="hnsw")
+    changed = index.apply_changes([], set(node_ids[:30]), watermark=1)
+    assert changed.dead == 0 and changed.node_ids == node_ids[30:]
+    assert nearest(changed, vectors[50]) == node_ids[50]
+
+def test_trained_index_retrains_once_it_doubles():
+    node_ids, vectors = rows(100)
+    index = VectorIndex(node_ids, vectors, index_type="ivf", **CONFIG)
+    grown = index.apply_changes(list(zip(*rows(80, seed=1))), set(), watermark=1)
+    assert grown.trained_rows == 100
+    retrained = grown.apply_changes(list(zip(*rows(40, seed=2))), set(), watermark=2)
+    assert retrained.trained_rows == 220 and len(retrained) == 220
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_snapshot_round_trip(tmp_path, index_type):
+    node_ids, vectors = rows(300)
+    index = VectorIndex(node_ids, vectors, watermark=7, index_type=index_type, **CONFIG)
+    index = index.apply_changes([], {node_ids[3]}, watermark=8)
+    index.save(str(tmp_path))
+
+    loaded = VectorIndex.load(str(tmp_path), index_type=index_type, **CONFIG)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert (loaded.watermark, loaded.node_ids, loaded.dead, loaded.trained_rows) == (8, index.node_ids, 1, 300)
+    assert nearest(loaded, vectors[100]) == node_ids[100]
+
+    # A memory-mapped index accepts changes too, and is left as it was.
+    _, fresh = rows(1, seed=1)
+    changed = loaded.apply_changes([("new", fresh[0])], set(), watermark=9)
+    assert nearest(changed, fresh[0]) == "new"
+    assert "new" not in loaded.node_ids
+
+def test_snapshot_versions_are_swapped_atomically(tmp_path):
+    node_ids, vectors = rows(20)
+    for watermark in range(3):
+        VectorIndex(node_ids, vectors, watermark).save(str(tmp_path))
+    with open(tmp_path / CURRENT) as f:
+        current = f.read()
+
+    versions = sorted(name for name in os.listdir(tmp_path) if name.startswith("v"))
+    # The current version and the one it replaced, which readers may still have mapped.
+    assert len(versions) == 2 and versions[-1] == current
+    assert current_snapshot(str(tmp_path)) == str(tmp_path / current)
+    assert VectorIndex.load(str(tmp_path)).watermark == 2
+
+def test_snapshot_cleanup_keeps_current_and_previous_whatever_their_names(tmp_path):
+    node_ids, vectors = rows(20)
+    VectorIndex(node_ids, vectors, 0).save(str(tmp_path))
+    # The current snapshot was copied in from a host whose clock is ahead, next to a stale leftover.
+    os.rename(current_snapshot(str(tmp_path)), tmp_path / "v99999999999999999999")
+    with open(tmp_path / CURRENT, "w") as f:
+        f.write("v99999999999999999999")
+    os.makedirs(tmp_path / "v1")
+
+    VectorIndex(node_ids, vectors, 1).save(str(tmp_path))
+    current = os.path.basename(current_snapshot(str(tmp_path)))
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("v")) == sorted([current, "v99999999999999999999"])
+    assert VectorIndex.load(str(tmp_path)).watermark == 1
+
+def test_snapshot_missing_or_outdated(tmp_path):
+    assert VectorIndex.load(str(tmp_path)) is None
+
+    node_ids, vectors = rows(20)
+    VectorIndex(node_ids, vectors).save(str(tmp_path))
+    meta_path = os.path.join(current_snapshot(str(tmp_path)), "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    with open(meta_path, "w") as f:
+        json.dump(dict(meta, version=1), f)
+    assert VectorIndex.load(str(tmp_path)) is None
+
+def test_snapshot_with_other_build_settings_is_rebuilt(tmp_path):
+    node_ids, vectors = rows(300)
+    index = VectorIndex(node_ids, vectors, index_type="flat").apply_changes([], {node_ids[0]}, watermark=3)
+    index.save(str(tmp_path))
+
+    rebuilt = VectorIndex.load(str(tmp_path), index_type="hnsw")
+    assert rebuilt.config["index_type"] == "hnsw"
+    assert rebuilt.node_ids == node_ids[1:] and rebuilt.dead == 0 and rebuilt.watermark == 3
+    assert nearest(rebuilt, vectors[10]) == node_ids[10]
+
+def test_partitioned_index():
+    reports, report_vectors = rows(40, seed=0)
+    audits, audit_vectors = rows(40, seed=1)
+    nodes = [(node_id, "Report", vector) for node_id, vector in zip(reports, report_vectors)]
+    nodes += [(node_id, "Audit", vector) for node_id, vector in zip(audits, audit_vectors)]
+    index = PartitionedIndex.from_nodes(nodes, watermark=1)
+    assert len(index) == 80
+
+    assert index.search(audit_vectors[5], 1)[0][1] == audits[5]
+    assert all(node_id in reports for _, node_id in index.search(audit_vectors[5], 3, labels=["Report"]))
+    # Unknown labels fall back to every partition.
+    assert index.search(audit_vectors[5], 1, labels=["Passage"])[0][1] == audits[5]
+
+    _, fresh = rows(1, seed=2)
+    changed = index.apply_changes([("passage", "Passage", fresh[0])], {audits[0]}, watermark=2)
+    assert changed.partitions["Report"] is index.partitions["Report"]
+    assert set(changed.node_ids) == (set(reports) | set(audits[1:]) | {"passage"})
+    assert changed.search(fresh[0], 1, labels=["Passage"])[0][1] == "passage"
+
+def test_partitioned_snapshot(tmp_path):
+    reports, report_vectors = rows(30, seed=0)
+    nodes = [(node_id, "Report", vector) for node_id, vector in zip(reports, report_vectors)]
+    PartitionedIndex.from_nodes(nodes, watermark=5, index_type="ivf", nlist=4).save(str(tmp_path))
+
+    loaded = PartitionedIndex.load(str(tmp_path), index_type="ivf", nlist=4)
+    assert loaded.watermark == 5 and sorted(loaded.node_ids) == sorted(reports)
+    assert loaded.search(report_vectors[7], 1)[0][1] == reports[7]
+    assert PartitionedIndex.load(str(tmp_path / "missing")) is None
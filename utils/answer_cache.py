@@ -0,0 +1,106 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from .embedding_cache import normalize_text
+from . import metrics
+
+def history_digest(history:list) -> str:
+    """Hash of the conversation so far (user and ai text only), so answers never leak between contexts."""
+    turns = [[turn.get('user'), turn.get('ai')] for turn in history or [] if isinstance(turn, dict)]
+    return hashlib.sha256(json.dumps(turns).encode("utf-8")).hexdigest()
+
+def context_key(evidence_ids:list, history:list) -> str:
+    """Answers are only shared between queries that saw the same evidence, in the same order, after the same history."""
+    return hashlib.sha256(json.dumps([list(evidence_ids), history_digest(history)]).encode("utf-8")).hexdigest()
+
+class SemanticAnswerCache:
+    """
+    Cache of generated answers, matched on query meaning rather than exact text.
+
+    An answer is reused when a new query's embedding has cosine similarity of at least `threshold`
+    with a cached query that had the same context (evidence elementIds and chat history).
+    Entries expire after `ttl_seconds`; beyond `max_items` the least recently used are evicted.
+    Safe to share between threads.
+    """
+    def __init__(self, threshold:float = 0.95, ttl_seconds:float = 3600, max_items:int = 1024):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self.entries = OrderedDict()   # (context_key, normalised query) -> (unit vector, answer, expires_at)
+        self.by_context = {}           # context_key -> set of entry keys
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, key):
+        self.entries.pop(key, None)
+        keys = self.by_context.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_context[key[0]]
+
+    def get(self, query:str, query_embedding, evidence_ids:list, history:list):
+        """The cached answer for a close enough query in the same context, or None."""
+        context = context_key(evidence_ids, history)
+        vector = self._unit(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for key in list(self.by_context.get(context, ())):
+                cached_vector, _, expires_at = self.entries[key]
+                if expires_at <= now:
+                    self._drop(key)
+                    self.expired += 1
+                    continue
+                score = 1.0 if key[1] == normalize_text(query) else float(cached_vector @ vector)
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                metrics.increment("answer_cache_misses")
+                return None
+            self.hits += 1
+            metrics.increment("answer_cache_hits")
+            self.entries.move_to_end(best_key)
+            return self.entries[best_key][1]
+
+    def put(self, query:str, query_embedding, evidence_ids:list, history:list, answer:str):
+        context = context_key(evidence_ids, history)
+        key = (context, normalize_text(query))
+        with self._lock:
+            self.entries[key] = (self._unit(query_embedding), answer, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            self.by_context.setdefault(context, set()).add(key)
+            while len(self.entries) > self.max_items:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.by_context.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "items": len(self.entries),
+        }
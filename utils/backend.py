@@ -0,0 +1,351 @@
+import os
+import threading
+import time
+import numpy as np
+from tqdm import tqdm
+from .utils import OpenAIEmbedder
+from .vector_index import PartitionedIndex
+from .vector_codec import CODECS, decode, encode
+from . import metrics
+
+class GraphBackend:
+    """
+    Storage for the audit graph: Company, Auditor, Report, Passage, Opinion and Audit nodes, their
+    relationships and embeddings.
+
+    The retrieval logic lives here and is shared by every backend: the FAISS index lifecycle,
+    search, evidence records, passage grouping and rendering. Backends implement the storage
+    operations at the bottom of the class. Neo4jHandler (utils/graph.py) talks to a Neo4j server;
+    SQLiteGraph (utils/sqlite_graph.py) is an embedded, in-process store for single-node deployments.
+    """
+    # Embeddings fetched per round-trip when the index is built from scratch.
+    load_batch_size = 5000
+
+    def __init__(self, embedder:OpenAIEmbedder = None, snapshot_dir:str = None, index_type:str = "flat", metric:str = "l2", search_backend:str = "faiss", storage:str = "float32", **index_params):
+        self.embedder = embedder if embedder else OpenAIEmbedder()
+
+        # Format embeddings are written in, see utils/vector_codec.py. Reads accept every format.
+        if storage not in CODECS:
+            raise ValueError(f"Unknown embedding storage '{storage}', expected one of {CODECS}")
+        self.storage = storage
+
+        # "faiss" searches the local index; other values are backend-native vector search (see vector_search_in_db).
+        self.search_backend = search_backend
+
+        self.snapshot_dir = snapshot_dir
+        # Backend and recall/speed settings for VectorIndex, see utils/vector_index.py.
+        self.index_config = {"index_type": index_type, "metric": metric, **index_params}
+        self.vector_index = None
+        self._index_lock = threading.Lock()
+
+    def create_faiss_index(self):
+        """
+        Build the index from every embedding in the graph and write a fresh snapshot.
+
+        Embeddings are streamed in batches of `load_batch_size` and decoded straight into per-label
+        matrices sized from a count query, so only one copy of the vectors is ever held.
+        """
+        with metrics.span("index_build"):
+            counts = self.count_nodes_with_embeddings()
+            start = time.perf_counter()
+            with tqdm(total=sum(counts.values()), desc="Loading embeddings", unit="vec") as progress:
+                def batches():
+                    for batch in self.stream_nodes_with_embeddings(self.load_batch_size):
+                        yield [(node_id, label, decode(embeddings), updated_at) for node_id, label, embeddings, updated_at in batch]
+                        progress.update(len(batch))
+
+                vector_index = PartitionedIndex.from_stream(batches(), counts, **self.index_config)
+
+            seconds = time.perf_counter() - start
+            metrics.log_event("index_load", vectors=len(vector_index), seconds=round(seconds, 3),
+                              vectors_per_s=round(len(vector_index) / seconds, 1) if seconds else None)
+            if self.snapshot_dir:
+                vector_index.save(self.snapshot_dir)
+
+        # Swap in one assignment so concurrent searches never see a half-built index.
+        self.vector_index = vector_index
+
+    def sync_faiss_index(self):
+        """
+        Load the on-disk snapshot and pull only the nodes added, changed or deleted since its watermark.
+        Falls back to a full build when there is no usable snapshot.
+        """
+        with metrics.span("index_sync"):
+            vector_index = self.vector_index or (PartitionedIndex.load(self.snapshot_dir, **self.index_config) if self.snapshot_dir else None)
+            if vector_index is None:
+                self.create_faiss_index()
+                return
+
+            current = self.retrieve_node_versions()
+            known = set(vector_index.node_ids)
+            changed = [node_id for node_id, (_, updated_at) in current.items()
+                       if node_id not in known or (updated_at or 0) > vector_index.watermark]
+            deleted = known - current.keys()
+            watermark = max((updated_at or 0 for _, updated_at in current.values()), default=vector_index.watermark)
+
+            if changed or deleted:
+                upserts = [(node_id, label, decode(embeddings)) for node_id, label, embeddings in self.retrieve_nodes_with_embeddings(changed)]
+                vector_index = vector_index.apply_changes(upserts, deleted, watermark)
+                if self.snapshot_dir:
+                    vector_index.save(self.snapshot_dir)
+
+            self.vector_index = vector_index
+
+    def ensure_index(self) -> PartitionedIndex:
+        """Load the index once; concurrent callers wait for the first load instead of repeating it."""
+        if self.vector_index is None:
+            with self._index_lock:
+                if self.vector_index is None:
+                    self.sync_faiss_index()
+        return self.vector_index
+
+    def refresh_index(self, full:bool = False):
+        """Bring the index up to date with the graph, e.g. after new filings have been loaded."""
+        with self._index_lock:
+            if full:
+                self.create_faiss_index()
+            else:
+                self.sync_faiss_index()
+
+    def invalidate_index(self):
+        """Drop the in-memory index so the next query reloads it from the snapshot."""
+        with self._index_lock:
+            self.vector_index = None
+
+    def handle_query(self, query, distance=0.4, k:int = 2, labels:list = None, passages_per_report:int = 3, **search_params):
+        """
+        Retrieve the evidence records for the nearest embedded nodes.
+
+        `labels` restricts the search to those node-label partitions (e.g. ["Passage"]);
+        None searches every partition. Passage hits are grouped by report, so up to
+        k * passages_per_report nodes are searched for k records.
+        """
+        with metrics.span("handle_query"):
+            # Generate embedding for the query
+            query_embedding = self.embedder.embed_text(query)
+
+            top_nodes = self.search_nodes(query_embedding, distance, k * passages_per_report, labels, **search_params)
+
+            # Graph pictures are rendered lazily from record['Edges'] when the evidence is viewed, see utils/render.py.
+            return self.fetch_evidence(top_nodes, k)
+
+    def search_nodes(self, query_embedding:list, distance=0.4, k:int = 2, labels:list = None, **search_params) -> list:
+        """elementIds of the k nearest embedded nodes within `distance` of the query embedding."""
+        if self.search_backend != "faiss":
+            with metrics.span("search"):
+                hits = self.vector_search_in_db(query_embedding, k, labels)
+        else:
+            query_vector = np.array(query_embedding).reshape(1, -1)
+            vector_index = self.ensure_index()
+
+            # Perform FAISS search; search_params may override nprobe / ef_search for this call only
+            with metrics.span("search"):
+                hits = vector_index.search(query_vector, k, labels=labels, **search_params)
+        
+        # print(f" Nearest Embeddings (distance, id): {hits}")
+        
+        # Filter nodes based on similarity threshold
+        top_nodes = []
+        for similarity, node_id in hits:
+            if similarity <= distance:
+                top_nodes.append(node_id)
+
+        return top_nodes
+
+    def fetch_subgraphs(self, element_ids:list) -> list:
+        """
+        Fetch the Company -> Report -> Opinion -> Audit neighbourhood of every hit.
+
+        Each hit (a Passage, Report, Opinion or Audit) is walked back at most two hops to its Report, then one hop out to the company,
+        its auditors, the report's opinion and that opinion's audits. Returns one evidence record per hit, in the order of `element_ids`.
+        """
+        if not element_ids:
+            return []
+
+        with metrics.span("fetch_subgraphs"):
+            rows = self.fetch_subgraph_rows(list(element_ids))
+
+        return [self.subgraph_record(element_id, rows[element_id]) for element_id in element_ids if element_id in rows]
+
+    @staticmethod
+    def subgraph_record(element_id, row) -> dict:
+        """Turn one fetch_subgraphs row into the evidence record used by the prompt and the UI."""
+        audits = row["audits"]
+        if row["label"] == "Audit":
+            audit = {"name": row["hit_name"], "opinion": row["hit_audit_opinion"]}
+        else:
+            audit = audits[0] if audits else {"name": None, "opinion": None}
+
+        result = {
+            'ElementId': element_id,
+            'CompanyName': row["company"],
+            'AuditorName': row["auditors"][0] if row["auditors"] else None,
+            'ReportKey': row["report_key"],
+            'ReportName': row["report_name"],
+            # A passage hit carries only the matching passage, not the whole report.
+            'ReportText': row["hit_text"] if row["label"] == "Passage" else row["report_text"],
+            'Opinion': row["opinion"],
+            'AuditName': audit["name"],
+            'AuditOpinion': audit["opinion"],
+        }
+
+        # Edges of the evidence graph as (start, relationship, end) display labels.
+        def node_label(label, name=None):
+            return f"{label} : {name}" if name else label
+
+        edges = []
+        if row["company"]:
+            company = node_label("Company", row["company"])
+            edges += [(node_label("Auditor", auditor), "AUDITS", company) for auditor in row["auditors"]]
+            if row["report_name"] is not None:
+                edges.append((company, "HAS_REPORT", node_label("Report", row["report_name"])))
+        if row["report_name"] is not None and row["opinion"] is not None:
+            edges.append((node_label("Report", row["report_name"]), "CONTAINS_OPINION", "Opinion"))
+        if row["opinion"] is not None:
+            edges += [("Opinion", "HAS_AUDIT", node_label("Audit", audit["name"])) for audit in audits]
+        if row["label"] == "Passage":
+            result['Passages'] = [(row["hit_index"], row["hit_text"])]
+            if row["report_name"] is not None:
+                edges.append((node_label("Report", row["report_name"]), "HAS_PASSAGE", f"Passage {row['hit_index']}"))
+        result['Edges'] = edges
+
+        return result
+
+    @staticmethod
+    def group_passages(records:list) -> list:
+        """
+        Merge passage records of the same report into one record, placed where the report's best passage
+        ranked. Its ReportText holds only the matching passages, in report order, joined by ellipses.
+        Records for other hits are returned as they are.
+        """
+        grouped, by_report = [], {}
+        for record in records:
+            if 'Passages' not in record or record['ReportKey'] is None:
+                grouped.append(record)
+                continue
+            if record['ReportKey'] not in by_report:
+                by_report[record['ReportKey']] = dict(record, Passages=[], Edges=list(record['Edges']))
+                grouped.append(by_report[record['ReportKey']])
+            merged = by_report[record['ReportKey']]
+            merged['Passages'] += record['Passages']
+            for edge in record['Edges']:
+                if edge not in merged['Edges']:
+                    merged['Edges'].append(edge)
+
+        for record in by_report.values():
+            record['Passages'].sort()
+            record['ReportText'] = "\n...\n".join(text for _, text in record['Passages'])
+        return grouped
+
+    def fetch_evidence(self, element_ids:list, k:int = 2) -> list:
+        """Evidence records for ranked hits: subgraphs fetched in one round-trip, passages grouped by report, top k."""
+        return self.group_passages(self.fetch_subgraphs(element_ids))[:k]
+
+    def retrace_path_and_visualize(self, element_ids):
+        """Evidence record, with PNG bytes of its graph under 'Graph', for a single hit."""
+        from .render import get_renderer
+        with metrics.span("retrace"):
+            records = self.fetch_subgraphs([element_ids])
+            if not records:
+                return None
+            result = records[0]
+            result['Graph'], _ = get_renderer().render(result['Edges'])
+            return result
+
+    def create_report_batch(self, rows:list):
+        """
+        Write Company, Auditor, Report and Opinion nodes plus their relationships for many rows in one transaction.
+        Each row carries company_name, auditor_name, report_name, report_text, report_embeddings, opinion and opinion_embeddings.
+        """
+        self.create_rows_batch(rows, [])
+
+    def create_audit_batch(self, audits:list):
+        """
+        Write Audit nodes and their Opinion links for many audits in one transaction.
+        Each audit carries opinion, opinion_embeddings, audit_name, audit_opinion and audit_embeddings.
+        """
+        self.create_rows_batch([], audits)
+
+    def pack_embeddings(self, embeddings):
+        """One embedding in the storage format."""
+        return encode(embeddings, self.storage)
+
+    def pack_batch(self, rows:list, audits:list):
+        """Copies of a create_rows_batch batch with every embedding in the storage format."""
+        pack = self.pack_embeddings
+        rows = [dict(row, report_embeddings=pack(row['report_embeddings']), opinion_embeddings=pack(row['opinion_embeddings']),
+                     passages=[dict(passage, embeddings=pack(passage['embeddings'])) for passage in row.get('passages', [])])
+                for row in rows]
+        audits = [dict(audit, opinion_embeddings=pack(audit['opinion_embeddings']), audit_embeddings=pack(audit['audit_embeddings']))
+                  for audit in audits]
+        return rows, audits
+
+    # Storage-specific operations, implemented by each backend.
+
+    def count_nodes_with_embeddings(self) -> dict:
+        """Map label -> number of embedded nodes, used to preallocate the index build."""
+        raise NotImplementedError
+
+    def stream_nodes_with_embeddings(self, batch_size:int):
+        """Yield lists of up to `batch_size` (element_id, label, embeddings, updated_at) for every embedded node, embeddings as stored (see vector_codec.decode)."""
+        raise NotImplementedError
+
+    def retrieve_node_versions(self) -> dict:
+        """Map element_id -> (label, updated_at) for every embedded node, without transferring the vectors."""
+        raise NotImplementedError
+
+    def retrieve_nodes_with_embeddings(self, element_ids:list) -> list:
+        """(element_id, label, embeddings) for the given nodes, embeddings as stored."""
+        raise NotImplementedError
+
+    def vector_search_in_db(self, query_embedding:list, k:int = 2, labels:list = None) -> list:
+        """Backend-native nearest-neighbour search, as (distance, element_id) pairs; used when search_backend is not "faiss"."""
+        raise NotImplementedError(f"{type(self).__name__} has no native vector search, use search_backend='faiss'")
+
+    def fetch_subgraph_rows(self, element_ids:list) -> dict:
+        """
+        Map element_id -> row for every hit that exists. A row has label, hit_name, hit_audit_opinion, hit_index,
+        hit_text, company, auditors, report_key, report_name, report_text, opinion and audits ([{name, opinion}]).
+        """
+        raise NotImplementedError
+
+    def retrive_all_likable_names(self, company_name, table:str = "Company", limit:int = 10) -> list:
+        """Ranked, typo-tolerant [{'name', 'Id', 'score'}] matches among Company or Auditor names."""
+        raise NotImplementedError
+
+    def retrieve_entity_names(self) -> list:
+        """(label, element_id, name) for every Company and Auditor."""
+        raise NotImplementedError
+
+    def audit_relationships(self, auditor_ids:list = None, company_ids:list = None) -> list:
+        """
+        Every AUDITS relationship of the given auditors or companies (of both: only the pairs between them), as
+        [{'auditor_id', 'auditor', 'company_id', 'company', 'reports'}] ordered by company, where `reports`
+        counts the company's HAS_REPORT reports.
+        """
+        raise NotImplementedError
+
+    def create_rows_batch(self, rows:list, audits:list):
+        """Upsert report rows and their audits atomically (see utils/ingest.py to_write_batches for the row shape)."""
+        raise NotImplementedError
+
+    def clear_database(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+def make_backend(name:str = None, **kwargs) -> GraphBackend:
+    """
+    The graph backend named by `name` or the GRAPH_BACKEND environment variable: "neo4j" (default)
+    or "sqlite", whose file is GRAPH_DB_PATH (default graph.sqlite3).
+    """
+    name = name or os.environ.get("GRAPH_BACKEND", "neo4j")
+    if name == "neo4j":
+        from .graph import Neo4jHandler
+        return Neo4jHandler(**kwargs)
+    if name == "sqlite":
+        from .sqlite_graph import SQLiteGraph
+        kwargs.setdefault("path", os.environ.get("GRAPH_DB_PATH", "graph.sqlite3"))
+        return SQLiteGraph(**kwargs)
+    raise ValueError(f"Unknown graph backend '{name}', expected 'neo4j' or 'sqlite'")
@@ -0,0 +1,69 @@
+import threading
+
+SUMMARY_PROMPT = """Conversation summary so far:
+{summary}
+
+New conversation turns:
+{turns}
+
+Rewrite the summary to cover the new turns as well, in at most {words} words. Be concise: keep company names, auditors, opinions and any facts the user asked about, and drop pleasantries and repetition."""
+
+def format_turns(turns:list) -> str:
+    return "\n".join(f"User: {turn.get('user')}\nAssistant: {turn.get('ai')}" for turn in turns)
+
+class RollingSummaryMemory:
+    """
+    Bounded conversation memory for one chat session: the last `keep_turns` turns verbatim, and
+    everything older folded into a running summary.
+
+    The summary is updated in the background after a turn, never while answering. Until an update
+    lands, turns it has not covered yet are passed on verbatim, so nothing is lost in between.
+    Keep one per session in the Streamlit session state.
+    """
+    def __init__(self, keep_turns:int = 4, summary_tokens:int = 400):
+        self.keep_turns = keep_turns
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.summarized_turns = 0
+        self.updating = False
+        self._lock = threading.Lock()
+
+    @property
+    def summary_words(self) -> int:
+        # About 0.75 words per token, with a third of the budget left as margin.
+        return self.summary_tokens // 2
+
+    def context(self, history:list):
+        """(summary, turns) to send with the next query: the summary and every turn it does not cover yet."""
+        with self._lock:
+            return self.summary, list(history[self.summarized_turns:])
+
+    def update(self, history:list, ai, executor=None):
+        """
+        Fold turns older than the last `keep_turns` into the summary with ai.complete, asking for a
+        summary well inside `summary_tokens` (the reply is cut off there) so it ends on a full sentence.
+        Runs on `executor` when given; at most one update per session is in flight.
+        """
+        with self._lock:
+            end = len(history) - self.keep_turns
+            if self.updating or end <= self.summarized_turns:
+                return None
+            self.updating = True
+            start, summary, turns = self.summarized_turns, self.summary, list(history[self.summarized_turns:end])
+
+        def fold():
+            try:
+                prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", turns=format_turns(turns), words=self.summary_words)
+                updated = ai.complete(prompt, max_token=self.summary_tokens)
+                with self._lock:
+                    # A session that was reset meanwhile keeps its new state.
+                    if updated and self.summarized_turns == start:
+                        self.summary = updated
+                        self.summarized_turns = end
+            finally:
+                self.updating = False
+
+        if executor is None:
+            fold()
+            return None
+        return executor.submit(fold)
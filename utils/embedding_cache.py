@@ -0,0 +1,119 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+def normalize_text(text:str) -> str:
+    """Canonical form used for cache keys: NFC unicode, collapsed whitespace, trimmed."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+def cache_key(model:str, text:str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by model name and a hash of the normalised text.
+
+    Lookups go to a bounded in-memory LRU first, then to a SQLite file that survives restarts
+    and is shared by the chat app and the ingestion scripts. Safe to use from several threads.
+    """
+    def __init__(self, path:str = "embedding_cache.sqlite3", max_memory_items:int = 4096):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.connection = None
+        if path:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+            )
+            self.connection.commit()
+
+    def _remember(self, key:str, vector:list):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model:str, texts:list) -> list:
+        """Cached vectors in the order of `texts`, with None for every miss."""
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+                    self.memory_hits += 1
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            if missing and self.connection is not None:
+                placeholders = ",".join("?" * len(missing))
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+
+            self.misses += sum(1 for key in keys if key not in found)
+
+        return [found.get(key) for key in keys]
+
+    def get(self, model:str, text:str):
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model:str, texts:list, vectors:list):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(model, text)
+                self._remember(key, list(vector))
+                rows.append((key, model, np.asarray(vector, dtype=np.float32).tobytes()))
+
+            if self.connection is not None and rows:
+                self.connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                self.connection.commit()
+
+    def put(self, model:str, text:str, vector:list):
+        self.put_many(model, [text], [vector])
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self.memory),
+        }
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache shared by every OpenAIEmbedder that is not given its own."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = EmbeddingCache()
+    return _default_cache
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from .entity_resolver import EntityResolver
+from .answer_cache import SemanticAnswerCache
+from . import metrics
+
+# The Neo4j driver, FAISS, LangChain/OpenAI, semantic-router and matplotlib are imported on first use,
+# so importing the engine (and the chat app) stays cheap.
+if TYPE_CHECKING:
+    from .backend import GraphBackend
+    from .utils import OpenAIChatResponse
+
+# Default for the route arguments below: the query has not been classified yet. None means it was, and matched no route.
+UNCLASSIFIED = object()
+
+class RetrievalEngine:
+    """
+    Long-lived retrieval engine shared by every chat session in the process.
+
+    Holds the graph backend (a pooled Neo4j driver or an embedded SQLite file, see utils/backend.py),
+    the FAISS index built from it and the chat client, so a chat turn only pays for the query itself,
+    or nothing beyond retrieval when a close enough question was already answered from the same evidence.
+    """
+    def __init__(self, db:"GraphBackend" = None, ai:"OpenAIChatResponse" = None, answers:SemanticAnswerCache = None, phrase_structured:bool = None):
+        if db is None:
+            from .backend import make_backend
+            db = make_backend()
+        if ai is None:
+            from .utils import OpenAIChatResponse
+            ai = OpenAIChatResponse()
+        self.db = db
+        self.ai = ai
+        # Answers shared between sessions for near-identical questions over the same evidence.
+        self.answers = answers if answers else SemanticAnswerCache()
+        # Structured answers (see astructured) are returned as they are, or with PHRASE_STRUCTURED_ANSWERS=1
+        # handed to the LLM as evidence to phrase.
+        self.phrase_structured = phrase_structured if phrase_structured is not None else bool(os.environ.get("PHRASE_STRUCTURED_ANSWERS"))
+        self.classifier = None
+        self._classifier_lock = threading.Lock()
+        self.resolver = None
+        self._resolver_lock = threading.Lock()
+
+        # One long-lived event loop for the async pipeline: pooled async HTTP clients stay bound to a
+        # single loop instead of a new one per asyncio.run(). Blocking work (Bolt, FAISS, rendering)
+        # runs on the shared thread pool.
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.executor)
+        threading.Thread(target=self.loop.run_forever, name="retrieval-loop", daemon=True).start()
+
+    def run(self, coroutine):
+        """Run a coroutine on the engine's event loop from synchronous code and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def get_classifier(self):
+        """The query classifier, built on first use; route utterance embeddings come from the embedding cache."""
+        if self.classifier is None:
+            with self._classifier_lock:
+                if self.classifier is None:
+                    from .query_classifer import load_classifer
+                    self.classifier = load_classifer()
+        return self.classifier
+
+    def classify(self, query:str):
+        """Route name for the query, or None when no route matches or the classifier is unavailable."""
+        try:
+            classifier = self.get_classifier()
+            with metrics.span("classify"):
+                return classifier.classify(query)
+        except Exception:
+            return None
+
+    async def aclassify(self, query:str):
+        """classify off the event loop."""
+        return await asyncio.to_thread(self.classify, query)
+
+    def handle_query(self, query:str, distance:float = 0.4, k:int = 2, **search_params):
+        """Search only the index partitions relevant to the query's route; search everything otherwise."""
+        from .query_classifer import partitions_for_route
+        labels = partitions_for_route(self.classify(query))
+        return self.db.handle_query(query, distance=distance, k=k, labels=labels, **search_params)
+
+    async def aretrieve(self, query:str, distance:float = 0.4, k:int = 2, passages_per_report:int = 3, route = UNCLASSIFIED, **search_params) -> list:
+        """
+        Async handle_query: the query is embedded once its route is known (callers classify first, see
+        chatbot_util.aroute), then the vector search and the single subgraph round-trip run off the event
+        loop on the pooled driver.
+        """
+        with metrics.span("retrieve"):
+            if route is UNCLASSIFIED:
+                route = await self.aclassify(query)
+            query_embedding = await self.db.embedder.aembed_query(query)
+            from .query_classifer import partitions_for_route
+            labels = partitions_for_route(route)
+            top_nodes = await asyncio.to_thread(self.db.search_nodes, query_embedding, distance, k * passages_per_report, labels, **search_params)
+            return await asyncio.to_thread(self.db.fetch_evidence, top_nodes, k)
+
+    def prerender(self, records:list):
+        """Render evidence graphs in the background so they are cached before the user opens them."""
+        from .render import get_renderer
+        renderer = get_renderer()
+        for record in records:
+            self.executor.submit(renderer.render, record['Edges'])
+
+    def get_resolver(self) -> EntityResolver:
+        """The Company/Auditor name index, loaded from the graph on first use."""
+        if self.resolver is None:
+            with self._resolver_lock:
+                if self.resolver is None:
+                    resolver = EntityResolver()
+                    resolver.sync(self.db)
+                    self.resolver = resolver
+        return self.resolver
+
+    def resolve_entity(self, name:str, label:str = "Company", limit:int = 10) -> list:
+        """Ranked, typo-tolerant Company/Auditor matches from the in-process trigram index."""
+        return self.get_resolver().resolve(name, label, limit)
+
+    async def astructured(self, query:str, route = UNCLASSIFIED):
+        """
+        (answer, records) for list, count and lookup questions about named companies and auditors,
+        answered from the AUDITS and HAS_REPORT relationships without embedding the query or searching
+        the index; None for every other question.
+
+        Without a route, names are resolved in-process first, so questions that name no known entity never
+        wait for the classifier. With one, other routes return before any name is resolved. Questions with
+        constraints these answers cannot express (a year, a sector, reports rather than auditors) also get None.
+        """
+        from .query_classifer import intent_for_route
+        with metrics.span("structured"):
+            if route is not UNCLASSIFIED and intent_for_route(route) is None:
+                return None
+
+            from .structured import structured_answer, structured_records, unanswerable_words
+            mentions = await asyncio.to_thread(self.get_resolver().find_mentions, query)
+            if not any(mentions.values()) or unanswerable_words(query, mentions):
+                return None
+
+            intent = intent_for_route(await self.aclassify(query) if route is UNCLASSIFIED else route)
+            if intent is None:
+                return None
+
+            auditor_ids = [mention['Id'] for mention in mentions["Auditor"]]
+            company_ids = [mention['Id'] for mention in mentions["Company"]]
+            rows = await asyncio.to_thread(self.db.audit_relationships, auditor_ids, company_ids)
+            metrics.increment("structured_answers")
+            return structured_answer(intent, mentions, rows), structured_records(rows)
+
+    def warm_up(self):
+        """Load the search index and the query classifier ahead of the first query."""
+        self.db.ensure_index()
+        try:
+            self.get_classifier()
+        except Exception:
+            pass
+
+    def refresh(self):
+        self.db.refresh_index()
+        if self.resolver is not None:
+            self.resolver.sync(self.db)
+        self.answers.clear()
+
+    def invalidate(self):
+        self.db.invalidate_index()
+        self.resolver = None
+        self.answers.clear()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.executor.shutdown(wait=False)
+        self.db.close()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> RetrievalEngine:
+    """Return the process-wide engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RetrievalEngine()
+    return _engine
+
+def current_engine():
+    """The process-wide engine if it has been created, without creating it."""
+    return _engine
+
+def reset_engine():
+    """Close the shared engine; the next call to get_engine() starts a fresh one."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.close()
+        _engine = None
@@ -0,0 +1,224 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+ENTITY_LABELS = ("Company", "Auditor")
+
+# Characters with a meaning in Lucene query syntax, escaped before fuzzy terms are built.
+LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)')
+
+def normalize_name(name:str) -> str:
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+
+def trigrams(name:str) -> set:
+    padded = f"  {normalize_name(name)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Words that describe the question rather than name an entity; a mention never starts or ends with one.
+QUERY_WORDS = set("""
+    a about all an and any are as at audit audited auditing auditor auditors audits be by can client clients companies
+    company count details did do does done engagement engagements every financial findings firm firms for from generated
+    give has have history how i in insight is it its last latest list many me my name named number of on opinion opinions
+    or our performed please provide report reporting reports reviewed show statement statements summarize summary tell
+    the their them these they this those to was were what which who whom whose with year you
+""".split())
+
+# Legal forms and fillers that say nothing about which entity a name is.
+NAME_FILLERS = set("""
+    and co company corp corporation formerly inc incorporated limited llc llp lp ltd of plc the
+""".split())
+
+# Industry and place words shared by many names. A mention made only of these ("the energy company",
+# "the resources sector") could be any of them, so it never resolves on its own.
+GENERIC_NAME_WORDS = set("""
+    aerospace air airlines america american apartments bancorp bank beverage brands capital communications
+    devices electric energy enterprises express financial first gas general global group health holdings
+    industries insurance international lines medical national new north northern oil pacific partners power
+    products properties railway resources services solutions south southern systems technologies technology
+    trust union united us usa
+""".split())
+
+def name_tokens(name:str) -> list:
+    """The words of a name that identify it: everything but legal forms and fillers."""
+    words = normalize_name(name).split()
+    return [word for word in words if word not in NAME_FILLERS] or words
+
+def token_similarity(word:str, token:str) -> float:
+    """1 for the same word, the trigram Dice coefficient for a likely typo of a longer word, else 0."""
+    if word == token:
+        return 1.0
+    if min(len(word), len(token)) < 4:
+        return 0.0
+    a, b = trigrams(word), trigrams(token)
+    dice = 2 * len(a & b) / (len(a) + len(b))
+    return dice if dice >= 0.5 else 0.0
+
+def mention_spans(text:str, max_words:int = 6):
+    """Word spans of `text` that could name a company or auditor, longest first, as (start, end, span) word offsets."""
+    words = normalize_name(text).split()
+    for size in range(min(max_words, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            span = words[start:start + size]
+            if span[0] in QUERY_WORDS or span[-1] in QUERY_WORDS or len(" ".join(span)) < 3:
+                continue
+            yield start, start + size, " ".join(span)
+
+def lucene_fuzzy_query(name:str) -> str:
+    """
+    Full-text query for a user-typed name: every term is escaped and matched fuzzily
+    (edit distance up to 2) or as a prefix, so "Delloite" still finds "Deloitte & Touche LLP".
+    """
+    terms = []
+    for term in normalize_name(name).split():
+        term = LUCENE_SPECIAL.sub(r"\\\1", term)
+        terms.append(f"({term}~ OR {term}*)" if len(term) > 3 else term)
+    return " AND ".join(terms)
+
+class TrigramIndex:
+    """
+    In-process fuzzy name index: an inverted index from character trigrams to entities.
+    Lookups only touch the postings of the query's trigrams instead of scanning every name.
+    """
+    def __init__(self):
+        self.names = {}      # element_id -> name
+        self.grams = {}      # element_id -> trigram set
+        self.postings = {}   # trigram -> set of element_ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, element_id:str, name:str):
+        if element_id in self.names:
+            self.remove(element_id)
+        grams = trigrams(name)
+        self.names[element_id] = name
+        self.grams[element_id] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(element_id)
+
+    def remove(self, element_id:str):
+        for gram in self.grams.pop(element_id, ()):
+            self.postings[gram].discard(element_id)
+        self.names.pop(element_id, None)
+
+    def search(self, name:str, limit:int = 10, min_score:float = 0.45) -> list:
+        """
+        Ranked [{'name', 'Id', 'score'}] matches. The score is the share of the query's trigrams found
+        in the name, tie-broken by overall similarity so shorter, closer names rank first.
+        """
+        query = trigrams(name)
+        if not query:
+            return []
+
+        shared = Counter()
+        for gram in query:
+            for element_id in self.postings.get(gram, ()):
+                shared[element_id] += 1
+
+        matches = []
+        for element_id, count in shared.items():
+            containment = count / len(query)
+            if containment < min_score:
+                continue
+            dice = 2 * count / (len(query) + len(self.grams[element_id]))
+            matches.append((containment, dice, element_id))
+
+        matches.sort(reverse=True)
+        return [{'name': self.names[element_id], 'Id': element_id, 'score': containment}
+                for containment, _, element_id in matches[:limit]]
+
+class EntityResolver:
+    """Company and Auditor name lookup backed by one TrigramIndex per label, loaded from the graph."""
+    def __init__(self):
+        self.indexes = {label: TrigramIndex() for label in ENTITY_LABELS}
+        # In how many Company/Auditor names each name token appears, to weigh tokens in find_mentions.
+        self.token_counts = Counter()
+        self._lock = threading.Lock()
+
+    def sync(self, handler):
+        """Rebuild from the names currently in the graph (names only, no other properties)."""
+        indexes = {label: TrigramIndex() for label in ENTITY_LABELS}
+        token_counts = Counter()
+        for label, element_id, name in handler.retrieve_entity_names():
+            if name:
+                indexes[label].add(element_id, name)
+                token_counts.update(set(name_tokens(name)))
+        with self._lock:
+            self.indexes, self.token_counts = indexes, token_counts
+
+    def add(self, label:str, element_id:str, name:str):
+        with self._lock:
+            self.indexes[label].add(element_id, name)
+            self.token_counts.update(set(name_tokens(name)))
+
+    def token_weight(self, token:str) -> float:
+        """Inverse document frequency over every name, halved for generic industry and place words."""
+        names = sum(len(index) for index in self.indexes.values())
+        weight = math.log(1 + names / max(self.token_counts.get(token, 0), 1))
+        return weight / 2 if token in GENERIC_NAME_WORDS else weight
+
+    def mention_score(self, span:str, name:str):
+        """
+        How well a word span names an entity, as (score, matched name tokens); (0, ()) when it does not.
+
+        Every word of the span must match a word of the name, allowing typos, and the matched words must
+        be distinctive: at least one that is not a generic industry or place word, or two generic ones
+        together ("American Airlines", but not "energy" alone). The score is the
+        share of the name's identifying words the span covers, weighted by how rare each word is, so
+        "Tesla" fully names "Tesla, Inc." and "Deloitte" half names "Deloitte & Touche LLP".
+        """
+        tokens = name_tokens(name)
+        matched = {}
+        for word in span.split():
+            if word in NAME_FILLERS:
+                continue
+            similarity, token = max((token_similarity(word, token), token) for token in tokens)
+            if not similarity:
+                return 0.0, ()
+            matched[token] = max(similarity, matched.get(token, 0.0))
+
+        if len(matched) < 2 and not any(token not in GENERIC_NAME_WORDS for token in matched):
+            return 0.0, ()
+        weights = {token: self.token_weight(token) for token in set(tokens)}
+        score = sum(weights[token] * similarity for token, similarity in matched.items()) / sum(weights.values())
+        return score, tuple(sorted(matched))
+
+    def resolve(self, name:str, label:str = "Company", limit:int = 10) -> list:
+        if label not in self.indexes:
+            raise ValueError(f"Unknown entity label '{label}', expected one of {ENTITY_LABELS}")
+        return self.indexes[label].search(name, limit)
+
+    def find_mentions(self, text:str, min_score:float = 0.5, limit:int = 25) -> dict:
+        """
+        Companies and auditors named anywhere in free text, as {label: [{'name', 'Id', 'score', 'span'}]}.
+
+        Candidate word spans are tried longest first; each word belongs to at most one mention, whose
+        label is the one with the closer match. Trigram lookup only proposes candidates; each is scored on
+        the whole name by mention_score. Once the best match passes `min_score`, every name matched by
+        the same words is kept with it, so "Deloitte" returns each Deloitte entity.
+        """
+        found = {label: [] for label in ENTITY_LABELS}
+        used = set()
+        for start, end, span in mention_spans(text):
+            if used & set(range(start, end)):
+                continue
+            best = []
+            for label in ENTITY_LABELS:
+                scored = []
+                for match in self.resolve(span, label, limit):
+                    score, tokens = self.mention_score(span, match['name'])
+                    if score:
+                        scored.append((score, tokens, match))
+                scored.sort(key=lambda candidate: candidate[0], reverse=True)
+                if not scored or scored[0][0] < min_score:
+                    continue
+                if not best or scored[0][0] > best[0]['score']:
+                    top_tokens = scored[0][1]
+                    best = [dict(match, score=score, span=span, label=label) for score, tokens, match in scored if tokens == top_tokens]
+            if best:
+                used.update(range(start, end))
+                found[best[0]['label']] += [{key: match[key] for key in ('name', 'Id', 'score', 'span')} for match in best]
+        return found
@@ -1,204 +1,204 @@
-import numpy as np
 import os
 from .utils import OpenAIEmbedder
+from .backend import GraphBackend
+from . import schema
+from .entity_resolver import ENTITY_LABELS, lucene_fuzzy_query
 from neo4j import GraphDatabase
-import faiss
-from py2neo import Graph
-import matplotlib.pyplot as plt
-import networkx as nx
-import pandas as pd
-import ast 
-import tqdm
 import streamlit as st
 
-class Neo4jHandler:
-    def __init__(self, uri:str = None, username:str = None, password:str = None):
-        if not uri:
-            # self.uri = os.environ["NEO4J_URI"]
-            self.uri = st.secrets["NEO4J_URI"]
-        
-        if not username:
-            # self.username = os.environ["NEO4J_USERNAME"]
-            self.username = st.secrets["NEO4J_USERNAME"]
-
-        if not password:
-            # self.password = os.environ["NEO4J_PASSWORD"]
-            self.password = st.secrets["NEO4J_PASSWORD"]
-            
-        self.driver = GraphDatabase.driver(self.uri, auth=(self.username, self.password))
-        self.embedder = OpenAIEmbedder()
-
-        self.index = None
-        self.node_ids = []
-        
-    def create_faiss_index(self):
-        nodes = self.retrieve_all_nodes_with_embeddings()
-        embeddings = [np.array(node[1]) for node in nodes]
-        self.node_ids = [node[0] for node in nodes]
-        dimension = len(embeddings[0])
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(np.array(embeddings))
-
-    def retrieve_all_nodes_with_embeddings(self):
+REPORT_BATCH_QUERY = """
+    UNWIND $rows AS row
+    MERGE (c:Company {name: row.company_name})
+    MERGE (au:Auditor {name: row.auditor_name})
+    MERGE (au)-[:AUDITS]->(c)
+    MERGE (r:Report {key: row.report_key})
+    SET r.name = row.report_name, r.text = row.report_text, r.embeddings = row.report_embeddings, r.updated_at = timestamp()
+    MERGE (c)-[:HAS_REPORT]->(r)
+    MERGE (o:Opinion {key: row.opinion_key})
+    SET o.text = row.opinion, o.embeddings = row.opinion_embeddings, o.updated_at = timestamp()
+    MERGE (r)-[:CONTAINS_OPINION]->(o)
+    FOREACH (passage IN row.passages |
+        MERGE (p:Passage {key: passage.key})
+        SET p.index = passage.index, p.text = passage.text, p.embeddings = passage.embeddings, p.updated_at = timestamp()
+        MERGE (r)-[:HAS_PASSAGE]->(p)
+    )
+"""
+
+AUDIT_BATCH_QUERY = """
+    UNWIND $audits AS audit
+    MERGE (o:Opinion {key: audit.opinion_key})
+    ON CREATE SET o.text = audit.opinion, o.embeddings = audit.opinion_embeddings, o.updated_at = timestamp()
+    MERGE (a:Audit {key: audit.audit_key})
+    SET a.name = audit.audit_name, a.audit_opinion = audit.audit_opinion, a.embeddings = audit.audit_embeddings, a.updated_at = timestamp()
+    MERGE (o)-[:HAS_AUDIT]->(a)
+"""
+
+class Neo4jHandler(GraphBackend):
+    """GraphBackend on a Neo4j server, with optional search through Neo4j's native vector indexes."""
+    def __init__(self, uri:str = None, username:str = None, password:str = None, max_connection_pool_size:int = 50, snapshot_dir:str = "index_snapshot", index_type:str = "flat", metric:str = "l2", search_backend:str = "faiss", setup_schema:bool = True, embedder:OpenAIEmbedder = None, storage:str = "float32", **index_params):
+        # self.uri = os.environ["NEO4J_URI"]
+        self.uri = uri if uri else st.secrets["NEO4J_URI"]
+        # self.username = os.environ["NEO4J_USERNAME"]
+        self.username = username if username else st.secrets["NEO4J_USERNAME"]
+        # self.password = os.environ["NEO4J_PASSWORD"]
+        self.password = password if password else st.secrets["NEO4J_PASSWORD"]
+
+        # The driver keeps a pool of Bolt connections and is safe to share between threads.
+        self.driver = GraphDatabase.driver(self.uri, auth=(self.username, self.password), max_connection_pool_size=max_connection_pool_size)
+
+        # "faiss" searches the local index; "neo4j" runs nearest-neighbour search inside the database
+        # through the native vector indexes, without downloading any vectors.
+        super().__init__(embedder, snapshot_dir, index_type, metric, search_backend, storage, **index_params)
+        if search_backend == "neo4j" and storage != "float32":
+            raise ValueError("Neo4j's vector indexes only cover float lists, use storage='float32' with search_backend='neo4j'")
+        if setup_schema:
+            schema.setup_schema(self.driver, vector_index=search_backend == "neo4j")
+
+    def count_nodes_with_embeddings(self):
         cypher_query = """
             MATCH (n)
             WHERE n.embeddings IS NOT NULL
-            RETURN elementId(n) AS id, n.embeddings AS embeddings
+            RETURN head(labels(n)) AS label, count(*) AS count
         """
-        nodes = []
         with self.driver.session() as session:
-            result = session.run(cypher_query)
-            for record in result:
-                nodes.append((record["id"], record["embeddings"]))
-        return nodes
-    
-    def handle_query(self, query, distance=0.4):
-        # Generate embedding for the query
-        query_embedding = self.embedder.embed_text(query)
-        query_vector = np.array(query_embedding).reshape(1, -1)
-        
-
-        if not self.index:
-            self.create_faiss_index()
-
-        # Perform FAISS search
-        D, I = self.index.search(query_vector, 2)
-        
-        # print(f" Distance of nearest Embeddings: {D}")
-        # print(f" Indices of nearest Embeddings: {I}")
-        
-        top_node_indices = I[0]
-        top_similarities = D[0]
-        
-        # Filter nodes based on similarity threshold
-        top_nodes = []
-        for idx, similarity in zip(top_node_indices, top_similarities):
-            if similarity <= distance:
-                top_nodes.append(self.node_ids[idx])
-
-        # print(top_nodes)
-
-        related_nodes_and_relations = []
-        for node in top_nodes:
-            related_nodes_and_relations.append(self.retrace_path_and_visualize(node))
-        
-        return related_nodes_and_relations
-    
-    def retrive_all_likable_names(self, company_name, table:str = "Company"):
+            return {record["label"]: record["count"] for record in session.run(cypher_query)}
+
+    def stream_nodes_with_embeddings(self, batch_size:int):
+        """Records are pulled from the server `batch_size` at a time, so neither side materialises the whole result."""
+        cypher_query = """
+            MATCH (n)
+            WHERE n.embeddings IS NOT NULL
+            RETURN elementId(n) AS id, head(labels(n)) AS label, n.embeddings AS embeddings, n.updated_at AS updated_at
+        """
+        with self.driver.session(fetch_size=batch_size) as session:
+            batch = []
+            for record in session.run(cypher_query):
+                batch.append((record["id"], record["label"], record["embeddings"], record["updated_at"]))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def retrieve_node_versions(self):
+        """Map elementId -> (label, updated_at) for every embedded node, without transferring the vectors."""
+        cypher_query = """
+            MATCH (n)
+            WHERE n.embeddings IS NOT NULL
+            RETURN elementId(n) AS id, head(labels(n)) AS label, n.updated_at AS updated_at
+        """
+        with self.driver.session() as session:
+            return {record["id"]: (record["label"], record["updated_at"]) for record in session.run(cypher_query)}
+
+    def retrieve_nodes_with_embeddings(self, element_ids:list):
+        if not element_ids:
+            return []
+        cypher_query = """
+            UNWIND $element_ids AS element_id
+            MATCH (n)
+            WHERE elementId(n) = element_id AND n.embeddings IS NOT NULL
+            RETURN elementId(n) AS id, head(labels(n)) AS label, n.embeddings AS embeddings
+        """
+        with self.driver.session() as session:
+            return [(record["id"], record["label"], record["embeddings"]) for record in session.run(cypher_query, element_ids=element_ids)]
+
+    def vector_search_in_db(self, query_embedding:list, k:int = 2, labels:list = None):
+        """
+        Nearest-neighbour search through Neo4j's native vector indexes (see schema.VECTOR_INDEXES).
+        Returns (distance, element_id) pairs like PartitionedIndex.search, with the cosine score
+        converted to the squared L2 distance between unit vectors so thresholds stay comparable.
+        """
+        selected = [label for label in labels or [] if label in schema.VECTOR_INDEXES] or list(schema.VECTOR_INDEXES)
+        query = """
+            CALL db.index.vector.queryNodes($index_name, $k, $embedding) YIELD node, score
+            RETURN elementId(node) AS id, score
+        """
+        hits = []
+        with self.driver.session() as session:
+            for label in selected:
+                result = session.run(query, index_name=schema.VECTOR_INDEXES[label], k=k, embedding=query_embedding)
+                # Neo4j reports cosine similarity as (1 + cos) / 2.
+                hits.extend((4.0 - 4.0 * record["score"], record["id"]) for record in result)
+        return sorted(hits)[:k]
+
+    def retrive_all_likable_names(self, company_name, table:str = "Company", limit:int = 10):
+        """
+        Company or Auditor names matching `company_name`, best first, tolerant to typos ("Delloite").
+        Served by the entity_names full-text index with a parameterised query, so names containing
+        quotes or regex characters are safe.
+        """
+        if table not in ENTITY_LABELS:
+            raise ValueError(f"Unknown entity label '{table}', expected one of {ENTITY_LABELS}")
+
+        query = lucene_fuzzy_query(company_name)
+        if not query:
+            return []
+
         with self.driver.session() as session:
             result = session.run(
-                f"""MATCH (n:{table})
-                WHERE n.name =~ "(?i).*{company_name}.*"
-                RETURN elementId(n) as Id, n.name as name""")
-            return [{'name' : record["name"], 'Id' : record["Id"]} for record in result]
-    
-    def retrace_path_and_visualize(self, element_ids):
-        # Initialize the result dictionary
-        result = {
-            'CompanyName': None,
-            'AuditorName': None,
-            'ReportName': None,
-            'ReportText': None,
-            'Opinion': None,
-            'AuditName': None,
-            'AuditOpinion':None,
-        }
-
-        # Cypher query to get the path
-        # forward relation
+                """CALL db.index.fulltext.queryNodes('entity_names', $query) YIELD node, score
+                WHERE $label IN labels(node)
+                RETURN elementId(node) as Id, node.name as name, score
+                LIMIT $limit""",
+                query=query, label=table, limit=limit)
+            return [{'name' : record["name"], 'Id' : record["Id"], 'score' : record["score"]} for record in result]
+
+    def retrieve_entity_names(self):
+        """(label, elementId, name) for every Company and Auditor, used to keep the in-process EntityResolver in sync."""
         query = """
-            MATCH path = (n)-[*]->(m)
-            WHERE elementId(n) = $element_ids
-            RETURN nodes(path) AS nodes, relationships(path) AS relationships
+            MATCH (n)
+            WHERE n:Company OR n:Auditor
+            RETURN head(labels(n)) AS label, elementId(n) AS id, n.name AS name
+        """
+        with self.driver.session() as session:
+            return [(record["label"], record["id"], record["name"]) for record in session.run(query)]
+
+    def audit_relationships(self, auditor_ids:list = None, company_ids:list = None):
+        """Anchored on the named nodes by elementId, so the query only touches their AUDITS relationships."""
+        if auditor_ids:
+            query = "MATCH (au:Auditor) WHERE elementId(au) IN $auditor_ids MATCH (au)-[:AUDITS]->(c:Company)"
+            if company_ids:
+                query += " WHERE elementId(c) IN $company_ids"
+        elif company_ids:
+            query = "MATCH (c:Company) WHERE elementId(c) IN $company_ids MATCH (au:Auditor)-[:AUDITS]->(c)"
+        else:
+            return []
+
+        query += """
+            RETURN elementId(au) AS auditor_id, au.name AS auditor, elementId(c) AS company_id, c.name AS company,
+                   COUNT { (c)-[:HAS_REPORT]->(:Report) } AS reports
+            ORDER BY company, auditor
+        """
+        with self.driver.session() as session:
+            return [record.data() for record in session.run(query, auditor_ids=auditor_ids or [], company_ids=company_ids or [])]
+
+    def fetch_subgraph_rows(self, element_ids:list) -> dict:
+        """
+        All hits' neighbourhoods in one round-trip. Only the properties the evidence records need
+        are returned, one row per hit.
         """
-        
-        nodes = []
-        relationships = []
-        
-        # Run the query and retrieve paths
-        paths = self.driver.session().run(query, element_ids=element_ids)
-        for path in paths:
-            nodes.extend(path['nodes'])
-            relationships.extend(path['relationships'])
-
-        #  print(f"\n After Forward Relationships: {relationships}")
-        # Backward relation
         query = """
-            MATCH path = (n)<-[*]-(m)
-            WHERE elementId(n) = $element_ids
-            RETURN nodes(path) AS nodes, relationships(path) AS relationships
+            UNWIND $element_ids AS element_id
+            MATCH (hit)
+            WHERE elementId(hit) = element_id
+            OPTIONAL MATCH (hit)<-[:CONTAINS_OPINION|HAS_AUDIT|HAS_PASSAGE*0..2]-(r:Report)
+            WITH element_id, hit, head(collect(DISTINCT r)) AS r
+            OPTIONAL MATCH (c:Company)-[:HAS_REPORT]->(r)
+            WITH element_id, hit, r, head(collect(c)) AS c
+            OPTIONAL MATCH (au:Auditor)-[:AUDITS]->(c)
+            WITH element_id, hit, r, c, collect(DISTINCT au.name) AS auditors
+            OPTIONAL MATCH (r)-[:CONTAINS_OPINION]->(o:Opinion)
+            WITH element_id, hit, r, c, auditors, head(collect(o)) AS o
+            OPTIONAL MATCH (o)-[:HAS_AUDIT]->(a:Audit)
+            WITH element_id, hit, r, c, auditors, o, collect(DISTINCT a) AS audits
+            RETURN element_id, head(labels(hit)) AS label, hit.name AS hit_name, hit.audit_opinion AS hit_audit_opinion,
+                   hit.index AS hit_index, hit.text AS hit_text, c.name AS company, auditors,
+                   r.key AS report_key, r.name AS report_name, r.text AS report_text, o.text AS opinion,
+                   [a IN audits | {name: a.name, opinion: a.audit_opinion}] AS audits
         """
-        
-        # Run the query and retrieve paths
-        paths = self.driver.session().run(query, element_ids=element_ids)
-        for path in paths:
-            nodes.extend(path['nodes'])
-            relationships.extend(path['relationships'])
-        
-        # print(f"\nAfter Backward Relationships: {relationships}")
-
-        # Extract relevant information
-        for node in nodes:
-            labels = list(node.labels)
-            if 'Company' in labels:
-                result['CompanyName'] = node['name']
-            elif 'Auditor' in labels:
-                result['AuditorName'] = node['name']
-            elif 'Report' in labels:
-                result['ReportName'] = node['name']
-                result['ReportText'] = node['text']
-            elif 'Opinion' in labels:
-                result['Opinion'] = node['text']
-            elif 'Audit' in labels:
-                result['AuditName'] = node['name']
-                result['AuditOpinion'] = node['audit_opinion']
-        
-        # Visualize the path
-        G = nx.DiGraph()
-        
-        colors = ["LightSkyBlue","LightGreen","LightCoral","PeachPuff","Thistle", "LightSalmon","LightPink","PaleGoldenrod","LightYellow","Lavender"]
-        node_colors = []
-        edge_labels = {}
-
-        def split_label(label, max_words_per_line=2):
-            words = label.split(' ')
-            lines = []
-            for i in range(0, len(words), max_words_per_line):
-                lines.append(' '.join(words[i:i + max_words_per_line]))
-            return '\n'.join(lines)
-        
-        for relationship in relationships:
-            start_node = relationship.start_node
-            end_node = relationship.end_node
-            start_node_label = list(start_node.labels)[0] 
-            end_node_label = list(end_node.labels)[0] 
-            start_label = f"{start_node_label} : {start_node['name']}" if start_node['name'] else start_node_label
-            end_label = f"{end_node_label} : {end_node['name']}" if end_node['name'] else end_node_label
-            G.add_edge(split_label(start_label), split_label(end_label))
-            edge_labels[(split_label(start_label), split_label(end_label))] = relationship.type
-
-        for i in range(len(G)):
-            node_colors.append(colors[i % len(colors)])
-
-        # pos = nx.spring_layout(G)  # For spring layout
-        # pos = nx.circular_layout(G)  # For circular layout
-        # pos = nx.shell_layout(G)  # For shell layout
-        # pos = nx.kamada_kawai_layout(G)  # For Kamada-Kawai layout
-        pos = nx.spectral_layout(G)  # For spectral layout
-
-        plt.figure(figsize=(12, 8))
-        nx.draw(G, pos, with_labels=True, node_color=node_colors, node_size=3000, edge_color='gray', font_size=8, font_weight='bold')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='red', font_size=7)
-
-        plt.title('Data Path')
-        # plt.show()
-        
-        file_name = f"{element_ids}.png"
-        plt.savefig(file_name)
-        result['Graph'] = file_name
-        
-        return result
-    
+        with self.driver.session() as session:
+            return {record["element_id"]: record for record in session.run(query, element_ids=element_ids)}
+
     def close(self):
         self.driver.close()
 
@@ -214,65 +214,75 @@ class Neo4jHandler:
                 "MERGE (a)-[:AUDITS]->(c)",
                 company_name=company_name, auditor_name=auditor_name
             )
-            
+
     def create_company_report_relationship(self, company_name, report_name, report_text):
-        embeddings = self.embedder.embed_text(report_text)
+        embeddings = self.pack_embeddings(self.embedder.embed_text(report_text))
         with self.driver.session() as session:
             session.run(
                 "MERGE (c:Company {name: $company_name})"
-                "MERGE (r:Report {name: $report_name, text: $report_text, embeddings: $embeddings})"
+                "MERGE (r:Report {key: $report_key})"
+                "SET r.name = $report_name, r.text = $report_text, r.embeddings = $embeddings, r.updated_at = timestamp() "
                 "MERGE (c)-[:HAS_REPORT]->(r)",
-                company_name=company_name, report_name=report_name, report_text=report_text, embeddings = embeddings
+                company_name=company_name, report_key=schema.report_key(report_text), report_name=report_name, report_text=report_text, embeddings = embeddings
             )
 
     def create_report_opinion_relationship(self, report_name, report_text, opinion):
-        report_embeddings = self.embedder.embed_text(report_text)
-        opinion_embeddings = self.embedder.embed_text(opinion)
+        report_embeddings = self.pack_embeddings(self.embedder.embed_text(report_text))
+        opinion_embeddings = self.pack_embeddings(self.embedder.embed_text(opinion))
 
         with self.driver.session() as session:
             session.run(
-                "MERGE (r:Report {name: $report_name, text: $report_text, embeddings: $report_embeddings})"
-                "MERGE (o:Opinion {text: $opinion, embeddings: $opinion_embeddings})"
+                "MERGE (r:Report {key: $report_key})"
+                "SET r.name = $report_name, r.text = $report_text, r.embeddings = $report_embeddings, r.updated_at = timestamp() "
+                "MERGE (o:Opinion {key: $opinion_key})"
+                "SET o.text = $opinion, o.embeddings = $opinion_embeddings, o.updated_at = timestamp() "
                 "MERGE (r)-[:CONTAINS_OPINION]->(o)",
-                report_name=report_name, report_text=report_text, report_embeddings = report_embeddings, opinion=opinion, opinion_embeddings = opinion_embeddings
+                report_key=schema.report_key(report_text), report_name=report_name, report_text=report_text, report_embeddings = report_embeddings,
+                opinion_key=schema.opinion_key(opinion), opinion=opinion, opinion_embeddings = opinion_embeddings
             )
 
     def create_opinion_audit_relationship(self, opinion, audit_name, audit_opinion):
-        audit_embeddings = self.embedder.embed_text(audit_name + audit_opinion)
-        opinion_embeddings = self.embedder.embed_text(opinion)
+        audit_embeddings = self.pack_embeddings(self.embedder.embed_text(audit_name + audit_opinion))
+        opinion_embeddings = self.pack_embeddings(self.embedder.embed_text(opinion))
 
         with self.driver.session() as session:
             session.run(
-                "MERGE (o:Opinion {text: $opinion, embeddings: $opinion_embeddings})"
-                "MERGE (a:Audit {name: $audit_name, audit_opinion: $audit_opinion, embeddings: $audit_embeddings})"
+                "MERGE (o:Opinion {key: $opinion_key})"
+                "SET o.text = $opinion, o.embeddings = $opinion_embeddings, o.updated_at = timestamp() "
+                "MERGE (a:Audit {key: $audit_key})"
+                "SET a.name = $audit_name, a.audit_opinion = $audit_opinion, a.embeddings = $audit_embeddings, a.updated_at = timestamp() "
                 "MERGE (o)-[:HAS_AUDIT]->(a)",
-                audit_name=audit_name, audit_opinion=audit_opinion, audit_embeddings = audit_embeddings, opinion=opinion, opinion_embeddings = opinion_embeddings
+                audit_key=schema.audit_key(audit_name, audit_opinion), audit_name=audit_name, audit_opinion=audit_opinion, audit_embeddings = audit_embeddings,
+                opinion_key=schema.opinion_key(opinion), opinion=opinion, opinion_embeddings = opinion_embeddings
             )
 
+    def pack_embeddings(self, embeddings):
+        """float32 is kept as a list of floats, which the native vector indexes need; the other formats are sent as byte arrays."""
+        if self.storage == "float32":
+            return [float(value) for value in embeddings]
+        return super().pack_embeddings(embeddings)
+
+    def create_rows_batch(self, rows:list, audits:list):
+        """Write report rows and their audits in a single transaction, so a batch is either fully stored or not at all."""
+        if self.storage != "float32":
+            rows, audits = self.pack_batch(rows, audits)
+
+        def write(tx):
+            if rows:
+                tx.run(REPORT_BATCH_QUERY, rows=rows).consume()
+            if audits:
+                tx.run(AUDIT_BATCH_QUERY, audits=audits).consume()
+
+        with self.driver.session() as session:
+            session.execute_write(write)
+
 
 if __name__ == "__main__":
+    from .ingest import load_dataframe, bulk_ingest
 
     if False:    
         # Reading the data from the Excel sheet.
-        df = pd.read_excel('data/Final_Result_Top50.xlsx')
-
-        Report = df['Report'].tolist()
-        # Company_Names = df['Company Name'].tolist()
-        # Opinion = df['Opinion'].tolist()
-        # Audits = df['Audits'].tolist()
-        
-        # Extracting auditor from the Report
-        auditor = [report.lower().split('/s/')[1].split('\n') for report in Report]
-        auditor = [a[0].strip() if len(a[0]) > 2 else a[1].strip() for a in auditor]
-        df['Auditor'] = auditor
-
-        #Extracting Report Name from the Report
-        report_name = [report.split('\n')[0] if len(report.split('\n')[0]) > 2 else report.split('\n')[1] for report in df['Report']]
-        df['Report_Name'] = report_name
-        
-        #Converting the audit str -> dict
-        df['Audits'] = df['Audits'].apply(lambda x: ast.literal_eval(x))
-
+        df = load_dataframe('data/Final_Result_Top50.xlsx')
 
         #Creating an Instance of the class
         neo4j_handler = Neo4jHandler()
@@ -280,30 +290,10 @@ if __name__ == "__main__":
         #Clearing the database
         neo4j_handler.clear_database()
 
-        #Populating the database with the data. 
-        for index, row in tqdm(df.iterrows(), total=len(df)):
-            company_name = row['Company Name']
-            auditor_name = row['Auditor']
-            report_name = row['Report_Name']
-            report_text = row['Report']
-            opinion = row['Opinion']
-            audits = row['Audits']
-
-            
-            # Create Company-Auditor relationship
-            neo4j_handler.create_company_auditor_relationship(company_name, auditor_name)
-
-            # Create Company-Report relationship
-            neo4j_handler.create_company_report_relationship(company_name, report_name, report_text)
-            
-            # Create Report-Opinion relationship
-            neo4j_handler.create_report_opinion_relationship(report_name, report_text, opinion)
-
-            # Create Report-Audit relationships
-            for audit in audits:
-                audit_name = audit['Audit_Name']
-                audit_opinion = audit['Audit_Opinion']
-                neo4j_handler.create_opinion_audit_relationship(opinion, audit_name, audit_opinion)
+        #Populating the database with the data in batches.
+        stats = bulk_ingest(neo4j_handler, df)
+        print(f"Loaded {stats['rows']} rows ({stats['distinct_texts']} distinct texts) in {stats['total_seconds']:.1f}s "
+              f"(embedding {stats['embed_seconds']:.1f}s, writing {stats['write_seconds']:.1f}s)")
 
         # Close the Neo4j handler
         neo4j_handler.close()
@@ -0,0 +1,137 @@
+import ast
+import re
+import time
+import pandas as pd
+from tqdm import tqdm
+from .schema import audit_key, opinion_key, passage_key, report_key
+
+def load_dataframe(path:str = 'data/Final_Result_Top50.xlsx') -> pd.DataFrame:
+    """Read the Excel sheet and derive the Auditor, Report_Name and parsed Audits columns."""
+    df = pd.read_excel(path)
+
+    # Extracting auditor from the Report
+    auditor = [report.lower().split('/s/')[1].split('\n') for report in df['Report']]
+    df['Auditor'] = [a[0].strip() if len(a[0]) > 2 else a[1].strip() for a in auditor]
+
+    #Extracting Report Name from the Report
+    df['Report_Name'] = [report.split('\n')[0] if len(report.split('\n')[0]) > 2 else report.split('\n')[1] for report in df['Report']]
+
+    #Converting the audit str -> dict
+    df['Audits'] = df['Audits'].apply(lambda x: ast.literal_eval(x))
+    return df
+
+def split_passages(text:str, size:int = 200, overlap:int = 50) -> list:
+    """
+    Split a report into overlapping windows of `size` words, each starting `size - overlap` words after
+    the previous one. Passages are sliced from the original text, so line breaks are kept.
+    """
+    words = [match.span() for match in re.finditer(r"\S+", text or "")]
+    if not words:
+        return []
+
+    step = max(size - overlap, 1)
+    passages = []
+    for start in range(0, len(words), step):
+        end = min(start + size, len(words))
+        passages.append(text[words[start][0]:words[end - 1][1]])
+        if end == len(words):
+            break
+    return passages
+
+def build_rows(df:pd.DataFrame) -> list:
+    """One plain dict per sheet row, which is cheaper to walk than df.iterrows()."""
+    return [
+        {
+            'company_name': company_name,
+            'auditor_name': auditor_name,
+            'report_name': report_name,
+            'report_text': report_text,
+            'passages': split_passages(report_text),
+            'opinion': opinion,
+            'audits': [{'audit_name': audit['Audit_Name'], 'audit_opinion': audit['Audit_Opinion']} for audit in audits],
+        }
+        for company_name, auditor_name, report_name, report_text, opinion, audits in zip(
+            df['Company Name'], df['Auditor'], df['Report_Name'], df['Report'], df['Opinion'], df['Audits'])
+    ]
+
+def distinct_texts(rows:list) -> list:
+    """Every text that needs an embedding, each listed once (reports, their passages, opinions and audit name + opinion)."""
+    texts = {}
+    for row in rows:
+        texts[row['report_text']] = None
+        for passage in row['passages']:
+            texts[passage] = None
+        texts[row['opinion']] = None
+        for audit in row['audits']:
+            texts[audit['audit_name'] + audit['audit_opinion']] = None
+    return list(texts)
+
+def embed_texts(embedder, texts:list, batch_size:int = 64) -> dict:
+    """Embed texts through embed_documents in batches; returns text -> embeddings."""
+    embeddings = {}
+    for start in tqdm(range(0, len(texts), batch_size), desc="Embedding", unit="batch"):
+        batch = texts[start:start + batch_size]
+        embeddings.update(zip(batch, embedder.embed_documents(batch)))
+    return embeddings
+
+def to_write_batches(rows:list, embeddings:dict):
+    """Turn rows into the parameter lists expected by create_report_batch and create_audit_batch."""
+    reports, audits = [], []
+    for row in rows:
+        reports.append({
+            'company_name': row['company_name'],
+            'auditor_name': row['auditor_name'],
+            'report_key': report_key(row['report_text']),
+            'report_name': row['report_name'],
+            'report_text': row['report_text'],
+            'report_embeddings': embeddings[row['report_text']],
+            'passages': [
+                {'key': passage_key(row['report_text'], index), 'index': index, 'text': passage, 'embeddings': embeddings[passage]}
+                for index, passage in enumerate(row['passages'])
+            ],
+            'opinion_key': opinion_key(row['opinion']),
+            'opinion': row['opinion'],
+            'opinion_embeddings': embeddings[row['opinion']],
+        })
+        for audit in row['audits']:
+            audits.append({
+                'opinion_key': opinion_key(row['opinion']),
+                'opinion': row['opinion'],
+                'opinion_embeddings': embeddings[row['opinion']],
+                'audit_key': audit_key(audit['audit_name'], audit['audit_opinion']),
+                'audit_name': audit['audit_name'],
+                'audit_opinion': audit['audit_opinion'],
+                'audit_embeddings': embeddings[audit['audit_name'] + audit['audit_opinion']],
+            })
+    return reports, audits
+
+def write_rows(handler, rows:list, embeddings:dict, batch_size:int = 200):
+    """Write rows in transactions of `batch_size` rows, each together with its audits."""
+    for start in range(0, len(rows), batch_size):
+        reports, audits = to_write_batches(rows[start:start + batch_size], embeddings)
+        handler.create_rows_batch(reports, audits)
+
+def bulk_ingest(handler, df:pd.DataFrame, embed_batch_size:int = 64, write_batch_size:int = 200) -> dict:
+    """
+    Load a prepared dataframe into Neo4j: each distinct text is embedded once, in batches,
+    and nodes and relationships are written with UNWIND in a handful of transactions.
+
+    Returns timing and volume figures for the run.
+    """
+    start = time.perf_counter()
+    rows = build_rows(df)
+    texts = distinct_texts(rows)
+    embeddings = embed_texts(handler.embedder, texts, embed_batch_size)
+    embedded = time.perf_counter()
+
+    write_rows(handler, rows, embeddings, write_batch_size)
+    finished = time.perf_counter()
+
+    stats = {
+        'rows': len(rows),
+        'distinct_texts': len(texts),
+        'embed_seconds': embedded - start,
+        'write_seconds': finished - embedded,
+        'total_seconds': finished - start,
+    }
+    return stats
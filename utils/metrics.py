@@ -0,0 +1,148 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("auditinsight.metrics")
+
+PREFIX = "auditinsight"
+
+# Upper bounds, in seconds, of the span duration histogram buckets.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNTERS = {
+    "embedding_api_calls": "Embedding requests sent to the API.",
+    "embedding_texts": "Texts embedded through the API.",
+    "embedding_cache_hits": "Embeddings served from the embedding cache.",
+    "answer_cache_hits": "Answers served from the semantic answer cache.",
+    "answer_cache_misses": "Answer cache lookups that fell through to the LLM.",
+    "render_cache_hits": "Evidence graphs served from the render cache.",
+    "render_cache_misses": "Evidence graphs drawn with matplotlib.",
+    "structured_answers": "List, count and lookup questions answered from graph relationships without vector search.",
+    "general_answers": "Small talk and general questions answered without embedding the query or retrieving evidence.",
+    "llm_calls": "Chat completion requests.",
+    "llm_prompt_tokens": "Prompt tokens sent to the LLM (tiktoken count).",
+    "llm_completion_tokens": "Completion tokens received from the LLM (tiktoken count).",
+}
+
+class Trace:
+    """Spans and counters recorded while answering one chat turn, in the order they finished."""
+    def __init__(self):
+        self.spans = []
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        """Collect spans into this trace for code run in the block, including its threads and tasks."""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def breakdown(self) -> dict:
+        with self._lock:
+            return {"spans": list(self.spans), "counters": dict(self.counters)}
+
+_current_trace = contextvars.ContextVar("auditinsight_trace", default=None)
+
+class Registry:
+    """Process-wide span histograms and counters, rendered in the Prometheus text format."""
+    def __init__(self):
+        self.histograms = {}   # span -> [bucket counts..., sum, count]
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, name:str, seconds:float):
+        with self._lock:
+            histogram = self.histograms.setdefault(name, [0] * len(BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def increment(self, name:str, value:float = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {name: list(values) for name, values in self.histograms.items()}
+            counters = dict(self.counters)
+
+        lines = [f"# HELP {PREFIX}_span_seconds Time spent in each stage of answering a query.",
+                 f"# TYPE {PREFIX}_span_seconds histogram"]
+        for name, values in sorted(histograms.items()):
+            for bound, count in zip(BUCKETS, values):
+                lines.append(f'{PREFIX}_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'{PREFIX}_span_seconds_bucket{{span="{name}",le="+Inf"}} {values[-1]}')
+            lines.append(f'{PREFIX}_span_seconds_sum{{span="{name}"}} {values[-2]}')
+            lines.append(f'{PREFIX}_span_seconds_count{{span="{name}"}} {values[-1]}')
+
+        for name in sorted(set(COUNTERS) | set(counters)):
+            lines.append(f"# HELP {PREFIX}_{name}_total {COUNTERS.get(name, name)}")
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {counters.get(name, 0)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+def log_event(event:str, **fields):
+    """One JSON object per line on the auditinsight.metrics logger."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": event, **fields}, default=str))
+
+@contextmanager
+def span(name:str):
+    """Time the block; recorded in the registry, the active turn's trace and the structured log."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe(name, seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            with trace._lock:
+                trace.spans.append((name, 1000 * seconds))
+        log_event("span", span=name, ms=round(1000 * seconds, 3))
+
+def increment(name:str, value:float = 1):
+    registry.increment(name, value)
+    trace = _current_trace.get()
+    if trace is not None:
+        with trace._lock:
+            trace.counters[name] += value
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port:int, host:str = "0.0.0.0"):
+    """Serve the registry at http://host:port/metrics from a daemon thread; started at most once per process."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
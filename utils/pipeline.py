@@ -0,0 +1,213 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from tqdm import tqdm
+from .ingest import build_rows, distinct_texts, load_dataframe, to_write_batches
+
+def transient_errors() -> tuple:
+    """Exception types worth retrying: rate limits, timeouts, dropped connections and server-side hiccups."""
+    import openai
+    from neo4j import exceptions as neo4j_exceptions
+    return (
+        openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError,
+        neo4j_exceptions.TransientError, neo4j_exceptions.ServiceUnavailable, neo4j_exceptions.SessionExpired,
+        ConnectionError, TimeoutError,
+    )
+
+def with_retry(fn, retry_on:tuple, max_attempts:int = 6, base_delay:float = 1.0, max_delay:float = 60.0):
+    """Call fn(), retrying `retry_on` errors with exponential backoff and full jitter."""
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except retry_on:
+            if attempt == max_attempts - 1:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+def estimate_tokens(text:str) -> int:
+    # Roughly four characters per token for English text; close enough for rate limiting.
+    return len(text) // 4 + 1
+
+class RateLimiter:
+    """
+    Token-bucket limiter for both requests per minute and tokens per minute.
+    acquire() blocks until the call fits in both budgets; safe to share between threads.
+    """
+    def __init__(self, requests_per_minute:int = 3000, tokens_per_minute:int = 1000000):
+        self.capacity = {"requests": float(requests_per_minute), "tokens": float(tokens_per_minute)}
+        self.available = dict(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        for name, capacity in self.capacity.items():
+            self.available[name] = min(capacity, self.available[name] + elapsed * capacity / 60.0)
+
+    def acquire(self, tokens:int = 0):
+        # A single call larger than the whole budget could never fit; let it through once the bucket is full.
+        needed = {"requests": 1.0, "tokens": float(min(tokens, self.capacity["tokens"]))}
+        while True:
+            with self._lock:
+                self._refill()
+                shortfall = max((needed[name] - self.available[name]) * 60.0 / self.capacity[name] for name in needed)
+                if shortfall <= 0:
+                    for name in needed:
+                        self.available[name] -= needed[name]
+                    return
+            time.sleep(shortfall)
+
+class Checkpoint:
+    """JSON file listing the rows already committed to the graph, so an interrupted load can resume."""
+    def __init__(self, path:str):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = set(json.load(f)["rows"])
+
+    @staticmethod
+    def row_key(row:dict) -> str:
+        return hashlib.sha256(f"{row['company_name']}\x00{row['report_text']}".encode("utf-8")).hexdigest()
+
+    def __contains__(self, row:dict):
+        return self.row_key(row) in self.done
+
+    def mark(self, rows:list):
+        with self._lock:
+            self.done.update(self.row_key(row) for row in rows)
+            if not self.path:
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"rows": sorted(self.done)}, f)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            self.done = set()
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+class IngestionPipeline:
+    """
+    Parse -> embed -> write ingestion with bounded concurrency.
+
+    Rows are split into chunks. Up to `embed_workers` chunks are embedded in parallel under a
+    shared rate limiter, while a single writer commits finished chunks to the graph (one transaction
+    per chunk) and records them in the checkpoint. Transient API and database errors are retried
+    with backoff; a rerun skips every row already in the checkpoint.
+    """
+    def __init__(self, handler, checkpoint_path:str = "ingest_checkpoint.json", chunk_size:int = 16,
+                 embed_workers:int = 4, requests_per_minute:int = 3000, tokens_per_minute:int = 1000000,
+                 max_attempts:int = 6):
+        self.handler = handler
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.chunk_size = chunk_size
+        self.embed_workers = embed_workers
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_attempts = max_attempts
+        self.retry_on = transient_errors()
+
+        self.embedded_texts = 0
+        self._stats_lock = threading.Lock()
+
+    def parse(self, df) -> list:
+        """Rows not yet committed, grouped into chunks."""
+        rows = [row for row in build_rows(df) if row not in self.checkpoint]
+        return [rows[start:start + self.chunk_size] for start in range(0, len(rows), self.chunk_size)]
+
+    def embed(self, rows:list) -> dict:
+        texts = distinct_texts(rows)
+        self.rate_limiter.acquire(sum(estimate_tokens(text) for text in texts))
+        embeddings = with_retry(lambda: self.handler.embedder.embed_documents(texts), self.retry_on, self.max_attempts)
+        with self._stats_lock:
+            self.embedded_texts += len(texts)
+        return dict(zip(texts, embeddings))
+
+    def write(self, rows:list, embeddings:dict):
+        reports, audits = to_write_batches(rows, embeddings)
+        with_retry(lambda: self.handler.create_rows_batch(reports, audits), self.retry_on, self.max_attempts)
+        self.checkpoint.mark(rows)
+
+    def run(self, df) -> dict:
+        chunks = self.parse(df)
+        total_rows = sum(len(chunk) for chunk in chunks)
+        start = time.perf_counter()
+        written_rows = 0
+
+        progress = tqdm(total=total_rows, desc="Ingesting", unit="row")
+        with ThreadPoolExecutor(max_workers=self.embed_workers) as pool:
+            pending = {}
+            queued = iter(chunks)
+
+            def submit_next():
+                chunk = next(queued, None)
+                if chunk is not None:
+                    pending[pool.submit(self.embed, chunk)] = chunk
+
+            # Keep at most two chunks per worker in flight so memory stays bounded on large sheets.
+            for _ in range(2 * self.embed_workers):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = pending.pop(future)
+                    self.write(chunk, future.result())
+                    written_rows += len(chunk)
+
+                    elapsed = time.perf_counter() - start
+                    progress.update(len(chunk))
+                    progress.set_postfix(rows_per_s=f"{written_rows / elapsed:.1f}",
+                                         embeddings_per_s=f"{self.embedded_texts / elapsed:.1f}")
+                    submit_next()
+        progress.close()
+
+        elapsed = time.perf_counter() - start
+        return {
+            "rows": written_rows,
+            "skipped_rows": len(self.checkpoint.done) - written_rows,
+            "embedded_texts": self.embedded_texts,
+            "seconds": elapsed,
+            "rows_per_s": written_rows / elapsed if elapsed else 0.0,
+            "embeddings_per_s": self.embedded_texts / elapsed if elapsed else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    from .backend import make_backend
+
+    parser = argparse.ArgumentParser(description="Load the audit sheet into the graph, resuming from the checkpoint if present.")
+    parser.add_argument("--data", default="data/Final_Result_Top50.xlsx")
+    parser.add_argument("--checkpoint", default="ingest_checkpoint.json")
+    parser.add_argument("--fresh", action="store_true", help="Clear the database and the checkpoint first.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--rpm", type=int, default=3000, help="Embedding requests per minute.")
+    parser.add_argument("--tpm", type=int, default=1000000, help="Embedding tokens per minute.")
+    parser.add_argument("--backend", choices=["neo4j", "sqlite"], help="Graph backend; defaults to $GRAPH_BACKEND or neo4j.")
+    parser.add_argument("--db", help="SQLite file for --backend sqlite; defaults to $GRAPH_DB_PATH or graph.sqlite3.")
+    parser.add_argument("--storage", default="float32", choices=["float32", "float16", "int8"],
+                        help="Embedding storage format; float16 and int8 are packed byte arrays (see utils/vector_codec.py).")
+    args = parser.parse_args()
+
+    graph = make_backend(args.backend, storage=args.storage, **({"path": args.db} if args.db else {}))
+    pipeline = IngestionPipeline(graph, args.checkpoint, args.chunk_size, args.workers, args.rpm, args.tpm)
+
+    if args.fresh:
+        graph.clear_database()
+        pipeline.checkpoint.clear()
+
+    stats = pipeline.run(load_dataframe(args.data))
+    print(f"Wrote {stats['rows']} rows ({stats['skipped_rows']} already loaded) in {stats['seconds']:.1f}s: "
+          f"{stats['rows_per_s']:.1f} rows/s, {stats['embeddings_per_s']:.1f} embeddings/s")
+    graph.close()
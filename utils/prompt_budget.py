@@ -0,0 +1,148 @@
+import re
+from functools import lru_cache
+import tiktoken
+
+# Context window (prompt + completion tokens) per model.
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-3.5-turbo-0613": 4096,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Per-message framing added by the chat format (role, separators).
+MESSAGE_OVERHEAD = 4
+
+def context_window(model:str) -> int:
+    return CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+@lru_cache(maxsize=None)
+def encoding_for(model:str):
+    """The model's tokenizer, or None when its BPE file cannot be loaded (e.g. offline on first use)."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text:str, model:str = "gpt-3.5-turbo") -> int:
+    encoding = encoding_for(model)
+    if encoding is None:
+        # Roughly four characters per token for English text.
+        return len(text or "") // 4 + 1
+    return len(encoding.encode(text or "", disallowed_special=()))
+
+def truncate_tokens(text:str, budget:int, model:str) -> str:
+    encoding = encoding_for(model)
+    if encoding is None:
+        return text[:max(budget, 0) * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max(budget, 0)])
+
+def select_passages(text:str, query:str, budget:int, model:str) -> str:
+    """
+    Fit `text` into `budget` tokens by keeping the paragraphs that share the most words with the query,
+    in their original order. Paragraphs that are left out are marked with an ellipsis.
+    """
+    if count_tokens(text, model) <= budget:
+        return text
+
+    paragraphs = [paragraph.strip() for paragraph in re.split(r"\n+", text) if paragraph.strip()]
+    query_terms = set(re.findall(r"\w+", query.lower()))
+    scored = sorted(
+        range(len(paragraphs)),
+        key=lambda i: (-len(query_terms & set(re.findall(r"\w+", paragraphs[i].lower()))), i),
+    )
+
+    kept, used = set(), 0
+    for i in scored:
+        cost = count_tokens(paragraphs[i], model) + 1
+        if used + cost <= budget:
+            kept.add(i)
+            used += cost
+
+    if not kept:
+        # Not even one paragraph fits: hard-truncate the best one.
+        best = paragraphs[scored[0]]
+        return truncate_tokens(best, budget - 1, model) + " ..."
+
+    parts, previous = [], -1
+    for i in sorted(kept):
+        if i != previous + 1:
+            parts.append("...")
+        parts.append(paragraphs[i])
+        previous = i
+    if previous != len(paragraphs) - 1:
+        parts.append("...")
+    return "\n".join(parts)
+
+class PromptBudget:
+    """
+    Splits a model's context window between the completion, the fixed instructions, the chat history
+    and the evidence records, and trims history and report text to fit.
+
+    - The completion gets `max_output_tokens`, capped at a quarter of the window.
+    - Instructions (the template with no records) are always kept.
+    - History gets up to `history_share` of what is left, most recent turns first.
+    - Evidence gets the rest, split evenly between records; long report texts are cut down to
+      the paragraphs most related to the query.
+    """
+    def __init__(self, model:str = "gpt-3.5-turbo", max_output_tokens:int = 4000, history_share:float = 0.25):
+        self.model = model
+        self.window = context_window(model)
+        self.output_tokens = min(max_output_tokens, self.window // 4)
+        self.history_share = history_share
+
+    def trim_history(self, history:list, budget:int):
+        kept, used = [], 0
+        for turn in reversed(history or []):
+            cost = sum(count_tokens(turn.get(role) or "", self.model) + MESSAGE_OVERHEAD for role in ("user", "ai"))
+            if used + cost > budget:
+                break
+            kept.append(turn)
+            used += cost
+        return list(reversed(kept)), used
+
+    def fit_records(self, query:str, records:list, budget:int, template, general_question:bool):
+        if general_question or not records:
+            return records
+
+        fixed = count_tokens(template(query, [dict(record, ReportText="") for record in records], general_question), self.model) \
+            - count_tokens(template(query, [], general_question), self.model)
+        per_record = max((budget - fixed) // len(records), 0)
+        return [dict(record, ReportText=select_passages(record.get('ReportText') or "", query, per_record, self.model))
+                for record in records]
+
+    def build(self, query:str, records:list, history:list, template, general_question:bool = False, summary:str = None):
+        """
+        Returns (prompt, history, breakdown): the prompt text, the chat-history turns that fit, and
+        a token breakdown with window, output, instructions, history, evidence and total.
+        A conversation `summary` is charged to the history share before any turns.
+        """
+        instructions = count_tokens(template(query, [], general_question), self.model) + MESSAGE_OVERHEAD
+        available = max(self.window - self.output_tokens - instructions, 0)
+
+        summary_tokens = count_tokens(summary, self.model) + MESSAGE_OVERHEAD if summary else 0
+        history, history_tokens = self.trim_history(history, max(int(available * self.history_share) - summary_tokens, 0))
+        history_tokens += summary_tokens
+        fitted = self.fit_records(query, records, available - history_tokens, template, general_question)
+
+        prompt = template(query, fitted, general_question)
+        evidence = count_tokens(prompt, self.model) + MESSAGE_OVERHEAD - instructions
+
+        breakdown = {
+            "model": self.model,
+            "window": self.window,
+            "output": self.output_tokens,
+            "instructions": instructions,
+            "history": history_tokens,
+            "evidence": evidence,
+            "total": instructions + history_tokens + evidence,
+        }
+        return prompt, history, breakdown
@@ -1,17 +1,45 @@
+from typing import Any, List
 from semantic_router import Route
-from semantic_router.encoders import OpenAIEncoder
+from semantic_router.encoders import BaseEncoder, OpenAIEncoder
 from semantic_router.layer import RouteLayer
 import os
 from dotenv import load_dotenv
 import streamlit as st
+from .embedding_cache import get_embedding_cache
 
 load_dotenv()
 
+class CachedEncoder(BaseEncoder):
+    """
+    Wraps a semantic-router encoder with the shared EmbeddingCache, so building the route layer
+    only calls the embeddings API for utterances it has never seen; later starts read them from disk.
+    """
+    encoder: BaseEncoder
+    cache: Any
+    type: str = "cached"
+
+    def __init__(self, encoder:BaseEncoder, cache = None):
+        super().__init__(name=encoder.name, score_threshold=encoder.score_threshold, encoder=encoder,
+                         cache=cache if cache else get_embedding_cache())
+
+    def __call__(self, docs:List[Any]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.name, docs)
+        missing = list(dict.fromkeys(doc for doc, vector in zip(docs, vectors) if vector is None))
+        if missing:
+            embedded = dict(zip(missing, self.encoder(missing)))
+            self.cache.put_many(self.name, missing, [embedded[doc] for doc in missing])
+            vectors = [embedded[doc] if vector is None else vector for doc, vector in zip(docs, vectors)]
+        return vectors
+
+    async def acall(self, docs:List[Any]) -> List[List[float]]:
+        return self(docs)
+
 class queryClassifier:
     def __init__(self, encoder = None):
         # self.encoder = encoder if encoder else OpenAIEncoder(openai_api_key=os.environ["OPENAI_API_KEY"])
-        self.encoder = encoder if encoder else OpenAIEncoder(openai_api_key=st.secrets["OPENAI_API_KEY"])
+        self.encoder = encoder if encoder else CachedEncoder(OpenAIEncoder(openai_api_key=st.secrets["OPENAI_API_KEY"]))
         self.routes = []
+        self.layer = None
 
     def add_route(self, route:Route):
         self.routes.append(route)
@@ -29,16 +57,17 @@ class queryClassifier:
 audit_company_queries = Route(
     name="Auditor query",
     utterances=[
-        "Show me all the companies audited by Deloitte.",
-        "List all audit reports generated by PwC.",
-        "How many companies were audited by KPMG in 2020?",
         "Can you give me details of the audits performed by EY?",
-        "Which companies were reviewed by BDO last year?",
         "Provide the audit opinions from Grant Thornton.",
-        "Who are the auditors for XYZ Corporation?",
-        "List all audit engagements by Crowe LLP.",
         "What were the findings of RSM US LLP's audits?",
-        "Show the number of audits conducted by Mazars USA.",
+        "Summarize the audit work Deloitte has done.",
+        "What did PwC say in its audit reports?",
+        "Describe the audit opinions issued by KPMG.",
+        "What kind of opinions does BDO usually give?",
+        "Can you give me details of the audit generated by auditor named Grant Thornton LLP?",
+        "List all audit reports generated by PwC.",
+        "Which companies were reviewed by BDO last year?",
+        "How many companies were audited by KPMG in 2020?",
     ],
 )
 
@@ -48,13 +77,14 @@ company_queries = Route(
         "Can you give me details on the audit report for Apple Inc.?",
         "Show me the latest audit opinion for Google.",
         "Provide the audit findings for Microsoft Corporation.",
-        "List all audit reports for Tesla Inc.",
         "What were the audit opinions for Amazon?",
         "Show the audit history of Facebook.",
         "Give me the details of the audits for Netflix.",
-        "Who audited IBM last year?",
         "Show me the audit reports for Intel Corporation.",
         "List the audit findings for Uber Technologies.",
+        "List all audit reports for Tesla Inc.",
+        "Who audited IBM last year?",
+        "How many audit reports are there for Microsoft?",
     ],
 )
 
@@ -74,9 +104,97 @@ company_and_audit_company_queries = Route(
     ],
 )
 
+# Greetings, thanks and questions about the bot itself; answered from the general prompt without
+# embedding the query or searching the graph (see aget_response).
+general_queries = Route(
+    name="General query",
+    utterances=[
+        "Hi",
+        "Hello there!",
+        "Hey, how are you?",
+        "Hey, How you doing?",
+        "Good morning.",
+        "Thanks, that was helpful.",
+        "Thank you!",
+        "Bye, see you later.",
+        "Who are you?",
+        "What can you do?",
+        "How can you help me?",
+        "What kind of questions can I ask you?",
+    ],
+)
+
+# Questions about who audits whom, answered from the AUDITS and HAS_REPORT relationships alone
+# once the companies and auditors they name are resolved (see RetrievalEngine.astructured).
+# Questions narrowed by a year, a sector or to reports belong to the routes above: the graph has no such facets.
+list_queries = Route(
+    name="List query",
+    utterances=[
+        "Show me all the companies audited by Deloitte.",
+        "List all audit engagements by Crowe LLP.",
+        "Which companies does KPMG audit?",
+        "Give me the list of clients of Grant Thornton.",
+        "List the auditors of Apple Inc.",
+        "Which firms audit Microsoft?",
+    ],
+)
+
+count_queries = Route(
+    name="Count query",
+    utterances=[
+        "How many companies were audited by KPMG?",
+        "Show the number of companies audited by Mazars USA.",
+        "How many clients does EY have?",
+        "Count the companies audited by Deloitte.",
+        "How many auditors does Apple Inc. have?",
+    ],
+)
+
+lookup_queries = Route(
+    name="Lookup query",
+    utterances=[
+        "Who are the auditors for XYZ Corporation?",
+        "Who audits Tesla Inc.?",
+        "Which firm is the auditor of Amazon?",
+        "Is Microsoft audited by Deloitte?",
+        "Does PwC audit Apple?",
+    ],
+)
+
+# Structured intent of each route; these questions skip vector search when the names they mention resolve.
+ROUTE_INTENTS = {
+    list_queries.name: "list",
+    count_queries.name: "count",
+    lookup_queries.name: "lookup",
+}
+
+def intent_for_route(route_name:str):
+    return ROUTE_INTENTS.get(route_name)
+
+# Routes that need no evidence at all.
+GENERAL_ROUTES = {general_queries.name}
+
+def is_general_route(route_name:str) -> bool:
+    return route_name in GENERAL_ROUTES
+
+# Vector index partitions (node labels) worth searching for each route.
+# Auditor names only appear in the report signature, company names in reports and opinions;
+# reports are searched through their passages. Queries that match no route search every partition.
+ROUTE_PARTITIONS = {
+    audit_company_queries.name: ["Passage"],
+    company_queries.name: ["Passage", "Opinion"],
+    company_and_audit_company_queries.name: ["Passage"],
+    list_queries.name: ["Passage"],
+    count_queries.name: ["Passage"],
+    lookup_queries.name: ["Passage"],
+}
+
+def partitions_for_route(route_name:str):
+    return ROUTE_PARTITIONS.get(route_name)
+
 def load_classifer() -> queryClassifier:
     classifier = queryClassifier()
-    routes = [audit_company_queries, company_queries, company_and_audit_company_queries]
+    routes = [audit_company_queries, company_queries, company_and_audit_company_queries, list_queries, count_queries, lookup_queries, general_queries]
 
     for route in routes:
         classifier.add_route(route)
@@ -87,7 +205,7 @@ def load_classifer() -> queryClassifier:
     
 if __name__ == "__main__":
     classifier = queryClassifier()
-    routes = [audit_company_queries, company_queries, company_and_audit_company_queries]
+    routes = [audit_company_queries, company_queries, company_and_audit_company_queries, list_queries, count_queries, lookup_queries, general_queries]
 
     for route in routes:
         classifier.add_route(route)
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+import networkx as nx
+from matplotlib.figure import Figure
+from . import metrics
+
+COLORS = ["LightSkyBlue","LightGreen","LightCoral","PeachPuff","Thistle", "LightSalmon","LightPink","PaleGoldenrod","LightYellow","Lavender"]
+
+def subgraph_digest(edges:list) -> str:
+    """Content hash of an evidence subgraph; identical subgraphs share one cached picture."""
+    return hashlib.sha256(json.dumps([list(edge) for edge in edges]).encode("utf-8")).hexdigest()
+
+def split_label(label, max_words_per_line=2):
+    words = label.split(' ')
+    lines = []
+    for i in range(0, len(words), max_words_per_line):
+        lines.append(' '.join(words[i:i + max_words_per_line]))
+    return '\n'.join(lines)
+
+def draw_evidence_graph(edges:list):
+    """
+    Draw the (start, relationship, end) edges of an evidence subgraph to PNG bytes.
+    Returns (png_bytes, layout_ms, render_ms).
+    """
+    start = time.perf_counter()
+    G = nx.DiGraph()
+    edge_labels = {}
+    for start_label, relationship_type, end_label in edges:
+        G.add_edge(split_label(start_label), split_label(end_label))
+        edge_labels[(split_label(start_label), split_label(end_label))] = relationship_type
+
+    node_colors = [COLORS[i % len(COLORS)] for i in range(len(G))]
+    pos = nx.spectral_layout(G)  # For spectral layout
+    layout_done = time.perf_counter()
+
+    # A standalone Figure is not registered with pyplot, so nothing leaks and concurrent sessions do not share state.
+    figure = Figure(figsize=(12, 8))
+    ax = figure.add_subplot()
+    nx.draw(G, pos, ax=ax, with_labels=True, node_color=node_colors, node_size=3000, edge_color='gray', font_size=8, font_weight='bold')
+    nx.draw_networkx_edge_labels(G, pos, ax=ax, edge_labels=edge_labels, font_color='red', font_size=7)
+    ax.set_title('Data Path')
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    render_done = time.perf_counter()
+
+    return buffer.getvalue(), 1000 * (layout_done - start), 1000 * (render_done - layout_done)
+
+class GraphRenderer:
+    """Renders evidence subgraphs on demand and keeps the most recent pictures in an LRU keyed by content hash."""
+    def __init__(self, max_items:int = 128):
+        self.max_items = max_items
+        self.cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, edges:list):
+        """
+        Returns (png_bytes, timings) where timings has layout_ms, render_ms and cached.
+        Cached pictures report the timings of the render that produced them.
+        """
+        key = subgraph_digest(edges)
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                image, layout_ms, render_ms = self.cache[key]
+                metrics.increment("render_cache_hits")
+                return image, {"layout_ms": layout_ms, "render_ms": render_ms, "cached": True}
+
+        metrics.increment("render_cache_misses")
+        with metrics.span("render"):
+            image, layout_ms, render_ms = draw_evidence_graph(edges)
+
+        with self._lock:
+            self.cache[key] = (image, layout_ms, render_ms)
+            while len(self.cache) > self.max_items:
+                self.cache.popitem(last=False)
+        return image, {"layout_ms": layout_ms, "render_ms": render_ms, "cached": False}
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_renderer() -> GraphRenderer:
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = GraphRenderer()
+    return _renderer
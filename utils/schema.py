@@ -0,0 +1,64 @@
+import hashlib
+
+# Stable merge keys. Report names are the generic first line of the filing
+# ("Report of Independent Registered Public Accounting Firm"), so reports, opinions and audits
+# are keyed on a hash of their content instead.
+CONSTRAINTS = [
+    "CREATE CONSTRAINT company_name IF NOT EXISTS FOR (c:Company) REQUIRE c.name IS UNIQUE",
+    "CREATE CONSTRAINT auditor_name IF NOT EXISTS FOR (a:Auditor) REQUIRE a.name IS UNIQUE",
+    "CREATE CONSTRAINT report_key IF NOT EXISTS FOR (r:Report) REQUIRE r.key IS UNIQUE",
+    "CREATE CONSTRAINT opinion_key IF NOT EXISTS FOR (o:Opinion) REQUIRE o.key IS UNIQUE",
+    "CREATE CONSTRAINT audit_key IF NOT EXISTS FOR (a:Audit) REQUIRE a.key IS UNIQUE",
+    "CREATE CONSTRAINT passage_key IF NOT EXISTS FOR (p:Passage) REQUIRE p.key IS UNIQUE",
+]
+
+INDEXES = [
+    "CREATE INDEX report_name IF NOT EXISTS FOR (r:Report) ON (r.name)",
+    "CREATE INDEX audit_name IF NOT EXISTS FOR (a:Audit) ON (a.name)",
+    # Fuzzy, ranked Company/Auditor lookup (see Neo4jHandler.retrive_all_likable_names).
+    "CREATE FULLTEXT INDEX entity_names IF NOT EXISTS FOR (n:Company|Auditor) ON EACH [n.name]",
+]
+
+# Labels whose nodes carry `embeddings`, and the name of each one's native vector index.
+VECTOR_INDEXES = {
+    "Report": "report_embeddings",
+    "Opinion": "opinion_embeddings",
+    "Audit": "audit_embeddings",
+    "Passage": "passage_embeddings",
+}
+
+def content_key(*parts:str) -> str:
+    """Hash used as the merge key for content-identified nodes."""
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+def report_key(report_text:str) -> str:
+    return content_key(report_text)
+
+def opinion_key(opinion:str) -> str:
+    return content_key(opinion)
+
+def audit_key(audit_name:str, audit_opinion:str) -> str:
+    return content_key(audit_name, audit_opinion)
+
+def passage_key(report_text:str, index:int) -> str:
+    return content_key(report_text, str(index))
+
+def vector_index_statements(dimensions:int = 1536, similarity:str = "cosine") -> list:
+    return [
+        f"CREATE VECTOR INDEX {index_name} IF NOT EXISTS FOR (n:{label}) ON (n.embeddings) "
+        f"OPTIONS {{indexConfig: {{`vector.dimensions`: {int(dimensions)}, `vector.similarity_function`: '{similarity}'}}}}"
+        for label, index_name in VECTOR_INDEXES.items()
+    ]
+
+def setup_schema(driver, vector_index:bool = False, dimensions:int = 1536):
+    """
+    Create the uniqueness constraints and lookup indexes (and optionally the native vector indexes).
+    Every statement is idempotent, so this is safe to run on each start-up.
+    """
+    statements = CONSTRAINTS + INDEXES
+    if vector_index:
+        statements += vector_index_statements(dimensions)
+
+    with driver.session() as session:
+        for statement in statements:
+            session.run(statement).consume()
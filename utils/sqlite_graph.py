@@ -0,0 +1,249 @@
+import sqlite3
+import threading
+import time
+from .utils import OpenAIEmbedder
+from .backend import GraphBackend
+from .entity_resolver import ENTITY_LABELS, TrigramIndex
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS nodes (
+        id INTEGER PRIMARY KEY,
+        label TEXT NOT NULL,
+        key TEXT NOT NULL,
+        name TEXT,
+        text TEXT,
+        audit_opinion TEXT,
+        idx INTEGER,
+        embeddings BLOB,
+        updated_at INTEGER,
+        UNIQUE (label, key)
+    );
+    CREATE TABLE IF NOT EXISTS edges (
+        start INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        end INTEGER NOT NULL,
+        PRIMARY KEY (start, type, end)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS edges_by_end ON edges (end, type, start);
+"""
+
+class SQLiteGraph(GraphBackend):
+    """
+    Embedded GraphBackend in a single SQLite file, for single-node deployments without a Neo4j server.
+
+    Nodes are keyed by (label, merge key) like the Neo4j constraints in utils/schema.py, with Company
+    and Auditor keyed by name; relationships are an adjacency table indexed in both directions, so the
+    subgraph walk is a handful of indexed lookups in-process. Embeddings are stored as packed blobs in
+    the `storage` format (see utils/vector_codec.py).
+    Element ids are the node rowids, as strings. Safe to share between threads.
+    """
+    def __init__(self, path:str = "graph.sqlite3", snapshot_dir:str = None, index_type:str = "flat", metric:str = "l2", embedder:OpenAIEmbedder = None, storage:str = "float32", **index_params):
+        # Vectors are local, so without a snapshot_dir the index is simply rebuilt from the file at start-up.
+        super().__init__(embedder, snapshot_dir, index_type, metric, "faiss", storage, **index_params)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self._lock = threading.Lock()
+        # Fuzzy name lookup, built from the names table on first use and dropped on every write.
+        self.name_indexes = {}
+
+    def _merge(self, label:str, key:str, properties:dict = None, on_create:bool = False) -> int:
+        """MERGE a node by (label, key) and SET `properties`, only when it is created if `on_create`; returns its rowid."""
+        properties = properties or {}
+        columns = ["label", "key", *properties]
+        if properties and not on_create:
+            updates = ", ".join(f"{column} = excluded.{column}" for column in properties)
+        else:
+            # A no-op update, so RETURNING still yields the existing row.
+            updates = "key = excluded.key"
+        query = (f"INSERT INTO nodes ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                 f"ON CONFLICT (label, key) DO UPDATE SET {updates} RETURNING id")
+        return self.connection.execute(query, [label, key, *properties.values()]).fetchone()[0]
+
+    def _relate(self, start:int, type:str, end:int):
+        self.connection.execute("INSERT OR IGNORE INTO edges (start, type, end) VALUES (?, ?, ?)", (start, type, end))
+
+    def create_rows_batch(self, rows:list, audits:list):
+        """Write report rows and their audits in a single transaction, with the same MERGE semantics as Neo4jHandler's batch queries."""
+        # One timestamp per batch, as Neo4j's timestamp() is fixed within a transaction.
+        now = int(time.time() * 1000)
+        with self._lock, self.connection:
+            for row in rows:
+                company = self._merge("Company", row['company_name'], {"name": row['company_name']}, on_create=True)
+                auditor = self._merge("Auditor", row['auditor_name'], {"name": row['auditor_name']}, on_create=True)
+                self._relate(auditor, "AUDITS", company)
+                report = self._merge("Report", row['report_key'], {"name": row['report_name'], "text": row['report_text'],
+                                                                   "embeddings": self.pack_embeddings(row['report_embeddings']), "updated_at": now})
+                self._relate(company, "HAS_REPORT", report)
+                opinion = self._merge("Opinion", row['opinion_key'], {"text": row['opinion'],
+                                                                     "embeddings": self.pack_embeddings(row['opinion_embeddings']), "updated_at": now})
+                self._relate(report, "CONTAINS_OPINION", opinion)
+                for passage in row.get('passages', []):
+                    node = self._merge("Passage", passage['key'], {"idx": passage['index'], "text": passage['text'],
+                                                                  "embeddings": self.pack_embeddings(passage['embeddings']), "updated_at": now})
+                    self._relate(report, "HAS_PASSAGE", node)
+
+            for audit in audits:
+                opinion = self._merge("Opinion", audit['opinion_key'], {"text": audit['opinion'], "embeddings": self.pack_embeddings(audit['opinion_embeddings']),
+                                                                       "updated_at": now}, on_create=True)
+                node = self._merge("Audit", audit['audit_key'], {"name": audit['audit_name'], "audit_opinion": audit['audit_opinion'],
+                                                                "embeddings": self.pack_embeddings(audit['audit_embeddings']), "updated_at": now})
+                self._relate(opinion, "HAS_AUDIT", node)
+            self.name_indexes = {}
+
+    def count_nodes_with_embeddings(self):
+        with self._lock:
+            return dict(self.connection.execute("SELECT label, count(*) FROM nodes WHERE embeddings IS NOT NULL GROUP BY label"))
+
+    def stream_nodes_with_embeddings(self, batch_size:int):
+        # The connection is shared, so other calls wait until the scan is done.
+        with self._lock:
+            cursor = self.connection.execute("SELECT id, label, embeddings, updated_at FROM nodes WHERE embeddings IS NOT NULL")
+            while batch := cursor.fetchmany(batch_size):
+                yield [(str(id), label, blob, updated_at) for id, label, blob, updated_at in batch]
+
+    def retrieve_node_versions(self):
+        with self._lock:
+            rows = self.connection.execute("SELECT id, label, updated_at FROM nodes WHERE embeddings IS NOT NULL").fetchall()
+        return {str(id): (label, updated_at) for id, label, updated_at in rows}
+
+    def retrieve_nodes_with_embeddings(self, element_ids:list):
+        if not element_ids:
+            return []
+        ids = [int(element_id) for element_id in element_ids]
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT id, label, embeddings FROM nodes WHERE embeddings IS NOT NULL AND id IN ({', '.join('?' * len(ids))})", ids).fetchall()
+        return [(str(id), label, blob) for id, label, blob in rows]
+
+    def _nodes(self, ids) -> dict:
+        ids = list(set(ids))
+        if not ids:
+            return {}
+        rows = self.connection.execute(
+            f"SELECT id, label, name, text, audit_opinion, idx, key FROM nodes WHERE id IN ({', '.join('?' * len(ids))})", ids).fetchall()
+        return {row[0]: row for row in rows}
+
+    def _neighbours(self, ids, type:str, outgoing:bool) -> dict:
+        """Map node id -> ids at the other end of its `type` relationships, in rowid order."""
+        ids = list(set(ids))
+        if not ids:
+            return {}
+        near, far = ("start", "end") if outgoing else ("end", "start")
+        rows = self.connection.execute(
+            f"SELECT {near}, {far} FROM edges WHERE type = ? AND {near} IN ({', '.join('?' * len(ids))}) ORDER BY {far}", [type, *ids]).fetchall()
+        neighbours = {}
+        for node, other in rows:
+            neighbours.setdefault(node, []).append(other)
+        return neighbours
+
+    def fetch_subgraph_rows(self, element_ids:list) -> dict:
+        """
+        The same walk as Neo4jHandler's Cypher query, as a few indexed lookups per hop for all hits at once:
+        hit -> Report (via Passage, Opinion or Audit), Report -> Company -> Auditors, Report -> Opinion -> Audits.
+        """
+        hit_ids = [int(element_id) for element_id in element_ids]
+        with self._lock:
+            hits = self._nodes(hit_ids)
+
+            # Opinions are shared between reports; like head(collect(r)) in Cypher, any one of them is used.
+            audit_opinions = self._neighbours([id for id, hit in hits.items() if hit[1] == "Audit"], "HAS_AUDIT", outgoing=False)
+            opinion_of = {id: id for id, hit in hits.items() if hit[1] == "Opinion"}
+            opinion_of.update({id: opinions[0] for id, opinions in audit_opinions.items()})
+            opinion_reports = self._neighbours(opinion_of.values(), "CONTAINS_OPINION", outgoing=False)
+            passage_reports = self._neighbours([id for id, hit in hits.items() if hit[1] == "Passage"], "HAS_PASSAGE", outgoing=False)
+
+            report_of = {}
+            for id, hit in hits.items():
+                if hit[1] == "Report":
+                    report_of[id] = id
+                elif hit[1] == "Passage" and id in passage_reports:
+                    report_of[id] = passage_reports[id][0]
+                elif id in opinion_of and opinion_of[id] in opinion_reports:
+                    report_of[id] = opinion_reports[opinion_of[id]][0]
+
+            report_ids = set(report_of.values())
+            companies = self._neighbours(report_ids, "HAS_REPORT", outgoing=False)
+            auditors = self._neighbours([ids[0] for ids in companies.values()], "AUDITS", outgoing=False)
+            opinions = self._neighbours(report_ids, "CONTAINS_OPINION", outgoing=True)
+            audits = self._neighbours([ids[0] for ids in opinions.values()], "HAS_AUDIT", outgoing=True)
+
+            related = set(report_ids)
+            for group in (companies, auditors, opinions, audits):
+                for ids in group.values():
+                    related.update(ids)
+            nodes = self._nodes(related)
+
+        rows = {}
+        for element_id, id in zip(element_ids, hit_ids):
+            if id not in hits:
+                continue
+            _, label, name, text, audit_opinion, index, _ = hits[id]
+            report = nodes.get(report_of.get(id))
+            company = nodes[companies[report[0]][0]] if report and report[0] in companies else None
+            opinion = nodes[opinions[report[0]][0]] if report and report[0] in opinions else None
+            rows[element_id] = {
+                "label": label, "hit_name": name, "hit_audit_opinion": audit_opinion, "hit_index": index, "hit_text": text,
+                "company": company[2] if company else None,
+                "auditors": [nodes[auditor][2] for auditor in auditors.get(company[0], [])] if company else [],
+                "report_key": report[6] if report else None,
+                "report_name": report[2] if report else None,
+                "report_text": report[3] if report else None,
+                "opinion": opinion[3] if opinion else None,
+                "audits": [{"name": nodes[audit][2], "opinion": nodes[audit][4]} for audit in audits.get(opinion[0], [])] if opinion else [],
+            }
+        return rows
+
+    def audit_relationships(self, auditor_ids:list = None, company_ids:list = None):
+        """Served from the edge table's (start, type) and (end, type) indexes."""
+        conditions, params = [], []
+        for column, ids in (("start", auditor_ids), ("end", company_ids)):
+            if ids:
+                conditions.append(f"e.{column} IN ({', '.join('?' * len(ids))})")
+                params += [int(id) for id in ids]
+        if not conditions:
+            return []
+
+        query = f"""
+            SELECT e.start, au.name, e.end, c.name,
+                   (SELECT count(*) FROM edges r WHERE r.start = e.end AND r.type = 'HAS_REPORT')
+            FROM edges e JOIN nodes au ON au.id = e.start JOIN nodes c ON c.id = e.end
+            WHERE e.type = 'AUDITS' AND {' AND '.join(conditions)}
+            ORDER BY c.name, au.name
+        """
+        with self._lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [{'auditor_id': str(auditor_id), 'auditor': auditor, 'company_id': str(company_id), 'company': company, 'reports': reports}
+                for auditor_id, auditor, company_id, company, reports in rows]
+
+    def retrive_all_likable_names(self, company_name, table:str = "Company", limit:int = 10):
+        """Company or Auditor names matching `company_name`, best first, tolerant to typos, from an in-process trigram index."""
+        if table not in ENTITY_LABELS:
+            raise ValueError(f"Unknown entity label '{table}', expected one of {ENTITY_LABELS}")
+
+        with self._lock:
+            index = self.name_indexes.get(table)
+            if index is None:
+                index = TrigramIndex()
+                for id, name in self.connection.execute("SELECT id, name FROM nodes WHERE label = ? AND name IS NOT NULL", (table,)):
+                    index.add(str(id), name)
+                self.name_indexes[table] = index
+        return index.search(company_name, limit)
+
+    def retrieve_entity_names(self):
+        """(label, element_id, name) for every Company and Auditor, used to keep the in-process EntityResolver in sync."""
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT label, id, name FROM nodes WHERE label IN ({', '.join('?' * len(ENTITY_LABELS))})", ENTITY_LABELS).fetchall()
+        return [(label, str(id), name) for label, id, name in rows]
+
+    def close(self):
+        self.connection.close()
+
+    def clear_database(self):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM edges")
+            self.connection.execute("DELETE FROM nodes")
+            self.name_indexes = {}
@@ -0,0 +1,86 @@
+from .entity_resolver import NAME_FILLERS, normalize_name
+
+# Words a list, count or lookup question may use besides the names it mentions. Anything else ("in 2020",
+# "last year", "reports", "in the energy sector") is a constraint these answers cannot express, and the
+# question goes through retrieval instead.
+ANSWERABLE_WORDS = set("""
+    a all an any are as audit audited auditing auditor auditors audits be by can client clients companies company
+    count did do does done engagement engagements every firm firms for from give has have how i is it its list many
+    me my name named names number of on or our please s show tell the their them these they this those to was were
+    what which who whom whose with you
+""".split())
+
+def unanswerable_words(text:str, mentions:dict) -> list:
+    """Words of the question that are neither part of a mentioned name nor in ANSWERABLE_WORDS."""
+    named = {word for matches in mentions.values() for match in matches for word in match['span'].split()}
+    return [word for word in normalize_name(text).split() if word not in named and word not in ANSWERABLE_WORDS and word not in NAME_FILLERS]
+
+def plural(count:int, noun:str) -> str:
+    return f"{count} {noun}" if count == 1 else f"{count} {noun}s"
+
+def names(mentions:list) -> str:
+    return " / ".join(f"**{mention['name']}**" for mention in mentions)
+
+def company_line(row:dict) -> str:
+    return f"- {row['company']} ({plural(row['reports'], 'report')})"
+
+def structured_answer(intent:str, mentions:dict, rows:list) -> str:
+    """
+    Markdown answer to a list, count or lookup question from its AUDITS rows (see GraphBackend.audit_relationships).
+    Nothing is left out: every company or auditor on record is listed.
+    """
+    auditors, companies = mentions.get("Auditor", []), mentions.get("Company", [])
+
+    if auditors and companies:
+        pairs = {(row['auditor_id'], row['company_id']) for row in rows}
+        lines = []
+        for company in companies:
+            matched = [auditor['name'] for auditor in auditors if (auditor['Id'], company['Id']) in pairs]
+            if matched:
+                lines.append(f"Yes, **{company['name']}** is audited by {', '.join(f'**{name}**' for name in matched)}.")
+            else:
+                lines.append(f"No, **{company['name']}** is not audited by {names(auditors)} according to the records.")
+        return "\n\n".join(lines)
+
+    if auditors:
+        by_auditor = {auditor['Id']: [row for row in rows if row['auditor_id'] == auditor['Id']] for auditor in auditors}
+        sections = []
+        for auditor in auditors:
+            clients = by_auditor[auditor['Id']]
+            if intent == "count":
+                sections.append(f"**{auditor['name']}** audits **{len(clients)}** {'company' if len(clients) == 1 else 'companies'}.")
+            elif clients:
+                sections.append(f"**{auditor['name']}** audits {len(clients)} {'company' if len(clients) == 1 else 'companies'}:\n\n"
+                                + "\n".join(company_line(row) for row in clients))
+            else:
+                sections.append(f"No companies audited by **{auditor['name']}** are on record.")
+        return "\n\n".join(sections)
+
+    sections = []
+    for company in companies:
+        audited_by = [row for row in rows if row['company_id'] == company['Id']]
+        reports = audited_by[0]['reports'] if audited_by else 0
+        if not audited_by:
+            sections.append(f"No auditor of **{company['name']}** is on record.")
+        elif intent == "count":
+            sections.append(f"**{company['name']}** has **{len(audited_by)}** {'auditor' if len(audited_by) == 1 else 'auditors'} "
+                            f"and {plural(reports, 'audit report')} on record.")
+        else:
+            sections.append(f"**{company['name']}** is audited by {', '.join('**' + row['auditor'] + '**' for row in audited_by)} "
+                            f"({plural(reports, 'audit report')} on record).")
+    return "\n\n".join(sections)
+
+def structured_records(rows:list) -> list:
+    """One evidence record per AUDITS relationship, in the shape of GraphBackend.subgraph_record, for the UI and follow-up turns."""
+    return [{
+        'ElementId': f"{row['auditor_id']}->{row['company_id']}",
+        'CompanyName': row['company'],
+        'AuditorName': row['auditor'],
+        'ReportKey': None,
+        'ReportName': None,
+        'ReportText': f"{row['auditor']} audits {row['company']}; {plural(row['reports'], 'audit report')} on record.",
+        'Opinion': None,
+        'AuditName': None,
+        'AuditOpinion': None,
+        'Edges': [(f"Auditor : {row['auditor']}", "AUDITS", f"Company : {row['company']}")],
+    } for row in rows]
@@ -1,13 +1,18 @@
 import os
+import threading
 from langchain_openai import OpenAIEmbeddings
 from openai import OpenAI
 from langchain_community.chat_models import ChatOpenAI
 from langchain_core.runnables import Runnable, RunnableMap, RunnableLambda, RunnablePassthrough
 from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import HumanMessage, SystemMessage
 from operator import itemgetter
 from dotenv import load_dotenv
 import streamlit as st
 from pandas import DataFrame
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .prompt_budget import PromptBudget, count_tokens
+from . import metrics
 load_dotenv()
 
 def generate_chatbot_tempalte(query, records, general_question:bool = False):
@@ -101,34 +106,90 @@ class OpenAIChatResponse:
         # self.openai_api_key = os.environ.get("OPENAI_API_KEY")
         self.openai_api_key = st.secrets["OPENAI_API_KEY"]
         self.client = OpenAI()
+        # ChatOpenAI keeps pooled sync and async HTTP clients; build one per (model, max_token) and reuse it.
+        self.models = {}
+        self._models_lock = threading.Lock()
+
+    def get_model(self, model:str = "gpt-3.5-turbo", max_token:int = 4000) -> ChatOpenAI:
+        with self._models_lock:
+            if (model, max_token) not in self.models:
+                self.models[(model, max_token)] = ChatOpenAI(temperature=0.3, model=model, max_tokens=max_token)
+            return self.models[(model, max_token)]
     
-    def generate_response(self, history, query:str, records:DataFrame, general_question:bool = False, model:str = "gpt-3.5-turbo", max_token:int = 4000):
-        
-        memory = self.make_memory_from_testing_chat_history(history)
+    def build_chain(self, history, model:str = "gpt-3.5-turbo", max_token:int = 4000, summary:str = None):
+        memory = self.make_memory_from_testing_chat_history(history, summary)
 
         loaded_memory = RunnablePassthrough.assign(
             chat_history=RunnableLambda(memory.load_memory_variables) | itemgetter("history"),
         )
 
-        model = ChatOpenAI(temperature=0.3, model=model, max_tokens=max_token)
+        model = self.get_model(model, max_token)
 
-        # Handle the prompt
+        # Handle the prompt: the budgeted chat history followed by the instructions and records
         handle_prompt = RunnableLambda(
-            lambda inputs: inputs["prompt"]
+            lambda inputs: inputs["chat_history"] + [HumanMessage(content=inputs["prompt"])]
         )
 
-        intent_clf_chain = loaded_memory | handle_prompt| model
-
-        prompt = generate_chatbot_tempalte(query, records, general_question)
+        return loaded_memory | handle_prompt| model
 
-        try: 
-            result = intent_clf_chain.invoke({"prompt" : prompt})
-            return result.content
-        except:
-            return "No Response"
+    def prepare(self, history, query:str, records:DataFrame, general_question:bool = False, model:str = "gpt-3.5-turbo", max_token:int = 4000, stats:dict = None, summary:str = None):
+        """
+        Fit the summary, history and records into the model's context window and build the chain for them.
+        The token breakdown is added to `stats` under 'tokens' when a dict is given.
+        """
+        budget = PromptBudget(model, max_token)
+        prompt, history, breakdown = budget.build(query, records, history, generate_chatbot_tempalte, general_question, summary)
+        if stats is not None:
+            stats['tokens'] = breakdown
+
+        return self.build_chain(history, model, budget.output_tokens, summary), prompt
+
+    @staticmethod
+    def count_llm_call(stats:dict, answer:str, model:str):
+        metrics.increment("llm_calls")
+        metrics.increment("llm_prompt_tokens", stats['tokens']['total'])
+        metrics.increment("llm_completion_tokens", count_tokens(answer, model))
+
+    def generate_response(self, history, query:str, records:DataFrame, general_question:bool = False, model:str = "gpt-3.5-turbo", max_token:int = 4000, stats:dict = None, summary:str = None):
+        stats = stats if stats is not None else {}
+        with metrics.span("generate"):
+            intent_clf_chain, prompt = self.prepare(history, query, records, general_question, model, max_token, stats, summary)
+
+            try: 
+                result = intent_clf_chain.invoke({"prompt" : prompt})
+                self.count_llm_call(stats, result.content, model)
+                return result.content
+            except:
+                return "No Response"
+
+    async def agenerate_response(self, history, query:str, records:DataFrame, general_question:bool = False, model:str = "gpt-3.5-turbo", max_token:int = 4000, stats:dict = None, summary:str = None):
+        """Async generate_response; awaits the model on the pooled async client instead of blocking a thread."""
+        stats = stats if stats is not None else {}
+        with metrics.span("generate"):
+            intent_clf_chain, prompt = self.prepare(history, query, records, general_question, model, max_token, stats, summary)
+
+            try: 
+                result = await intent_clf_chain.ainvoke({"prompt" : prompt})
+                self.count_llm_call(stats, result.content, model)
+                return result.content
+            except:
+                return "No Response"
+
+    def stream_response(self, history, query:str, records:DataFrame, general_question:bool = False, model:str = "gpt-3.5-turbo", max_token:int = 4000, stats:dict = None, summary:str = None):
+        """Same as generate_response, but yields the answer in text chunks as the model produces them."""
+        stats = stats if stats is not None else {}
+        with metrics.span("generate"):
+            intent_clf_chain, prompt = self.prepare(history, query, records, general_question, model, max_token, stats, summary)
+
+            parts = []
+            for chunk in intent_clf_chain.stream({"prompt" : prompt}):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+            self.count_llm_call(stats, "".join(parts), model)
 
     
-    def make_memory_from_testing_chat_history(self,chat_history):
+    def make_memory_from_testing_chat_history(self,chat_history, summary:str = None):
         """
         This function is used to convert the chatHistory generated by testing UI (tabot_chatbot_UI) 
         Generates a ConversationBufferMemory object from a chat history for chatbot_test_UI.
@@ -136,6 +197,7 @@ class OpenAIChatResponse:
         Args:
         - chat_history (list): A list of dictionaries, each containing a message from 'user' and a response from 'ai'.
         Example: [{'user': 'Hello, how are you?', 'ai': 'I am fine, thank you.'}, ...]
+        - summary (str): Summary of the turns before chat_history, added first as a system message.
         
         Returns:
         - ConversationBufferMemory: The memory object containing the conversation history.
@@ -145,6 +207,9 @@ class OpenAIChatResponse:
             output_key="answer", 
             input_key="question"
         )
+
+        if summary:
+            memory.chat_memory.add_message(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
         
         if len(chat_history) == 0:
             return memory
@@ -164,12 +229,16 @@ class OpenAIChatResponse:
         query = f"""
                     Please generate a detailed summary of the following text: {text}
                 """
+        return self.complete(query, model, max_token)
+
+    def complete(self, prompt:str, model:str = "gpt-3.5-turbo", max_token:int = 4000):
+        """The model's reply to a single user message sent as is, or None on error."""
         try:
             chat_completion = self.client.chat.completions.create(
                 messages=[
                     {
                         "role": "user",
-                        "content": query,
+                        "content": prompt,
                     }
                 ],
                 model=model,
@@ -181,7 +250,7 @@ class OpenAIChatResponse:
             return None
 
 class OpenAIEmbedder:
-    def __init__(self, model:str='text-embedding-ada-002', **kwargs):
+    def __init__(self, model:str='text-embedding-ada-002', cache:EmbeddingCache = None, use_cache:bool = True, **kwargs):
         self.model = model  # can also be text-embedding-3-large        
         # self.openai_api_key = os.environ.get("OPENAI_API_KEY")
         self.openai_api_key = st.secrets["OPENAI_API_KEY"]
@@ -191,18 +260,64 @@ class OpenAIEmbedder:
             openai_api_key=self.openai_api_key,
             **kwargs
         )
+        # Shared by the chat app and ingestion so repeated texts are only embedded once.
+        self.cache = (cache if cache else get_embedding_cache()) if use_cache else None
         
     def get_embedder(self):
         return self.embedder
     
     def embed_text(self, text:str):
-        return self.embedder.embed_query(text)
+        return self.embed_query(text)
     
     def embed_query(self, query_text:str):
-        return self.embedder.embed_query(query_text)
+        with metrics.span("embed_query"):
+            embeddings = self.cache.get(self.model, query_text) if self.cache is not None else None
+            if embeddings is not None:
+                metrics.increment("embedding_cache_hits")
+                return embeddings
+
+            embeddings = self.embedder.embed_query(query_text)
+            self.count_api_call(1)
+            if self.cache is not None:
+                self.cache.put(self.model, query_text, embeddings)
+            return embeddings
+
+    async def aembed_query(self, query_text:str):
+        with metrics.span("embed_query"):
+            embeddings = self.cache.get(self.model, query_text) if self.cache is not None else None
+            if embeddings is not None:
+                metrics.increment("embedding_cache_hits")
+                return embeddings
+
+            embeddings = await self.embedder.aembed_query(query_text)
+            self.count_api_call(1)
+            if self.cache is not None:
+                self.cache.put(self.model, query_text, embeddings)
+            return embeddings
 
     def embed_documents(self, docs:list[str]):
-        return self.embedder.embed_documents(docs)
+        if self.cache is None:
+            self.count_api_call(len(docs))
+            return self.embedder.embed_documents(docs)
+
+        embeddings = self.cache.get_many(self.model, docs)
+        # Embed each distinct missing text once, in a single batched call.
+        missing = list(dict.fromkeys(doc for doc, embedding in zip(docs, embeddings) if embedding is None))
+        metrics.increment("embedding_cache_hits", len(docs) - sum(1 for embedding in embeddings if embedding is None))
+        if missing:
+            fresh = dict(zip(missing, self.embedder.embed_documents(missing)))
+            self.count_api_call(len(missing))
+            self.cache.put_many(self.model, missing, [fresh[doc] for doc in missing])
+            embeddings = [embedding if embedding is not None else fresh[doc] for doc, embedding in zip(docs, embeddings)]
+        return embeddings
+
+    @staticmethod
+    def count_api_call(texts:int):
+        metrics.increment("embedding_api_calls")
+        metrics.increment("embedding_texts", texts)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache else {}
     
 
 
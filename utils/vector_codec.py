@@ -0,0 +1,37 @@
+import struct
+import numpy as np
+
+# Storage formats for node embeddings. float32 is lossless; float16 halves the size with ~1e-3 relative
+# error; int8 quarters it, scaled per vector so the largest component maps to +-127.
+CODECS = ("float32", "float16", "int8")
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Packed header: codec id, three padding bytes and the float32 scale, so the payload stays 8-byte aligned.
+HEADER = struct.Struct("<B3xf")
+
+def encode(embeddings, codec:str = "float32") -> bytes:
+    """Pack one embedding as header + payload bytes in the given codec."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown embedding codec '{codec}', expected one of {CODECS}")
+
+    vector = np.asarray(embeddings, dtype=np.float32)
+    scale = 1.0
+    if codec == "int8":
+        peak = float(np.abs(vector).max()) if vector.size else 0.0
+        scale = peak / 127 if peak else 1.0
+        vector = np.clip(np.rint(vector / scale), -127, 127)
+    return HEADER.pack(CODECS.index(codec), scale) + vector.astype(DTYPES[codec]).tobytes()
+
+def decode(value) -> np.ndarray:
+    """float32 vector from packed bytes, or from a plain list of floats as stored before packing existed."""
+    if not isinstance(value, (bytes, bytearray, memoryview)):
+        return np.asarray(value, dtype=np.float32)
+
+    codec, scale = HEADER.unpack_from(value)
+    vector = np.frombuffer(value, dtype=DTYPES[CODECS[codec]], offset=HEADER.size).astype(np.float32)
+    if CODECS[codec] == "int8":
+        vector *= scale
+    return vector
+
+def encoded_size(dimension:int, codec:str) -> int:
+    return HEADER.size + dimension * np.dtype(DTYPES[codec]).itemsize
@@ -0,0 +1,503 @@
+import json
+import os
+import shutil
+import time
+import numpy as np
+import faiss
+
+# Bump whenever the on-disk layout changes; older snapshots are then ignored and rebuilt.
+SNAPSHOT_VERSION = 2
+# File in a snapshot directory naming the version sub-directory that is current.
+CURRENT = "CURRENT"
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "sq8", "pq")
+# Compressed index types, whose approximate distances are re-ranked against the float32 vectors.
+QUANTIZED = ("sq8", "pq")
+# PQ trains 256 centroids per sub-quantizer; partitions smaller than this stay exact.
+PQ_MIN_TRAINING = 256
+# Rows are normalised and added to FAISS this many at a time, and at most TRAIN_SAMPLE evenly spaced
+# rows train IVF/SQ/PQ, so a build never copies the whole matrix.
+ADD_BATCH = 65536
+TRAIN_SAMPLE = 100000
+METRICS = ("l2", "cosine")
+# Settings baked into a built index; the others only affect search and may change between runs.
+BUILD_SETTINGS = ("index_type", "metric", "nlist", "hnsw_m", "ef_construction", "pq_m")
+# Index types that learn from their rows. Changes are added to the trained index until it holds
+# RETRAIN_GROWTH times the rows it was trained on, so retraining is amortised over the growth.
+TRAINED = ("ivf", "sq8", "pq")
+RETRAIN_GROWTH = 2
+# Removed rows stay in the float32 matrix (and, since HNSW cannot remove vectors, in an HNSW graph,
+# skipped at search time) until they make up this fraction of the partition, which is then rebuilt
+# from the live rows.
+MAX_DEAD_FRACTION = 0.25
+
+def normalize(vectors:np.ndarray) -> np.ndarray:
+    vectors = np.array(vectors, dtype=np.float32, copy=True)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def write_snapshot(path:str, write):
+    """
+    Call write(directory) on a new version sub-directory of `path`, then point CURRENT at it in one
+    os.replace, so a reader sees either the previous snapshot or the new one and never a mix of both.
+    Every other version is removed, except the one just replaced: indexes loaded from it may still read its files.
+    """
+    os.makedirs(path, exist_ok=True)
+    previous = current_snapshot(path)
+    version = f"v{time.time_ns()}"
+    write(os.path.join(path, version))
+
+    tmp_current = os.path.join(path, f"{CURRENT}.tmp")
+    with open(tmp_current, "w") as f:
+        f.write(version)
+    os.replace(tmp_current, os.path.join(path, CURRENT))
+
+    # Versions are compared by name, not by order: a clock that went backwards or a directory copied
+    # from another host must not make the new snapshot look stale.
+    keep = {version, os.path.basename(previous) if previous else None}
+    for name in os.listdir(path):
+        if name.startswith("v") and name not in keep and os.path.isdir(os.path.join(path, name)):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+def current_snapshot(path:str):
+    """The version sub-directory CURRENT points at, or None when `path` holds no snapshot."""
+    try:
+        with open(os.path.join(path, CURRENT)) as f:
+            directory = os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return directory if os.path.isdir(directory) else None
+
+class VectorIndex:
+    """
+    FAISS index over node embeddings together with the elementIds of its rows.
+
+    Row i of `node_ids` and `vectors` is FAISS id i. Rows are only ever appended: a changed node gets
+    a new row and its old one is removed from FAISS and set to None in `node_ids`. The FAISS index,
+    the float32 matrix and the ids are written to a snapshot together and loaded back memory-mapped,
+    so a restart neither pulls the vectors over the network nor trains or builds the index again.
+
+    Backends:
+    - flat: exact search.
+    - ivf: inverted lists; `nlist` clusters, `nprobe` of them scanned per query.
+    - hnsw: graph search; `hnsw_m` links per node, `ef_construction` / `ef_search` beam widths.
+    - sq8: 8-bit scalar quantizer, a quarter of flat's memory.
+    - pq: product quantizer with `pq_m` one-byte codes per vector (1536 dims -> 64 bytes by default).
+
+    The compressed types fetch `rerank` times k candidates and re-rank them by exact distance to the
+    float32 vectors, which are memory-mapped once the index has been saved or loaded from a snapshot.
+
+    With metric="cosine" vectors are L2-normalised and searched by inner product. Distances are
+    always reported as squared L2 (for unit vectors 2 - 2*cos), so one threshold works for every backend.
+    """
+    def __init__(self, node_ids:list = None, vectors:np.ndarray = None, watermark:int = 0,
+                 index_type:str = "flat", metric:str = "l2", nlist:int = 100, nprobe:int = 8,
+                 hnsw_m:int = 32, ef_construction:int = 80, ef_search:int = 64, pq_m:int = 64, rerank:int = 4):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{index_type}', expected one of {INDEX_TYPES}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+
+        self.node_ids = list(node_ids) if node_ids else []
+        self.vectors = vectors
+        self.watermark = watermark
+        # Rows removed from the index (None in node_ids), the live rows the quantizer was trained on,
+        # and the snapshot file the index was loaded from.
+        self.dead = 0
+        self.trained_rows = 0
+        self.source = None
+        self.config = {
+            "index_type": index_type, "metric": metric, "nlist": nlist, "nprobe": nprobe,
+            "hnsw_m": hnsw_m, "ef_construction": ef_construction, "ef_search": ef_search,
+            "pq_m": pq_m, "rerank": rerank,
+        }
+        self.index = None
+
+        if self.vectors is not None and len(self.vectors) > 0:
+            self.build()
+
+    def __len__(self):
+        return len(self.node_ids) - self.dead
+
+    @property
+    def dimension(self):
+        return self.vectors.shape[1] if self.vectors is not None else None
+
+    def prepared(self, rows) -> np.ndarray:
+        """Contiguous float32 rows as FAISS expects them: a view where possible, normalised copies for cosine."""
+        vectors = np.ascontiguousarray(self.vectors[rows], dtype=np.float32)
+        return normalize(vectors) if self.config["metric"] == "cosine" else vectors
+
+    def live(self):
+        """(node_ids, vectors) of the rows still in the index."""
+        if not self.dead:
+            return self.node_ids, self.vectors
+        rows = [row for row, node_id in enumerate(self.node_ids) if node_id is not None]
+        return [self.node_ids[row] for row in rows], np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def build(self):
+        """Train and fill a FAISS index from every row; all rows must be live."""
+        config = self.config
+        faiss_metric = faiss.METRIC_INNER_PRODUCT if config["metric"] == "cosine" else faiss.METRIC_L2
+        training_rows = slice(0, None, max(1, len(self) // TRAIN_SAMPLE))
+
+        if config["index_type"] == "ivf":
+            # IVF needs at least one training point per cluster.
+            nlist = max(1, min(config["nlist"], len(self)))
+            index = faiss.index_factory(self.dimension, f"IVF{nlist},Flat", faiss_metric)
+            index.train(self.prepared(training_rows))
+        elif config["index_type"] == "hnsw":
+            index = faiss.index_factory(self.dimension, f"HNSW{config['hnsw_m']}", faiss_metric)
+            index.hnsw.efConstruction = config["ef_construction"]
+        elif config["index_type"] == "sq8":
+            index = faiss.index_factory(self.dimension, "SQ8", faiss_metric)
+            index.train(self.prepared(training_rows))
+        elif config["index_type"] == "pq" and len(self) >= PQ_MIN_TRAINING:
+            # The dimension must split evenly into sub-quantizers.
+            pq_m = max(m for m in range(1, min(config["pq_m"], self.dimension) + 1) if self.dimension % m == 0)
+            index = faiss.index_factory(self.dimension, f"PQ{pq_m}", faiss_metric)
+            # Polysemous codes only speed up Hamming-filtered search, which is not used, and dominate training time.
+            index.do_polysemous_training = False
+            index.train(self.prepared(training_rows))
+        else:
+            index = faiss.index_factory(self.dimension, "Flat", faiss_metric)
+
+        # Row numbers as FAISS ids, so rows can later be removed and appended without renumbering.
+        # IVF stores ids in its inverted lists itself; every other type needs the id map.
+        if config["index_type"] != "ivf":
+            index = faiss.IndexIDMap2(index)
+        for start in range(0, len(self), ADD_BATCH):
+            rows = slice(start, start + ADD_BATCH)
+            index.add_with_ids(self.prepared(rows), np.arange(start, min(start + ADD_BATCH, len(self)), dtype=np.int64))
+        self.index = index
+        self.trained_rows = len(self)
+
+    @property
+    def tombstones(self) -> int:
+        """Removed rows still in the FAISS index, which only HNSW has."""
+        return self.dead if self.config["index_type"] == "hnsw" else 0
+
+    def search_params(self, nprobe:int = None, ef_search:int = None):
+        """Per-call FAISS parameters, so callers can trade recall for speed without mutating the shared index."""
+        if self.config["index_type"] == "ivf":
+            return faiss.SearchParametersIVF(nprobe=nprobe or self.config["nprobe"])
+        if self.config["index_type"] == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.config["ef_search"])
+        return None
+
+    def search(self, query_vector:np.ndarray, k:int, nprobe:int = None, ef_search:int = None):
+        """Return (distances, positions) for a single query; both empty when the index has no rows."""
+        if self.index is None or k <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        query_vector = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        if self.config["metric"] == "cosine":
+            query_vector = normalize(query_vector)
+
+        rerank = self.config["index_type"] in QUANTIZED and self.config["rerank"] > 1
+        fetch = min(k * self.config["rerank"] if rerank else k, len(self))
+        # Removed HNSW rows are still in the graph; fetch enough to make up for them.
+        D, I = self.index.search(query_vector, fetch + self.tombstones, params=self.search_params(nprobe, ef_search))
+        D, I = D[0], I[0]
+
+        # Drop the -1 padding FAISS returns when fewer than k neighbours were reached, and removed rows.
+        found = I >= 0
+        if self.tombstones:
+            found &= np.array([position >= 0 and self.node_ids[position] is not None for position in I], dtype=bool)
+        D, I = D[found][:fetch], I[found][:fetch]
+        if rerank:
+            return self.rerank(query_vector[0], I, k)
+        if self.config["metric"] == "cosine":
+            D = 2.0 - 2.0 * D
+        return D, I
+
+    def rerank(self, query_vector:np.ndarray, positions:np.ndarray, k:int):
+        """Exact squared L2 distances from the float32 vectors of the candidate rows, nearest k first."""
+        # Sorted positions read a memory-mapped matrix front to back.
+        positions = np.sort(positions)
+        candidates = np.asarray(self.vectors[positions], dtype=np.float32)
+        if self.config["metric"] == "cosine":
+            D = 2.0 - 2.0 * (normalize(candidates) @ query_vector)
+        else:
+            D = ((candidates - query_vector) ** 2).sum(axis=1)
+        order = np.argsort(D, kind="stable")[:k]
+        return D[order], positions[order]
+
+    def apply_changes(self, upserts:list, deleted:set, watermark:int):
+        """
+        Return a new VectorIndex with changed/new nodes replaced and deleted nodes dropped.
+
+        The changes are applied to a copy of the FAISS index with remove_ids and add_with_ids, so this
+        one keeps serving searches meanwhile. The partition is only rebuilt from its live rows once a
+        trained index has doubled since training, or once removed rows pass MAX_DEAD_FRACTION.
+
+        Args:
+        - upserts (list): (element_id, embeddings) tuples for nodes added or changed since the watermark.
+        - deleted (set): elementIds that no longer exist in the graph.
+        - watermark (int): the newest `updated_at` covered by the result.
+        """
+        replaced = deleted | {node_id for node_id, _ in upserts}
+        removed = [row for row, node_id in enumerate(self.node_ids) if node_id is not None and node_id in replaced]
+
+        node_ids = list(self.node_ids)
+        for row in removed:
+            node_ids[row] = None
+        node_ids.extend(node_id for node_id, _ in upserts)
+
+        parts = [] if self.vectors is None else [self.vectors]
+        if upserts:
+            parts.append(np.array([embeddings for _, embeddings in upserts], dtype=np.float32))
+        vectors = np.concatenate(parts) if parts else None
+
+        changed = VectorIndex(watermark=watermark, **self.config)
+        changed.node_ids, changed.vectors = node_ids, vectors
+        changed.dead = self.dead + len(removed)
+        if self.index is None or self.needs_rebuild(len(changed), changed.dead):
+            return VectorIndex(*changed.live(), watermark, **self.config)
+
+        index = self.writable()
+        if removed and self.config["index_type"] != "hnsw":
+            index.remove_ids(np.array(removed, dtype=np.int64))
+        if upserts:
+            rows = slice(len(self.node_ids), len(node_ids))
+            index.add_with_ids(changed.prepared(rows), np.arange(rows.start, rows.stop, dtype=np.int64))
+        changed.index = index
+        changed.trained_rows = self.trained_rows
+        return changed
+
+    def needs_rebuild(self, live_rows:int, dead_rows:int) -> bool:
+        if self.config["index_type"] in TRAINED and live_rows > RETRAIN_GROWTH * self.trained_rows:
+            return True
+        return dead_rows > MAX_DEAD_FRACTION * (live_rows + dead_rows)
+
+    def writable(self):
+        """An in-memory copy of the FAISS index; a memory-mapped index is re-read from its snapshot file instead."""
+        if self.source and os.path.exists(self.source):
+            return faiss.read_index(self.source)
+        return faiss.clone_index(self.index)
+
+    def save(self, path:str):
+        """Write a snapshot to `path`, replacing any previous one atomically (see write_snapshot)."""
+        write_snapshot(path, self.write)
+
+    def write(self, directory:str):
+        """
+        Write the FAISS index, the vectors and the ids into a new directory, then read the index and
+        the vectors back memory-mapped, so they are paged in from the snapshot instead of kept in memory.
+        """
+        os.makedirs(directory)
+        if self.index is not None:
+            np.save(os.path.join(directory, "vectors.npy"), np.asarray(self.vectors, dtype=np.float32))
+            faiss.write_index(self.index, os.path.join(directory, "index.faiss"))
+
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "watermark": self.watermark,
+                "node_ids": self.node_ids,
+                "trained_rows": self.trained_rows,
+                "config": {key: self.config[key] for key in BUILD_SETTINGS},
+            }, f)
+
+        if self.index is not None:
+            self.attach(directory)
+
+    def attach(self, directory:str):
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.source = os.path.join(directory, "index.faiss")
+        self.index = faiss.read_index(self.source, faiss.IO_FLAG_MMAP)
+
+    @classmethod
+    def load(cls, path:str, **config):
+        """Load the current snapshot in `path`; returns None if it is missing or outdated."""
+        directory = current_snapshot(path)
+        return cls.read(directory, **config) if directory else None
+
+    @classmethod
+    def read(cls, directory:str, **config):
+        """
+        Load an index written by `write`, memory-mapped. Returns None if it is missing or outdated.
+        An index built with different settings is rebuilt from the snapshot's vectors.
+        """
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        index = cls(watermark=meta["watermark"], **config)
+        if not meta["node_ids"]:
+            return index
+
+        vectors_path = os.path.join(directory, "vectors.npy")
+        if not os.path.exists(vectors_path):
+            return None
+        index.node_ids = meta["node_ids"]
+        index.dead = index.node_ids.count(None)
+        index.vectors = np.load(vectors_path, mmap_mode="r")
+        if len(index.vectors) != len(index.node_ids):
+            return None
+
+        if meta["config"] != {key: index.config[key] for key in BUILD_SETTINGS}:
+            node_ids, vectors = index.live()
+            return cls(node_ids, np.asarray(vectors, dtype=np.float32), meta["watermark"], **config)
+
+        index.attach(directory)
+        index.trained_rows = meta["trained_rows"]
+        return index
+
+
+class VectorBuffer:
+    """Preallocated float32 matrix filled row by row; doubles in size if more rows arrive than expected."""
+    def __init__(self, capacity:int, dimension:int):
+        self.node_ids = []
+        self.vectors = np.empty((max(1, capacity), dimension), dtype=np.float32)
+
+    def append(self, node_id:str, vector):
+        if len(self.node_ids) == len(self.vectors):
+            grown = np.empty((2 * len(self.vectors), self.vectors.shape[1]), dtype=np.float32)
+            grown[:len(self.vectors)] = self.vectors
+            self.vectors = grown
+        self.vectors[len(self.node_ids)] = vector
+        self.node_ids.append(node_id)
+
+    def finish(self):
+        """The ids and the filled rows; a view unless the buffer was over-allocated by more than a quarter."""
+        rows = len(self.node_ids)
+        vectors = self.vectors[:rows] if rows >= 0.75 * len(self.vectors) else self.vectors[:rows].copy()
+        return self.node_ids, vectors
+
+
+class PartitionedIndex:
+    """
+    One VectorIndex per node label (Report, Opinion, Audit, ...).
+
+    Queries can be restricted to a subset of labels so they only scan the relevant partitions;
+    with no labels every partition is searched and the hits are merged by distance.
+    """
+    def __init__(self, partitions:dict = None, watermark:int = 0, **config):
+        self.partitions = partitions if partitions else {}
+        self.watermark = watermark
+        self.config = config
+
+    @classmethod
+    def from_nodes(cls, nodes:list, watermark:int = 0, **config):
+        """Build from (element_id, label, embeddings) tuples."""
+        grouped = {}
+        for node_id, label, embeddings in nodes:
+            ids, vectors = grouped.setdefault(label, ([], []))
+            ids.append(node_id)
+            vectors.append(embeddings)
+
+        partitions = {
+            label: VectorIndex(ids, np.array(vectors, dtype=np.float32), watermark, **config)
+            for label, (ids, vectors) in grouped.items()
+        }
+        return cls(partitions, watermark, **config)
+
+    @classmethod
+    def from_stream(cls, batches, counts:dict = None, **config):
+        """
+        Build from batches of (element_id, label, float32 vector, updated_at) tuples, e.g. straight off a
+        database cursor. Each vector is copied once into a per-label matrix preallocated from `counts`
+        (label -> expected rows), so peak memory is about one copy of the vectors plus one batch.
+        """
+        counts = counts or {}
+        buffers, watermark = {}, 0
+        for batch in batches:
+            for node_id, label, vector, updated_at in batch:
+                if label not in buffers:
+                    buffers[label] = VectorBuffer(counts.get(label, 0), len(vector))
+                buffers[label].append(node_id, vector)
+                watermark = max(watermark, updated_at or 0)
+
+        partitions = {label: VectorIndex(*buffer.finish(), watermark, **config) for label, buffer in buffers.items()}
+        return cls(partitions, watermark, **config)
+
+    def __len__(self):
+        return sum(len(partition) for partition in self.partitions.values())
+
+    @property
+    def node_ids(self):
+        return [node_id for partition in self.partitions.values() for node_id in partition.node_ids if node_id is not None]
+
+    def search(self, query_vector:np.ndarray, k:int, labels:list = None, **search_params):
+        """
+        Return up to k (distance, element_id) pairs, nearest first.
+        Unknown labels are ignored; if none of the requested labels exist, every partition is searched.
+        """
+        selected = [self.partitions[label] for label in labels or [] if label in self.partitions]
+        if not selected:
+            selected = list(self.partitions.values())
+
+        hits = []
+        for partition in selected:
+            D, I = partition.search(query_vector, k, **search_params)
+            hits.extend((float(distance), partition.node_ids[position]) for distance, position in zip(D, I))
+
+        return sorted(hits)[:k]
+
+    def apply_changes(self, upserts:list, deleted:set, watermark:int):
+        """
+        Return a new PartitionedIndex with the changes applied to the partitions they touch.
+
+        Args:
+        - upserts (list): (element_id, label, embeddings) tuples for nodes added or changed since the watermark.
+        - deleted (set): elementIds that no longer exist in the graph.
+        - watermark (int): the newest `updated_at` covered by the result.
+        """
+        grouped = {}
+        for node_id, label, embeddings in upserts:
+            grouped.setdefault(label, []).append((node_id, embeddings))
+
+        partitions = {}
+        for label in set(self.partitions) | set(grouped):
+            partition = self.partitions.get(label) or VectorIndex(watermark=watermark, **self.config)
+            label_deleted = deleted & set(partition.node_ids)
+            if label in grouped or label_deleted:
+                partition = partition.apply_changes(grouped.get(label, []), label_deleted, watermark)
+            partitions[label] = partition
+
+        return PartitionedIndex(partitions, watermark, **self.config)
+
+    def save(self, path:str):
+        """Write every partition and a manifest of the labels as one snapshot version (see write_snapshot)."""
+        write_snapshot(path, self.write)
+
+    def write(self, directory:str):
+        os.makedirs(directory)
+        for label, partition in self.partitions.items():
+            partition.watermark = self.watermark
+            partition.write(os.path.join(directory, label))
+
+        with open(os.path.join(directory, "partitions.json"), "w") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "watermark": self.watermark,
+                "labels": sorted(self.partitions),
+            }, f)
+
+    @classmethod
+    def load(cls, path:str, **config):
+        """Load every partition of the current snapshot; returns None if any of them is missing or outdated."""
+        directory = current_snapshot(path)
+        manifest_path = os.path.join(directory, "partitions.json") if directory else None
+        if not manifest_path or not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        partitions = {}
+        for label in manifest["labels"]:
+            partition = VectorIndex.read(os.path.join(directory, label), **config)
+            if partition is None:
+                return None
+            partitions[label] = partition
+
+        return cls(partitions, manifest["watermark"], **config)